@@ -0,0 +1,102 @@
+"""
+Graphe d'analyse incrémental
+Étapes par document indexées par empreinte du contenu, étapes de dossier
+mémoïsées sur l'empreinte de leurs entrées : remplacer un document ne
+recalcule que ce document et les agrégations qui en dépendent
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+
+def content_fingerprint(*parts) -> str:
+    """Empreinte SHA-256 de contenus (bytes) ou de clés (str)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def document_fingerprint(doc_key: str, content: bytes) -> str:
+    """Clé du cache des étapes par document (type de document + contenu)"""
+    return content_fingerprint('document', doc_key, content)
+
+
+class Uncached:
+    """
+    Résultat d'étape rendu sans être mis en cache (document refusé faute de
+    ressources : la prochaine analyse réessaie au lieu de reprendre le refus)
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class AnalysisGraph:
+    """
+    Mémoïsation des étapes d'une analyse de dossier
+
+    - document(...) : résultat d'une étape par document, mis en cache par
+      (type de document, contenu) dans `document_cache` (partageable entre sessions),
+      sauf s'il est rendu enveloppé dans Uncached
+    - stage(...) : étape de dossier, réexécutée seulement si l'empreinte de
+      ses entrées change ; son empreinte sert d'entrée aux étapes suivantes
+    """
+
+    def __init__(self, document_cache):
+        self.document_cache = document_cache
+        self._stages: Dict[str, Tuple[str, Any]] = {}
+        self.last_run = {'reused': [], 'computed': []}
+
+    def start_run(self):
+        """Réinitialise le journal des étapes réutilisées / recalculées"""
+        self.last_run = {'reused': [], 'computed': []}
+
+    def document(self, doc_key: str, content: bytes, func: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Étape par document
+
+        Returns:
+            tuple: (résultat, empreinte du document)
+        """
+        fingerprint = document_fingerprint(doc_key, content)
+        value = self.document_cache.get(fingerprint)
+        if value is None:
+            value = func()
+            if isinstance(value, Uncached):
+                value = value.value
+            else:
+                self.document_cache.set(fingerprint, value)
+            self.last_run['computed'].append(doc_key)
+        else:
+            self.last_run['reused'].append(doc_key)
+        return value, fingerprint
+
+    def stage(self, name: str, inputs: Iterable[str], func: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Étape de dossier dépendant des empreintes `inputs`
+
+        Returns:
+            tuple: (résultat, empreinte de l'étape)
+        """
+        fingerprint = content_fingerprint(name, *inputs)
+        entry = self._stages.get(name)
+        if entry is not None and entry[0] == fingerprint:
+            self.last_run['reused'].append(name)
+            return entry[1], fingerprint
+
+        value = func()
+        self._stages[name] = (fingerprint, value)
+        self.last_run['computed'].append(name)
+        return value, fingerprint
+
+    def invalidate(self, name: str = None):
+        """Oublie une étape de dossier (ou toutes)"""
+        if name is None:
+            self._stages.clear()
+        else:
+            self._stages.pop(name, None)
@@ -0,0 +1,311 @@
+"""
+Protection des appels aux APIs publiques
+Limiteur de débit (seau à jetons), disjoncteur et cache des réponses
+
+L'état du limiteur et du disjoncteur est partagé entre sessions Streamlit
+et processus via une petite base SQLite (transactions BEGIN IMMEDIATE).
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+STATE_PATH = os.environ.get('INLI_API_STATE', os.path.join(tempfile.gettempdir(), 'inli_api_guard.sqlite'))
+
+
+class RateLimiter:
+    """Seau à jetons thread-safe : `rate` requêtes/s, rafales jusqu'à `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend un jeton
+
+        Returns:
+            bool: False si le délai `timeout` est dépassé
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class TTLCache:
+    """Cache LRU thread-safe avec expiration des entrées"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# ======================
+# ÉTAT PARTAGÉ ENTRE PROCESSUS
+# ======================
+
+class SharedState:
+    """Base SQLite d'état partagé (une connexion par thread)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (host TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS breakers "
+                         "(host TEXT PRIMARY KEY, failures INTEGER, opened_until REAL, probe_until REAL DEFAULT 0)")
+            # Base créée avant l'essai unique en demi-ouverture
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(breakers)")]
+            if 'probe_until' not in columns:
+                conn.execute("ALTER TABLE breakers ADD COLUMN probe_until REAL DEFAULT 0")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Transaction exclusive en écriture (sérialise les processus)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class SharedRateLimiter:
+    """
+    Seau à jetons partagé par tous les processus utilisant la même base d'état
+
+    En cas d'indisponibilité de la base (disque en lecture seule...), bascule
+    sur un seau local au processus.
+    """
+
+    def __init__(self, host: str, rate: float, capacity: Optional[float] = None, state: 'SharedState' = None):
+        self.host = host
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.state = state or get_shared_state()
+        self._fallback = RateLimiter(rate, capacity)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend un jeton
+
+        Returns:
+            bool: False si le délai `timeout` est dépassé
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            try:
+                with self.state.transaction() as conn:
+                    now = time.time()
+                    row = conn.execute("SELECT tokens, updated FROM buckets WHERE host = ?",
+                                       (self.host,)).fetchone()
+                    tokens = self.capacity if row is None else min(
+                        self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+                    granted = tokens >= 1
+                    if granted:
+                        tokens -= 1
+                    conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.host, tokens, now))
+            except sqlite3.Error:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                return self._fallback.acquire(remaining)
+
+            if granted:
+                return True
+
+            wait = (1 - tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur partagé par hôte
+
+    Après `failure_threshold` échecs consécutifs, les appels sont refusés
+    immédiatement pendant `cooldown_s` secondes ; un seul appel sert ensuite
+    d'essai, tous processus confondus (un nouvel échec rouvre le circuit, un
+    succès le referme). Les autres appels restent refusés jusqu'à son issue,
+    ou jusqu'à `probe_timeout_s` si l'essai n'est jamais conclu.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = 3, cooldown_s: float = 60,
+                 state: 'SharedState' = None, probe_timeout_s: Optional[float] = None):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.probe_timeout_s = probe_timeout_s if probe_timeout_s is not None else cooldown_s
+        self.state = state or get_shared_state()
+        self._probe = threading.local()     # Marqueur de l'essai accordé à ce thread
+
+    def _read(self, conn):
+        row = conn.execute("SELECT failures, opened_until, probe_until FROM breakers WHERE host = ?",
+                           (self.host,)).fetchone()
+        return (row[0], row[1], row[2] or 0.0) if row else (0, 0.0, 0.0)
+
+    def allow(self) -> bool:
+        """False tant que le circuit est ouvert, ou qu'un essai est déjà en cours"""
+        try:
+            with self.state.transaction() as conn:
+                failures, opened_until, probe_until = self._read(conn)
+                now = time.time()
+                self._probe.until = None
+                if not opened_until:
+                    return True
+                if now < opened_until or now < probe_until:
+                    return False
+                # Demi-ouverture : cet appel est l'essai, marqué sous la même transaction
+                self._probe.until = now + self.probe_timeout_s
+                conn.execute("INSERT OR REPLACE INTO breakers VALUES (?, ?, ?, ?)",
+                             (self.host, failures, opened_until, self._probe.until))
+                return True
+        except sqlite3.Error:
+            return True
+
+    def release(self):
+        """Abandonne l'essai accordé par allow() sans l'avoir conclu (appel finalement non émis)"""
+        until = getattr(self._probe, 'until', None)
+        if until is None:
+            return
+        self._probe.until = None
+        try:
+            with self.state.transaction() as conn:
+                conn.execute("UPDATE breakers SET probe_until = 0 WHERE host = ? AND probe_until = ?",
+                             (self.host, until))
+        except sqlite3.Error:
+            pass
+
+    def record_success(self):
+        try:
+            with self.state.transaction() as conn:
+                conn.execute("INSERT OR REPLACE INTO breakers VALUES (?, 0, 0, 0)", (self.host,))
+        except sqlite3.Error:
+            pass
+
+    def record_failure(self):
+        try:
+            with self.state.transaction() as conn:
+                failures, opened_until, _ = self._read(conn)
+                failures += 1
+                if failures >= self.failure_threshold:
+                    opened_until = time.time() + self.cooldown_s
+                conn.execute("INSERT OR REPLACE INTO breakers VALUES (?, ?, ?, 0)",
+                             (self.host, failures, opened_until))
+        except sqlite3.Error:
+            pass
+
+
+# ======================
+# REGISTRES (survivent aux réexécutions du script Streamlit)
+# ======================
+
+_registry_lock = threading.Lock()
+_states: Dict[str, SharedState] = {}
+_limiters: Dict[str, SharedRateLimiter] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_caches: Dict[str, TTLCache] = {}
+
+
+def get_shared_state(path: Optional[str] = None) -> SharedState:
+    """Base d'état partagée (par défaut STATE_PATH)"""
+    path = path or STATE_PATH
+    with _registry_lock:
+        state = _states.get(path)
+        if state is None:
+            state = _states[path] = SharedState(path)
+        return state
+
+
+def get_rate_limiter(host: str, rate: float, capacity: Optional[float] = None) -> SharedRateLimiter:
+    """Limiteur partagé par hôte d'API (entre sessions et processus)"""
+    with _registry_lock:
+        limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = SharedRateLimiter(host, rate, capacity)
+        with _registry_lock:
+            limiter = _limiters.setdefault(host, limiter)
+    return limiter
+
+
+def get_circuit_breaker(host: str, failure_threshold: int = 3, cooldown_s: float = 60) -> CircuitBreaker:
+    """Disjoncteur partagé par hôte d'API (entre sessions et processus)"""
+    with _registry_lock:
+        breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(host, failure_threshold, cooldown_s)
+        with _registry_lock:
+            breaker = _breakers.setdefault(host, breaker)
+    return breaker
+
+
+def get_cache(name: str, maxsize: int = 10000, ttl: float = 86400) -> TTLCache:
+    """Cache partagé par nom (survit aux réexécutions du script Streamlit)"""
+    with _registry_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = TTLCache(maxsize, ttl)
+        return cache
@@ -0,0 +1,362 @@
+"""
+Serveur de substitution des APIs publiques (SIRENE, Adresse, DNS MX)
+Rejoue des réponses enregistrées ou synthétiques, avec latence, erreurs
+et 429 injectés, pour des tests et benchmarks déterministes sans réseau
+
+Endpoints émulés :
+    GET  /entreprises/search?q=<siret>     -> recherche-entreprises.api.gouv.fr/search
+    GET  /adresse/search/?q=<adresse>      -> api-adresse.data.gouv.fr/search/
+    POST /adresse/search/csv/              -> api-adresse.data.gouv.fr/search/csv/
+    GET  /dns/mx?domain=<domaine>          -> réponse MX (JSON)
+
+Usage :
+    python api_stub_server.py --port 8765 --latency-ms 80 --error-rate 0.02 --rate-429 0.05
+    python api_stub_server.py --mode record      # capture les vraies réponses en fixtures
+    INLI_API_STUB_URL=http://127.0.0.1:8765 streamlit run app_fraud.py
+"""
+
+import argparse
+import csv
+import email.parser
+import email.policy
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+UPSTREAM = {
+    'entreprises': 'https://recherche-entreprises.api.gouv.fr',
+    'adresse': 'https://api-adresse.data.gouv.fr',
+}
+
+DEFAULT_FIXTURES_DIR = os.path.join('data', 'api_fixtures')
+
+
+class StubConfig:
+    """Paramètres d'injection de fautes et de rejeu"""
+
+    def __init__(self, mode: str = 'replay', fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+                 latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_429: float = 0, synthetic: bool = True, seed: Optional[int] = None):
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.synthetic = synthetic
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'injected_errors': 0, 'injected_429': 0, 'recorded': 0, 'missing': 0,
+                      'upstream_errors': 0}
+
+
+# ======================
+# FIXTURES
+# ======================
+
+def _fixture_path(config: StubConfig, endpoint: str, key: str) -> str:
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(config.fixtures_dir, endpoint, f"{digest}.json")
+
+
+def load_fixture(config: StubConfig, endpoint: str, key: str) -> Optional[Dict]:
+    path = _fixture_path(config, endpoint, key)
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def save_fixture(config: StubConfig, endpoint: str, key: str, status: int, content_type: str, body: str):
+    path = _fixture_path(config, endpoint, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'status': status, 'content_type': content_type, 'body': body},
+                  f, ensure_ascii=False, indent=1)
+
+
+# ======================
+# RÉPONSES SYNTHÉTIQUES (déterministes)
+# ======================
+
+def _seed_of(text: str) -> int:
+    return int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def synthetic_entreprise(siret: str) -> Dict:
+    """Réponse recherche-entreprises plausible et stable pour un SIRET"""
+    rng = random.Random(_seed_of(siret))
+    return {
+        'results': [{
+            'siren': siret[:9],
+            'nom_complet': f"ENTREPRISE {siret[:9]}",
+            'etat_administratif': 'A' if rng.random() > 0.05 else 'C',
+            'date_creation': f"{rng.randint(1970, 2022)}-{rng.randint(1, 12):02d}-01",
+            'activite_principale': '62.01Z',
+            'siege': {
+                'siret': siret,
+                'numero_voie': str(rng.randint(1, 150)),
+                'type_voie': 'RUE',
+                'libelle_voie': 'DE LA REPUBLIQUE',
+                'code_postal': f"75{rng.randint(1, 20):03d}",
+                'libelle_commune': 'PARIS',
+            }
+        }],
+        'total_results': 1
+    }
+
+
+def synthetic_geocode(query: str) -> Tuple[float, float, float, str]:
+    """Coordonnées stables (autour de Paris) pour une adresse"""
+    rng = random.Random(_seed_of(query))
+    return 48.85 + rng.uniform(-0.1, 0.1), 2.35 + rng.uniform(-0.15, 0.15), round(rng.uniform(0.6, 0.98), 2), query
+
+
+def synthetic_adresse(query: str) -> Dict:
+    lat, lon, score, label = synthetic_geocode(query)
+    return {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'label': label, 'score': score, 'city': 'Paris', 'postcode': '75001'}
+        }]
+    }
+
+
+def synthetic_csv(csv_text: str, column: str) -> str:
+    reader = csv.DictReader(io.StringIO(csv_text))
+    fieldnames = list(reader.fieldnames or []) + [
+        'latitude', 'longitude', 'result_label', 'result_score', 'result_postcode', 'result_city']
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for row in reader:
+        lat, lon, score, label = synthetic_geocode(row.get(column, ''))
+        row.update({'latitude': lat, 'longitude': lon, 'result_label': label, 'result_score': score,
+                    'result_postcode': '75001', 'result_city': 'Paris'})
+        writer.writerow(row)
+    return output.getvalue()
+
+
+def synthetic_mx(domain: str) -> Dict:
+    if 'invalid' in domain or domain.endswith('.test'):
+        return {'status': 'NXDOMAIN', 'answers': []}
+    return {'status': 'NOERROR', 'answers': [f"10 mx1.{domain}.", f"20 mx2.{domain}."]}
+
+
+# ======================
+# SERVEUR
+# ======================
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """Champs d'un formulaire multipart : {nom: (nom de fichier, contenu)}"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        fields[name] = (part.get_filename(), part.get_payload(decode=True) or b'')
+    return fields
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Aiguille les requêtes vers rejeu, enregistrement ou synthèse"""
+
+    server_version = 'InliApiStub/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> StubConfig:
+        return self.server.stub_config
+
+    def _send(self, status: int, body: str, content_type: str = 'application/json'):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject_faults(self) -> bool:
+        """Latence, 429 et erreurs 5xx aléatoires ; True si la réponse est déjà envoyée"""
+        config = self.config
+        with config.lock:
+            config.stats['requests'] += 1
+            delay = config.latency_ms + config.random.uniform(-config.jitter_ms, config.jitter_ms)
+            draw = config.random.random()
+
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if config.mode == 'record':
+            return False
+        if draw < config.rate_429:
+            with config.lock:
+                config.stats['injected_429'] += 1
+            self._send(429, json.dumps({'message': 'Too many requests'}))
+            return True
+        if draw < config.rate_429 + config.error_rate:
+            with config.lock:
+                config.stats['injected_errors'] += 1
+            self._send(503, json.dumps({'message': 'Service unavailable'}))
+            return True
+        return False
+
+    def _respond(self, endpoint: str, key: str, upstream_call, synthetic_call, content_type='application/json'):
+        config = self.config
+
+        if config.mode == 'record':
+            import requests
+            try:
+                response = upstream_call(requests)
+            except requests.RequestException as e:
+                # API réelle injoignable : erreur rendue au client, rien n'est enregistré
+                with config.lock:
+                    config.stats['upstream_errors'] += 1
+                status = 504 if isinstance(e, requests.Timeout) else 502
+                self._send(status, json.dumps({'message': f"API réelle indisponible ({type(e).__name__}) : {e}"}))
+                return
+            body = response.content.decode('utf-8-sig')
+            save_fixture(config, endpoint, key, response.status_code, content_type, body)
+            with config.lock:
+                config.stats['recorded'] += 1
+            self._send(response.status_code, body, content_type)
+            return
+
+        fixture = load_fixture(config, endpoint, key)
+        if fixture:
+            self._send(fixture['status'], fixture['body'], fixture.get('content_type', content_type))
+        elif config.synthetic:
+            self._send(200, synthetic_call(), content_type)
+        else:
+            with config.lock:
+                config.stats['missing'] += 1
+            self._send(404, json.dumps({'message': f"Aucune fixture pour {key}"}))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/stats':
+            with self.config.lock:
+                self._send(200, json.dumps(self.config.stats))
+            return
+
+        if self._inject_faults():
+            return
+
+        if url.path.rstrip('/') == '/entreprises/search':
+            q = params.get('q', '')
+            self._respond(
+                'entreprises', q,
+                lambda requests: requests.get(f"{UPSTREAM['entreprises']}/search", params={'q': q}, timeout=10),
+                lambda: json.dumps(synthetic_entreprise(q)))
+
+        elif url.path.rstrip('/') == '/adresse/search':
+            q = params.get('q', '')
+            self._respond(
+                'adresse', q,
+                lambda requests: requests.get(f"{UPSTREAM['adresse']}/search/",
+                                              params={'q': q, 'limit': params.get('limit', 1)}, timeout=10),
+                lambda: json.dumps(synthetic_adresse(q)))
+
+        elif url.path == '/dns/mx':
+            domain = params.get('domain', '')
+            self._respond('dns', domain, lambda requests: _record_mx(domain), lambda: json.dumps(synthetic_mx(domain)))
+
+        else:
+            self._send(404, json.dumps({'message': 'Endpoint inconnu'}))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/adresse/search/csv':
+            self._send(404, json.dumps({'message': 'Endpoint inconnu'}))
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self._inject_faults():
+            return
+
+        fields = _parse_multipart(self.headers.get('Content-Type', ''), body)
+        filename, data = fields.get('data', ('adresses.csv', b''))
+        column = (fields.get('columns', (None, b'adresse'))[1] or b'adresse').decode('utf-8')
+        csv_text = data.decode('utf-8-sig')
+
+        self._respond(
+            'adresse_csv', csv_text,
+            lambda requests: requests.post(f"{UPSTREAM['adresse']}/search/csv/",
+                                           files={'data': (filename, data, 'text/csv')},
+                                           data={'columns': column}, timeout=30),
+            lambda: synthetic_csv(csv_text, column),
+            content_type='text/csv')
+
+
+class _RecordedMx:
+    """Réponse MX réelle mise en forme comme une réponse HTTP"""
+
+    def __init__(self, payload: Dict):
+        self.status_code = 200
+        self.content = json.dumps(payload).encode('utf-8')
+
+
+def _record_mx(domain: str) -> _RecordedMx:
+    import dns.resolver
+    try:
+        answers = dns.resolver.resolve(domain, 'MX')
+        return _RecordedMx({'status': 'NOERROR', 'answers': [r.to_text() for r in answers]})
+    except dns.resolver.NXDOMAIN:
+        return _RecordedMx({'status': 'NXDOMAIN', 'answers': []})
+    except (dns.resolver.NoAnswer, dns.resolver.NoNameservers):
+        return _RecordedMx({'status': 'NOANSWER', 'answers': []})
+
+
+def start_stub_server(config: Optional[StubConfig] = None, host: str = '127.0.0.1',
+                      port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Démarre le serveur dans un thread (tests / benchmarks)
+
+    Returns:
+        tuple: (serveur, URL de base à mettre dans INLI_API_STUB_URL)
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = config or StubConfig()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur de substitution SIRENE / Adresse / DNS")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=['replay', 'record'], default='replay')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-429', type=float, default=0)
+    parser.add_argument('--no-synthetic', action='store_true', help="404 si aucune fixture (rejeu strict)")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    stub_config = StubConfig(args.mode, args.fixtures, args.latency_ms, args.jitter_ms,
+                             args.error_rate, args.rate_429, not args.no_synthetic, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = stub_config
+    print(f"🧪 Serveur de substitution ({args.mode}) sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
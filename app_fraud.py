@@ -16,6 +16,7 @@ NOUVEAUTÉS v4.0 :
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
 import json
@@ -26,11 +27,31 @@ import io
 import re
 from io import BytesIO
 import base64
+import csv
+import math
 import requests
-from geopy.distance import geodesic
 import dns.resolver
 from typing import Dict, List, Tuple, Optional
 import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import api_guard
+import rule_engine
+import dossier_features
+import fraud_ring_index
+import near_duplicates
+import analysis_graph
+import prefetch_pipeline
+import background_analysis
+import font_inventory
+import image_forensics
+import image_pyramid
+import metadata_analyzer
+import parser_sandbox
+from settings import GLOBAL_SCORE_WEIGHTS, GLOBAL_SCORE_BANDS, RISK_LEVEL_BANDS, FRAUD_THRESHOLDS, ALLOWED_EXTENSIONS
+import sirene_local
+import ban_local
 
 # Configuration de la page
 st.set_page_config(
@@ -587,6 +608,26 @@ def extract_french_phones_ultra(text: str) -> List[Dict]:
     return unique_phones
 
 
+def extract_ibans_ultra(text: str) -> List[str]:
+    """Extraction d'IBAN (clé de contrôle ISO 13616 vérifiée)"""
+
+    ibans = []
+    pattern = r'\b([A-Z]{2}\d{2}(?:[ ]?[A-Z0-9]{4}){2,7}(?:[ ]?[A-Z0-9]{1,3})?)\b'
+
+    for match in re.finditer(pattern, text.upper()):
+        iban = match.group(1).replace(' ', '')
+        if not 15 <= len(iban) <= 34:
+            continue
+
+        # Contrôle modulo 97 : pays + clé déplacés en fin, lettres -> nombres
+        rearranged = iban[4:] + iban[:4]
+        numeric = ''.join(str(int(c, 36)) for c in rearranged)
+        if int(numeric) % 97 == 1 and iban not in ibans:
+            ibans.append(iban)
+
+    return ibans
+
+
 def extract_structured_data(text: str) -> Dict:
     """
     Extraction ULTRA-ROBUSTE de données structurées
@@ -599,6 +640,7 @@ def extract_structured_data(text: str) -> Dict:
             'siren': [],
             'emails': [],
             'phones': [],
+            'ibans': [],
             'addresses': [],
             'amounts': [],
             'dates': [],
@@ -617,6 +659,9 @@ def extract_structured_data(text: str) -> Dict:
     # Extraction téléphones français
     phones_data = extract_french_phones_ultra(text)
 
+    # IBAN
+    ibans = extract_ibans_ultra(text)
+
     # Montants avec contexte
     amounts = extract_amounts_with_context(text)
 
@@ -633,6 +678,7 @@ def extract_structured_data(text: str) -> Dict:
         'emails_detailed': emails_data,
         'phones': [p['phone'] for p in phones_data],
         'phones_detailed': phones_data,
+        'ibans': ibans,
         'addresses': [a['full_address'] for a in addresses_data],
         'addresses_detailed': addresses_data,
         'amounts': amounts,
@@ -716,20 +762,119 @@ def extract_names(text: str) -> List[str]:
 # APIs EXTERNES - CONFIGURATION
 # ======================
 
+# Serveur de substitution (api_stub_server.py) : si renseigné, tous les appels
+# SIRENE, Adresse et DNS MX y sont redirigés (tests, benchmarks, CI)
+API_STUB_URL = os.environ.get('INLI_API_STUB_URL', '').rstrip('/')
+# Débit autorisé vers le serveur de substitution (les limites de production ne s'y appliquent pas)
+API_STUB_RATE_LIMIT_PER_S = float(os.environ.get('INLI_API_STUB_RATE_LIMIT', '1000'))
+
 API_CONFIG = {
     'insee_sirene': {
         'base_url': 'https://eur03.safelinks.protection.outlook.com/?url=https%3A%2F%2Fapi.insee.fr%2Fentreprises%2Fsirene%2FV3.11&data=05%7C02%7Cstephanie.ammi%40inli.fr%7Cb1f4a3b8d30e4f2dde5d08de6a3b7eef%7C01a91ab5c50b4c0d8cfb59bc713898ab%7C0%7C0%7C639065000978230674%7CUnknown%7CTWFpbGZsb3d8eyJFbXB0eU1hcGkiOnRydWUsIlYiOiIwLjAuMDAwMCIsIlAiOiJXaW4zMiIsIkFOIjoiTWFpbCIsIldUIjoyfQ%3D%3D%7C0%7C%7C%7C&sdata=nZNDQqnUDOqEDYAFuRlslQFPEIcqh0Y4GgIp4BsvOZo%3D&reserved=0',
         'enabled': True,
-        'requires_key': False
+        'requires_key': False,
+        # 'online' : API publique | 'offline' : base locale uniquement | 'auto' : base locale si présente
+        'mode': os.environ.get('INLI_SIRENE_MODE', 'online'),
+        'local_db_path': os.environ.get('INLI_SIRENE_DB', 'data/sirene/etablissements.sqlite'),
+        'host': 'recherche-entreprises.api.gouv.fr',
+        'stub_prefix': '/entreprises',
+        'rate_limit_per_s': 7,              # Limite publique de l'API Recherche d'entreprises
+        'max_requests_per_dossier': 5,      # Budget d'appels réseau par dossier (hors cache)
+        'cache_ttl_s': 24 * 3600,
+        'timeout_s': 10,
+        'rate_limit_wait_s': 5,             # Attente max d'un jeton avant d'abandonner l'appel
+        'breaker_failures': 3,              # Échecs consécutifs avant ouverture du disjoncteur
+        'breaker_cooldown_s': 60
     },
     'adresse_gouv': {
         'base_url': 'https://eur03.safelinks.protection.outlook.com/?url=https%3A%2F%2Fapi-adresse.data.gouv.fr%2F&data=05%7C02%7Cstephanie.ammi%40inli.fr%7Cb1f4a3b8d30e4f2dde5d08de6a3b7eef%7C01a91ab5c50b4c0d8cfb59bc713898ab%7C0%7C0%7C639065000978286360%7CUnknown%7CTWFpbGZsb3d8eyJFbXB0eU1hcGkiOnRydWUsIlYiOiIwLjAuMDAwMCIsIlAiOiJXaW4zMiIsIkFOIjoiTWFpbCIsIldUIjoyfQ%3D%3D%7C0%7C%7C%7C&sdata=Fl0K58xcD7eIdJhe6xtLAnebPlkJ9d21pMELSfiAsOg%3D&reserved=0',
         'enabled': True,
-        'requires_key': False
+        'requires_key': False,
+        # 'online' : API publique | 'offline' : BAN locale uniquement | 'auto' : BAN locale si présente
+        'mode': os.environ.get('INLI_BAN_MODE', 'online'),
+        'local_db_path': os.environ.get('INLI_BAN_DB', 'data/ban/adresses.sqlite'),
+        'host': 'api-adresse.data.gouv.fr',
+        'stub_prefix': '/adresse',
+        'rate_limit_per_s': 40,
+        'timeout_s': 10,
+        'rate_limit_wait_s': 5,
+        'breaker_failures': 3,
+        'breaker_cooldown_s': 60
     }
 }
 
 
+API_UNAVAILABLE_ERROR = "Non vérifié – API indisponible"
+
+
+def api_url(api_name: str, path: str) -> str:
+    """URL d'un endpoint : API publique, ou serveur de substitution si INLI_API_STUB_URL est défini"""
+    config = API_CONFIG[api_name]
+    if API_STUB_URL:
+        return f"{API_STUB_URL}{config['stub_prefix']}{path}"
+    return f"https://{config['host']}{path}"
+
+
+def api_guard_host(api_name: str) -> str:
+    """
+    Clé du limiteur et du disjoncteur d'une API : hôte public, ou hôte du serveur
+    de substitution (les erreurs injectées n'ouvrent pas le disjoncteur de production)
+    """
+    config = API_CONFIG[api_name]
+    if API_STUB_URL:
+        return f"{urlparse(API_STUB_URL).netloc}{config['stub_prefix']}"
+    return config['host']
+
+
+def get_api_rate_limiter(api_name: str) -> api_guard.SharedRateLimiter:
+    """Limiteur de débit partagé (sessions et processus) pour une API de API_CONFIG"""
+    config = API_CONFIG[api_name]
+    rate = API_STUB_RATE_LIMIT_PER_S if API_STUB_URL else config['rate_limit_per_s']
+    return api_guard.get_rate_limiter(api_guard_host(api_name), rate)
+
+
+def get_api_circuit_breaker(api_name: str) -> api_guard.CircuitBreaker:
+    """Disjoncteur partagé (sessions et processus) pour une API de API_CONFIG"""
+    config = API_CONFIG[api_name]
+    return api_guard.get_circuit_breaker(api_guard_host(api_name), config['breaker_failures'],
+                                         config['breaker_cooldown_s'])
+
+
+def call_public_api(api_name: str, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+    """
+    Appel HTTP protégé par le limiteur de débit et le disjoncteur de l'API
+
+    Les timeouts, erreurs réseau, 429 et 5xx comptent comme échecs ; après
+    `breaker_failures` échecs consécutifs l'API est court-circuitée pendant
+    `breaker_cooldown_s` secondes au lieu de bloquer chaque analyse.
+
+    Returns:
+        La réponse, ou None si l'appel est ignoré (API indisponible / débit saturé)
+    """
+    config = API_CONFIG[api_name]
+    breaker = get_api_circuit_breaker(api_name)
+
+    if not breaker.allow():
+        return None
+    if not get_api_rate_limiter(api_name).acquire(timeout=config['rate_limit_wait_s']):
+        breaker.release()
+        return None
+
+    kwargs.setdefault('timeout', config['timeout_s'])
+    try:
+        response = requests.request(method, url, **kwargs)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+
+    if response.status_code == 429 or response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    return response
+
+
 # ======================
 # VALIDATION SIRET (INSEE)
 # ======================
@@ -758,11 +903,45 @@ def validate_siret_insee(siret: str) -> Dict:
         result['error'] = "SIRET invalide (doit contenir 14 chiffres)"
         return result
 
+    # Cache partagé : un SIRET déjà vérifié ne coûte plus d'appel réseau
+    sirene_cache = get_sirene_cache()
+    cached = sirene_cache.get(siret)
+    if cached is not None:
+        return dict(cached)
+
+    # Mode hors-ligne : base StockEtablissement importée localement
+    sirene_config = API_CONFIG['insee_sirene']
+    db_path = sirene_config.get('local_db_path')
+
+    if sirene_config.get('mode') == 'offline' or (
+            sirene_config.get('mode') == 'auto' and sirene_local.is_available(db_path)):
+        result['api_used'] = 'Base SIRENE locale'
+
+        if not sirene_local.is_available(db_path):
+            result['error'] = "Base SIRENE locale absente - Importez un extrait StockEtablissement"
+            return result
+
+        try:
+            local_result = sirene_local.lookup_siret(siret, db_path)
+        except Exception as e:
+            result['error'] = f"Erreur base locale : {str(e)}"
+            return result
+
+        if local_result:
+            return local_result
+
+        result['error'] = "SIRET introuvable dans la base locale"
+        return result
+
     try:
         # API Annuaire des Entreprises (data.gouv.fr) - GRATUITE et PUBLIQUE
-        url = f"https://recherche-entreprises.api.gouv.fr/search?q={siret}"
-        
-        response = requests.get(url, timeout=10)
+        url = api_url('insee_sirene', '/search')
+
+        response = call_public_api('insee_sirene', 'GET', url, params={'q': siret})
+        if response is None:
+            result['error'] = API_UNAVAILABLE_ERROR
+            result['skipped'] = True
+            return result
         
         if response.status_code == 200:
             data = response.json()
@@ -823,6 +1002,10 @@ def validate_siret_insee(siret: str) -> Dict:
         else:
             result['error'] = f"Erreur API (code {response.status_code})"
 
+        # Seules les réponses définitives sont mises en cache (pas les erreurs transitoires)
+        if response.status_code in (200, 404):
+            sirene_cache.set(siret, dict(result))
+
     except requests.Timeout:
         result['error'] = "Timeout - API non accessible"
     except requests.RequestException as e:
@@ -833,6 +1016,100 @@ def validate_siret_insee(siret: str) -> Dict:
     return result
 
 
+def get_sirene_cache() -> api_guard.TTLCache:
+    """Cache des réponses SIRENE, partagé entre sessions"""
+    return api_guard.get_cache('insee_sirene', maxsize=50000, ttl=API_CONFIG['insee_sirene']['cache_ttl_s'])
+
+
+def select_employer_siret(siret_sources: Dict[str, List[str]]) -> Optional[str]:
+    """
+    Choix déterministe du SIRET employeur
+
+    Le SIRET présent sur le plus de fiches de paie l'emporte, puis celui
+    présent sur le plus de documents, puis celui du contrat, puis l'ordre numérique.
+    """
+    if not siret_sources:
+        return None
+
+    def rank(siret):
+        docs = siret_sources[siret]
+        payslips = sum(1 for doc_key in docs if doc_key.startswith('fiche_paie'))
+        in_contract = 'contrat_travail' in docs
+        return (-payslips, -len(docs), not in_contract, siret)
+
+    return min(siret_sources, key=rank)
+
+
+def validate_all_sirets(structured_data: Dict, budget: Optional[int] = None) -> Tuple[Optional[str], Dict[str, Dict]]:
+    """
+    Valide tous les SIRET distincts du dossier en parallèle
+
+    Les appels passent par le limiteur de débit partagé ; au-delà du budget
+    de requêtes du dossier, les SIRET non présents en cache ne sont pas vérifiés.
+
+    Args:
+        budget: Appels réseau restants (défaut : max_requests_per_dossier)
+
+    Returns:
+        tuple: (SIRET employeur, {siret: résultat + documents sources})
+    """
+    siret_sources = {}
+    for doc_key in sorted(structured_data):
+        for siret in structured_data[doc_key].get('siret', []):
+            sources = siret_sources.setdefault(siret, [])
+            if doc_key not in sources:
+                sources.append(doc_key)
+
+    employer_siret = select_employer_siret(siret_sources)
+    if not employer_siret:
+        return None, {}
+
+    # Employeur d'abord, puis par nombre de documents
+    ordered = sorted(siret_sources, key=lambda s: (s != employer_siret, -len(siret_sources[s]), s))
+
+    sirene_cache = get_sirene_cache()
+    if budget is None:
+        budget = API_CONFIG['insee_sirene']['max_requests_per_dossier']
+    to_validate = []
+    skipped = []
+    for siret in ordered:
+        if siret in sirene_cache:
+            to_validate.append(siret)
+        elif budget > 0:
+            to_validate.append(siret)
+            budget -= 1
+        else:
+            skipped.append(siret)
+
+    with ThreadPoolExecutor(max_workers=min(4, len(to_validate))) as executor:
+        results = dict(zip(to_validate, executor.map(validate_siret_insee, to_validate)))
+
+    for siret in skipped:
+        results[siret] = {
+            'valid': False,
+            'exists': False,
+            'company_name': None,
+            'address': None,
+            'status': None,
+            'creation_date': None,
+            'activity': None,
+            'error': "Non vérifié - budget de requêtes du dossier atteint",
+            'skipped': True,
+            'api_used': None
+        }
+
+    siret_validations = {}
+    for siret in ordered:
+        siret_validations[siret] = dict(
+            results[siret],
+            siret=siret,
+            source_documents=siret_sources[siret],
+            is_employer=(siret == employer_siret)
+        )
+
+    return employer_siret, siret_validations
+
+
 # ======================
 # VALIDATION ADRESSE (DATA.GOUV)
 # ======================
@@ -856,15 +1133,44 @@ def validate_address_gouv(address: str) -> Dict:
         result['error'] = "Adresse trop courte"
         return result
 
+    address_cache = get_address_cache()
+    cached = address_cache.get(address)
+    if cached is not None:
+        return dict(cached)
+
+    # Mode hors-ligne : géocodeur local sur extrait BAN départemental
+    ban_config = API_CONFIG['adresse_gouv']
+    db_path = ban_config.get('local_db_path')
+
+    if ban_config.get('mode') == 'offline' or (
+            ban_config.get('mode') == 'auto' and ban_local.is_available(db_path)):
+        result['api_used'] = 'BAN locale'
+
+        if not ban_local.is_available(db_path):
+            result['error'] = "Base BAN locale absente - Importez un extrait départemental"
+            return result
+
+        try:
+            local_result = ban_local.geocode(address, db_path)
+        except Exception as e:
+            result['error'] = f"Erreur base locale : {str(e)}"
+            return result
+
+        if local_result:
+            return local_result
+
+        result['error'] = "Adresse introuvable"
+        return result
+
     try:
         # API Adresse Data.gouv.fr - VRAIE URL PUBLIQUE
-        url = "https://api-adresse.data.gouv.fr/search/"
-        
-        response = requests.get(
-            url,
-            params={'q': address, 'limit': 1},
-            timeout=10
-        )
+        url = api_url('adresse_gouv', '/search/')
+
+        response = call_public_api('adresse_gouv', 'GET', url, params={'q': address, 'limit': 1})
+        if response is None:
+            result['error'] = API_UNAVAILABLE_ERROR
+            result['skipped'] = True
+            return result
 
         if response.status_code == 200:
             data = response.json()
@@ -885,6 +1191,8 @@ def validate_address_gouv(address: str) -> Dict:
                     result['latitude'] = geometry['coordinates'][1]
             else:
                 result['error'] = "Adresse introuvable"
+
+            address_cache.set(address, dict(result))
         else:
             result['error'] = f"Erreur API (code {response.status_code})"
 
@@ -898,12 +1206,125 @@ def validate_address_gouv(address: str) -> Dict:
     return result
 
 
+def get_address_cache() -> api_guard.TTLCache:
+    """Cache des géocodages, partagé entre sessions"""
+    return api_guard.get_cache('adresse_gouv', maxsize=50000, ttl=24 * 3600)
+
+
+def validate_addresses_batch(addresses: List[str]) -> List[Dict]:
+    """
+    Géocode une liste d'adresses en un seul appel (endpoint /search/csv/ de l'API Adresse)
+
+    Les adresses déjà en cache ne sont pas renvoyées à l'API ; en mode hors-ligne
+    le géocodeur BAN local est interrogé directement.
+
+    Returns:
+        list: Un résultat au format de validate_address_gouv par adresse, dans l'ordre
+    """
+    address_cache = get_address_cache()
+    results = {}
+    missing = []
+
+    for address in dict.fromkeys(addresses):
+        cached = address_cache.get(address)
+        if cached is not None:
+            results[address] = dict(cached)
+        elif address and len(address) >= 5:
+            missing.append(address)
+
+    ban_config = API_CONFIG['adresse_gouv']
+    use_local = ban_config.get('mode') == 'offline' or (
+        ban_config.get('mode') == 'auto' and ban_local.is_available(ban_config.get('local_db_path')))
+
+    if missing and (use_local or len(missing) == 1):
+        for address in missing:
+            results[address] = validate_address_gouv(address)
+    elif missing:
+        csv_buffer = io.StringIO()
+        writer = csv.writer(csv_buffer)
+        writer.writerow(['adresse'])
+        writer.writerows([address] for address in missing)
+
+        try:
+            response = call_public_api(
+                'adresse_gouv', 'POST',
+                api_url('adresse_gouv', '/search/csv/'),
+                files={'data': ('adresses.csv', csv_buffer.getvalue().encode('utf-8'), 'text/csv')},
+                data={'columns': 'adresse'},
+                timeout=30
+            )
+
+            if response is None:
+                for address in missing:
+                    results[address] = {'valid': False, 'latitude': None, 'longitude': None,
+                                        'error': API_UNAVAILABLE_ERROR, 'skipped': True}
+            elif response.status_code == 200:
+                reader = csv.DictReader(io.StringIO(response.content.decode('utf-8-sig')))
+                for address, row in zip(missing, reader):
+                    result = {
+                        'valid': False,
+                        'normalized_address': None,
+                        'latitude': None,
+                        'longitude': None,
+                        'confidence_score': 0,
+                        'city': None,
+                        'postal_code': None,
+                        'error': None,
+                        'api_used': 'API Adresse Data.gouv'
+                    }
+                    if row.get('latitude') and row.get('longitude'):
+                        result.update({
+                            'valid': True,
+                            'normalized_address': row.get('result_label') or address,
+                            'latitude': float(row['latitude']),
+                            'longitude': float(row['longitude']),
+                            'confidence_score': float(row.get('result_score') or 0),
+                            'city': row.get('result_city', ''),
+                            'postal_code': row.get('result_postcode', '')
+                        })
+                    else:
+                        result['error'] = "Adresse introuvable"
+                    address_cache.set(address, dict(result))
+                    results[address] = result
+            else:
+                error = f"Erreur API (code {response.status_code})"
+                for address in missing:
+                    results[address] = {'valid': False, 'latitude': None, 'longitude': None, 'error': error}
+
+        except requests.RequestException as e:
+            for address in missing:
+                results[address] = {'valid': False, 'latitude': None, 'longitude': None,
+                                    'error': f"Erreur réseau : {str(e)}"}
+
+    return [results.get(address, {'valid': False, 'latitude': None, 'longitude': None,
+                                  'error': "Adresse trop courte"}) for address in addresses]
+
+
 # ======================
 # VALIDATION EMAIL
 # ======================
 
-def validate_email_advanced(email: str) -> Dict:
-    """Validation email avec vérification DNS"""
+def resolve_mx(domain: str) -> List[str]:
+    """
+    Enregistrements MX d'un domaine (DNS, ou serveur de substitution si configuré)
+
+    Lève les exceptions dns.resolver habituelles (NXDOMAIN, NoAnswer...)
+    """
+    if not API_STUB_URL:
+        return [record.to_text() for record in dns.resolver.resolve(domain, 'MX')]
+
+    response = requests.get(f"{API_STUB_URL}/dns/mx", params={'domain': domain}, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if data['status'] == 'NXDOMAIN':
+        raise dns.resolver.NXDOMAIN()
+    if not data['answers']:
+        raise dns.resolver.NoAnswer()
+    return data['answers']
+
+
+def validate_email_advanced(email: str, check_dns: bool = True) -> Dict:
+    """Validation email avec vérification DNS (check_dns=False : format et domaines jetables seulement)"""
 
     result = {
         'valid': False,
@@ -943,16 +1364,29 @@ def validate_email_advanced(email: str) -> Dict:
         result['warnings'].append("Email jetable détecté")
         return result
 
+    if not check_dns:
+        result['valid'] = True
+        result['confidence'] = 0.5
+        return result
+
+    email_cache = get_email_cache()
+    cached = email_cache.get(email)
+    if cached is not None:
+        return dict(cached, warnings=list(cached['warnings']))
+
     # Vérification DNS MX
     try:
-        mx_records = dns.resolver.resolve(domain, 'MX')
+        mx_records = resolve_mx(domain)
         if mx_records:
             result['domain_valid'] = True
             result['valid'] = True
             result['confidence'] = 0.9
+        email_cache.set(email, dict(result, warnings=list(result['warnings'])))
     except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.NoNameservers):
         result['warnings'].append("Domaine inexistant ou pas de serveur mail")
+        email_cache.set(email, dict(result, warnings=list(result['warnings'])))
     except Exception as e:
+        # Échec transitoire : non mis en cache
         result['warnings'].append(f"Vérification DNS impossible : {str(e)}")
         result['valid'] = True
         result['confidence'] = 0.5
@@ -960,286 +1394,824 @@ def validate_email_advanced(email: str) -> Dict:
     return result
 
 
+def get_email_cache() -> api_guard.TTLCache:
+    """Résultats de vérification DNS par adresse email, partagés entre sessions"""
+    return api_guard.get_cache('email_dns', maxsize=10000, ttl=24 * 3600)
+
+
 # ======================
 # CALCUL DISTANCE
 # ======================
 
+EARTH_RADIUS_KM = 6371.0088
+
+# Rôle géographique de chaque type de document
+DOMICILE_DOC_PREFIXES = ('quittance', 'facture', 'carte_identite', 'permis_conduire',
+                         'passeport', 'titre_sejour', 'avis_imposition')
+EMPLOI_DOC_PREFIXES = ('fiche_paie', 'contrat_travail')
+
+# Écart maximal toléré entre deux justificatifs de domicile
+DOMICILE_MAX_SPREAD_KM = 50
+
+
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
-    """Calcule la distance en km entre 2 points GPS"""
+    """Calcule la distance en km entre 2 points GPS (haversine)"""
     try:
-        distance = geodesic((lat1, lon1), (lat2, lon2)).kilometers
+        phi1, phi2 = math.radians(lat1), math.radians(lat2)
+        a = (math.sin((phi2 - phi1) / 2) ** 2 +
+             math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
         return round(distance, 1)
     except:
         return None
 
 
+def haversine_matrix(latitudes, longitudes) -> np.ndarray:
+    """Matrice NxN des distances (km) entre tous les points, en un seul calcul vectorisé"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+
+    sin_dlat = np.sin((lat[:, None] - lat[None, :]) / 2)
+    sin_dlon = np.sin((lon[:, None] - lon[None, :]) / 2)
+    cos_lat = np.cos(lat)
+
+    a = sin_dlat ** 2 + np.outer(cos_lat, cos_lat) * sin_dlon ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def build_geo_matrix(structured_data: Dict, siret_validations: Dict) -> Dict:
+    """
+    Géocode toutes les adresses du dossier et calcule la matrice des distances
+
+    Points : adresses de chaque document (quittances, factures, fiches de paie,
+    contrat...) + siège SIRENE de chaque SIRET vérifié.
+
+    Returns:
+        dict: points géocodés, matrice des distances et incohérences entre justificatifs de domicile
+    """
+    candidates = []
+    for doc_key in sorted(structured_data):
+        if doc_key.startswith(DOMICILE_DOC_PREFIXES):
+            role = 'domicile'
+        elif doc_key.startswith(EMPLOI_DOC_PREFIXES):
+            role = 'emploi'
+        else:
+            role = 'autre'
+        for addr in structured_data[doc_key].get('addresses_detailed', []):
+            if isinstance(addr, dict) and addr.get('full_address'):
+                candidates.append({'source': doc_key, 'role': role, 'address': addr['full_address']})
+
+    for siret, info in (siret_validations or {}).items():
+        if info.get('address'):
+            candidates.append({'source': f"sirene_{siret}", 'role': 'siege', 'address': info['address']})
+
+    geo = {'points': [], 'distances_km': [], 'domicile_inconsistencies': []}
+    if not candidates:
+        return geo
+
+    geocoded = validate_addresses_batch([c['address'] for c in candidates])
+    points = []
+    for candidate, result in zip(candidates, geocoded):
+        if result.get('latitude') is not None and result.get('longitude') is not None:
+            points.append(dict(candidate, latitude=result['latitude'], longitude=result['longitude'],
+                               normalized_address=result.get('normalized_address')))
+
+    if not points:
+        return geo
+
+    distances = haversine_matrix([p['latitude'] for p in points], [p['longitude'] for p in points])
+    geo['points'] = points
+    geo['distances_km'] = np.round(distances, 1).tolist()
+
+    # Deux justificatifs de domicile sont incohérents si aucune de leurs adresses n'est proche
+    # (un document peut contenir l'adresse du fournisseur en plus de celle du client)
+    domicile_sources = sorted({p['source'] for p in points if p['role'] == 'domicile'})
+    if len(domicile_sources) >= 2:
+        source_index = np.array([domicile_sources.index(p['source']) if p['role'] == 'domicile' else -1
+                                 for p in points])
+        n_sources = len(domicile_sources)
+        min_between = np.full((n_sources, n_sources), np.inf)
+        rows, cols = np.nonzero((source_index[:, None] >= 0) & (source_index[None, :] >= 0))
+        np.minimum.at(min_between, (source_index[rows], source_index[cols]), distances[rows, cols])
+
+        for i in range(n_sources):
+            for j in range(i + 1, n_sources):
+                if min_between[i, j] > DOMICILE_MAX_SPREAD_KM:
+                    geo['domicile_inconsistencies'].append({
+                        'documents': (domicile_sources[i], domicile_sources[j]),
+                        'distance_km': round(float(min_between[i, j]), 1)
+                    })
+
+    return geo
+
+
+# ======================
+# RÉSEAUX DE FRAUDE (HISTORIQUE INTER-DOSSIERS)
+# ======================
+
+FRAUD_RING_CONFIG = {
+    'enabled': os.environ.get('INLI_RING_INDEX', '1') != '0',
+    'db_path': os.environ.get('INLI_RING_DB', fraud_ring_index.DEFAULT_DB_PATH),
+    'window_days': 90,
+    # Nombre d'AUTRES dossiers à partir duquel un identifiant est suspect
+    # (un grand employeur peut légitimement apparaître dans plusieurs dossiers)
+    'min_other_dossiers': {'siret': 5, 'siren': 5, 'phone': 2, 'email': 1, 'address': 3, 'iban': 1},
+    'retention_days': 365
+}
+
+# Documents émis par l'employeur : téléphones et emails de leur en-tête (standard, service RH)
+# communs à tous les salariés, non indexés
+EMPLOYER_DOCUMENT_PREFIXES = ('fiche_paie', 'contrat_travail')
+EMPLOYER_SIDE_FIELDS = {'phone': 'phones', 'email': 'emails'}
+
+IDENTIFIER_LABELS = {
+    'siret': 'SIRET', 'siren': 'SIREN', 'phone': 'Téléphone',
+    'email': 'Email', 'address': 'Adresse', 'iban': 'IBAN'
+}
+
+
+def collect_dossier_identifiers(structured_data: Dict) -> List[Tuple[str, str]]:
+    """
+    Identifiants (type, valeur brute) extraits des documents du dossier
+
+    Téléphones et emails des documents de l'employeur (fiches de paie, contrat) exclus,
+    ainsi que ceux des autres documents qui y figurent aussi : ce sont ceux de l'employeur.
+    """
+    employer_side = {(kind, fraud_ring_index.normalize_identifier(kind, value))
+                     for doc_key, data in structured_data.items() if doc_key.startswith(EMPLOYER_DOCUMENT_PREFIXES)
+                     for kind, field in EMPLOYER_SIDE_FIELDS.items() for value in data.get(field, [])}
+
+    identifiers = []
+    for doc_key, data in structured_data.items():
+        for siret in data.get('siret', []):
+            identifiers.append(('siret', siret))
+            identifiers.append(('siren', siret[:9]))
+        identifiers.extend(('siren', siren) for siren in data.get('siren', []))
+        identifiers.extend(('address', address) for address in data.get('addresses', []))
+        identifiers.extend(('iban', iban) for iban in data.get('ibans', []))
+        if doc_key.startswith(EMPLOYER_DOCUMENT_PREFIXES):
+            continue
+        for kind, field in EMPLOYER_SIDE_FIELDS.items():
+            identifiers.extend((kind, value) for value in data.get(field, [])
+                               if (kind, fraud_ring_index.normalize_identifier(kind, value)) not in employer_side)
+    return identifiers
+
+
+def lookup_fraud_rings(structured_data: Dict, dossier_id: str) -> List[Dict]:
+    """
+    Identifiants du dossier déjà présents dans d'autres dossiers récents
+
+    Returns:
+        list: [{'kind', 'value', 'dossiers', 'count'}], du plus partagé au moins partagé
+    """
+    if not FRAUD_RING_CONFIG['enabled']:
+        return []
+
+    try:
+        matches = fraud_ring_index.get_index(FRAUD_RING_CONFIG['db_path']).lookup(
+            collect_dossier_identifiers(structured_data),
+            exclude_dossier=dossier_id,
+            window_days=FRAUD_RING_CONFIG['window_days']
+        )
+    except Exception:
+        return []
+
+    return sorted(
+        ({'kind': kind, 'value': value, 'dossiers': dossiers, 'count': len(dossiers)}
+         for (kind, value), dossiers in matches.items()),
+        key=lambda match: -match['count']
+    )
+
+
+def index_dossier_identifiers(structured_data: Dict, dossier_id: str):
+    """Ajoute (ou met à jour) les identifiants du dossier dans l'index inter-dossiers"""
+    if not FRAUD_RING_CONFIG['enabled']:
+        return
+    try:
+        index = fraud_ring_index.get_index(FRAUD_RING_CONFIG['db_path'])
+        index.index_dossier(dossier_id, collect_dossier_identifiers(structured_data))
+        index.purge(FRAUD_RING_CONFIG['retention_days'])
+    except Exception:
+        pass
+
+
+# Documents quasi identiques à ceux d'autres dossiers (MinHash + LSH)
+NEAR_DUPLICATE_CONFIG = {
+    'enabled': os.environ.get('INLI_MINHASH_INDEX', '1') != '0',
+    'db_path': os.environ.get('INLI_MINHASH_DB', near_duplicates.DEFAULT_DB_PATH),
+    'threshold': 0.8,               # Similarité de Jaccard estimée minimale
+    'min_text_length': 200,         # En dessous, texte trop court pour être significatif
+    'image_max_distance': near_duplicates.IMAGE_MAX_DISTANCE,
+    'image_min_pixels': 250_000,    # Images plus petites (logos de l'employeur) non indexées
+    'image_page_coverage': 0.5,     # Part de la page au-delà de laquelle l'image est le contenu de la page
+    'retention_days': 365
+}
+
+
+def compute_text_signature(text: str) -> Optional[np.ndarray]:
+    """Signature MinHash du texte complet d'un document (None si désactivé ou texte trop court)"""
+    if not NEAR_DUPLICATE_CONFIG['enabled'] or not text or len(text) < NEAR_DUPLICATE_CONFIG['min_text_length']:
+        return None
+    return near_duplicates.minhash_signature(text)
+
+
+def document_image_hashes(image_results: List[Dict], page_content: bool = False) -> List[Dict]:
+    """
+    Empreintes (pHash, SHA-256) des images analysées d'un document, hors petites images
+
+    Args:
+        image_results: Résultats d'analyse des images (analyze_pdf_images ou image déposée)
+        page_content: Les images sont le contenu des pages (image déposée, PDF sans texte
+            extractible) ; sinon, seules les images couvrant l'essentiel de leur page le sont
+            (les autres peuvent être le fond ou l'en-tête du modèle du logiciel de paie)
+    """
+    hashes = []
+    for r in image_results:
+        width, height = r.get('size') or (0, 0)
+        if r.get('phash') is None or width * height < NEAR_DUPLICATE_CONFIG['image_min_pixels']:
+            continue
+        covers_page = (r.get('coverage') or 0) >= NEAR_DUPLICATE_CONFIG['image_page_coverage']
+        hashes.append({'name': f"p{r['page']}_{r['name']}" if r.get('page') else 'image',
+                       'page': r.get('page'), 'phash': r['phash'], 'sha256': r.get('sha256'),
+                       'page_content': page_content or covers_page})
+    return hashes
+
+
+def lookup_near_duplicates(documents_data: Dict, dossier_id: str) -> List[Dict]:
+    """
+    Documents du dossier quasi identiques à des documents d'autres dossiers
+    (texte, ou image intégrée / déposée identique)
+
+    Returns:
+        list: [{'document', 'kind': 'text' | 'image', 'matches': [{'dossier_id', 'doc_type', 'similarity', ...}]}]
+    """
+    if not NEAR_DUPLICATE_CONFIG['enabled']:
+        return []
+
+    duplicates = []
+    try:
+        index = near_duplicates.get_index(NEAR_DUPLICATE_CONFIG['db_path'])
+        for doc_key, doc_data in documents_data.items():
+            signature = doc_data.get('text_signature')
+            if signature is None:
+                continue
+            matches = index.query(signature, NEAR_DUPLICATE_CONFIG['threshold'], exclude_dossier=dossier_id)
+            if matches:
+                duplicates.append({'document': doc_key, 'kind': 'text', 'matches': matches})
+        for doc_key, doc_data in documents_data.items():
+            for image in doc_data.get('image_hashes') or []:
+                matches = index.query_image(image['phash'], image.get('sha256'),
+                                            NEAR_DUPLICATE_CONFIG['image_max_distance'], exclude_dossier=dossier_id)
+                if matches:
+                    duplicates.append({'document': doc_key, 'kind': 'image', 'image': image, 'matches': matches})
+    except Exception:
+        return []
+    return duplicates
+
+
+def index_document_signatures(documents_data: Dict, dossier_id: str):
+    """Ajoute (ou met à jour) les signatures des documents du dossier dans l'index LSH"""
+    if not NEAR_DUPLICATE_CONFIG['enabled']:
+        return
+    try:
+        index = near_duplicates.get_index(NEAR_DUPLICATE_CONFIG['db_path'])
+        index.add_dossier(dossier_id, {doc_key: doc.get('text_signature') for doc_key, doc in documents_data.items()})
+        index.add_dossier_images(dossier_id, {doc_key: doc.get('image_hashes') for doc_key, doc in documents_data.items()})
+        index.purge(NEAR_DUPLICATE_CONFIG['retention_days'])
+    except Exception:
+        pass
+
+
 # ======================
-# DÉTECTEUR RED FLAGS EXPERT v4.0
+# PRÉCHARGEMENT DES VALIDATIONS (PIPELINE)
 # ======================
 
-def detect_red_flags(documents_data: Dict, structured_data: Dict, external_validations: Dict) -> List[Dict]:
+# Les identifiants de chaque document sont validés en tâche de fond dès son
+# extraction : la latence réseau se recouvre avec l'analyse des documents
+# suivants, et la phase 2 ne lit plus que des caches.
+PREFETCH_CONFIG = {
+    'enabled': os.environ.get('INLI_PREFETCH', '1') == '1',
+    'workers': 4,
+    'employer_reserve': 1           # Appels SIRENE gardés pour le SIRET employeur (connu en fin de phase 1)
+}
+
+
+def document_identifiers(structured: Optional[Dict]) -> List[Tuple[str, object]]:
+    """Identifiants d'un document à valider (SIRET, adresses groupées par document, emails)"""
+    if not structured:
+        return []
+    identifiers = [('siret', siret) for siret in structured.get('siret', [])]
+    addresses = tuple(dict.fromkeys(addr['full_address'] for addr in structured.get('addresses_detailed', [])
+                                    if isinstance(addr, dict) and addr.get('full_address')))
+    if addresses:
+        identifiers.append(('addresses', addresses))
+    identifiers.extend(('email', email) for email in structured.get('emails', []))
+    return identifiers
+
+
+def _prefetch_siret(siret: str) -> bool:
+    # Le siège est géocodé en phase 2 avec les autres points de la matrice (un seul appel /search/csv/)
+    if siret in get_sirene_cache():
+        return False
+    validate_siret_insee(siret)
+    return True
+
+
+def _prefetch_addresses(addresses: Tuple[str, ...]) -> bool:
+    address_cache = get_address_cache()
+    if all(address_cache.get(address) is not None for address in addresses):
+        return False
+    validate_addresses_batch(list(addresses))
+    return True
+
+
+def _prefetch_email(email: str) -> bool:
+    if get_email_cache().get(email) is not None:
+        return False
+    validate_email_advanced(email)
+    return True
+
+
+def create_prefetch_pipeline() -> prefetch_pipeline.PrefetchPipeline:
     """
-    Détection de 20+ signaux d'alerte RED FLAGS
-    Version 4.0 - Expert 40 ans d'expérience
+    Pipeline de préchargement d'un dossier
+
+    Les SIRET arrivent dans l'ordre des documents, avant que l'employeur soit connu :
+    le préchargement laisse une part du budget SIRENE du dossier au SIRET employeur,
+    que validate_all_sirets vérifie en premier (select_employer_siret).
     """
+    siret_limit = API_CONFIG['insee_sirene']['max_requests_per_dossier'] - PREFETCH_CONFIG['employer_reserve']
+    return prefetch_pipeline.PrefetchPipeline(
+        {'siret': _prefetch_siret, 'addresses': _prefetch_addresses, 'email': _prefetch_email},
+        workers=PREFETCH_CONFIG['workers'],
+        limits={'siret': max(0, siret_limit)}
+    )
 
-    red_flags = []
 
-    # ========== RED FLAG 1 : Entreprise récente + Salaire élevé ==========
-    if 'siret_validation' in external_validations:
-        siret_info = external_validations['siret_validation']
-        if siret_info and siret_info.get('exists') and siret_info.get('creation_date'):
-            try:
-                creation_year = int(siret_info['creation_date'][:4])
-                current_year = datetime.now().year
-
-                if current_year - creation_year < 1:
-                    # Vérifier salaires
-                    all_salaries = []
-                    for doc_key, data in structured_data.items():
-                        if 'fiche_paie' in doc_key:
-                            for amt in data.get('amounts', []):
-                                if amt['category'] == 'salaire':
-                                    all_salaries.append(amt['value'])
-
-                    if all_salaries and max(all_salaries) > 3500:
-                        red_flags.append({
-                            'severity': 'high',
-                            'category': 'Entreprise',
-                            'message': f"🚨 Entreprise créée en {creation_year} (< 1 an) avec salaire élevé ({max(all_salaries):.0f}€) - Très suspect",
-                            'score_impact': 30
-                        })
-            except:
-                pass
+# ======================
+# DÉTECTEUR RED FLAGS EXPERT v4.0
+# ======================
+
+# Chaque red flag est une règle déclarative sur des caractéristiques du dossier,
+# calculées une seule fois (voir rule_engine.py). Entrées : documents_data,
+# structured_data, external_validations et features (dossier_features.DossierFeatures).
+RED_FLAG_ENGINE = rule_engine.RuleEngine()
+
+EXECUTIVE_KEYWORDS = ['cadre', 'directeur', 'manager', 'responsable', 'chef']
+
+
+@RED_FLAG_ENGINE.feature('siret_info')
+def _feature_siret_info(ctx):
+    return ctx['external_validations'].get('siret_validation')
+
 
-    # ========== RED FLAG 2 : Adresse domicile = Adresse entreprise ==========
+@RED_FLAG_ENGINE.feature('addresses_by_role')
+def _feature_addresses_by_role(ctx):
+    """Adresses détaillées côté domicile (identité, quittances) et côté entreprise (contrat, fiches de paie)"""
     home_addresses = []
     company_addresses = []
-
-    for doc_key, data in structured_data.items():
+    for doc_key, data in ctx['structured_data'].items():
         if 'piece_identite' in doc_key or 'quittance' in doc_key:
             home_addresses.extend(data.get('addresses_detailed', []))
         if 'contrat_travail' in doc_key or 'fiche_paie' in doc_key:
             company_addresses.extend(data.get('addresses_detailed', []))
+    return {'home': home_addresses, 'company': company_addresses}
 
-    for home_addr in home_addresses:
-        for comp_addr in company_addresses:
-            if isinstance(home_addr, dict) and isinstance(comp_addr, dict):
-                # Comparer codes postaux
-                if home_addr.get('code_postal') == comp_addr.get('code_postal'):
-                    # Comparer rues
-                    if addresses_are_similar(home_addr.get('full_address', ''), comp_addr.get('full_address', ''), threshold=0.7):
-                        red_flags.append({
-                            'severity': 'critical',
-                            'category': 'Adresse',
-                            'message': f"🚨🚨 FRAUDE PROBABLE : Adresse domicile identique à l'entreprise !",
-                            'score_impact': 45
-                        })
 
-    # ========== RED FLAG 3 : Email gratuit pour poste cadre ==========
-    for doc_key, data in structured_data.items():
-        emails_detailed = data.get('emails_detailed', [])
-        text = documents_data.get(doc_key, {}).get('text_extract', '').lower()
-
-        if any(word in text for word in ['cadre', 'directeur', 'manager', 'responsable', 'chef']):
-            for email_info in emails_detailed:
-                if email_info.get('type') == 'personal':
-                    red_flags.append({
-                        'severity': 'medium',
-                        'category': 'Email',
-                        'message': f"⚠️ Email personnel ({email_info['email']}) pour poste cadre - Inhabituel",
-                        'score_impact': 15
+@RED_FLAG_ENGINE.feature('emails')
+def _feature_emails(ctx):
+    """(document, email détaillé) pour chaque email extrait"""
+    return [(doc_key, email_info)
+            for doc_key, data in ctx['structured_data'].items()
+            for email_info in data.get('emails_detailed', [])]
+
+
+@RED_FLAG_ENGINE.feature('email_validations', depends_on=['emails'])
+def _feature_email_validations(ctx):
+    """Format et domaine jetable, une seule fois par adresse email distincte (sans DNS)"""
+    validations = {}
+    for _, email_info in ctx['emails']:
+        email = email_info.get('email', '')
+        if email not in validations:
+            validations[email] = validate_email_advanced(email, check_dns=False)
+    return validations
+
+
+@RED_FLAG_ENGINE.feature('executive_documents')
+def _feature_executive_documents(ctx):
+    """Documents dont le texte évoque un poste de cadre"""
+    documents_data = ctx['documents_data']
+    return {
+        doc_key for doc_key in ctx['structured_data']
+        if any(word in documents_data.get(doc_key, {}).get('text_extract', '').lower() for word in EXECUTIVE_KEYWORDS)
+    }
+
+
+@RED_FLAG_ENGINE.feature('home_work_distance')
+def _feature_home_work_distance(ctx):
+    home = ctx['external_validations'].get('address_home')
+    work = ctx['external_validations'].get('address_work')
+    if home and work and home.get('latitude') and work.get('latitude'):
+        return calculate_distance(home['latitude'], home['longitude'], work['latitude'], work['longitude'])
+    return None
+
+
+# ========== RED FLAG 1 : Entreprise récente + Salaire élevé ==========
+@RED_FLAG_ENGINE.rule('entreprise_recente_salaire_eleve', features=['siret_info', 'features'])
+def _rule_recent_company_high_salary(ctx):
+    siret_info = ctx['siret_info']
+    if not (siret_info and siret_info.get('exists') and siret_info.get('creation_date')):
+        return None
+    try:
+        creation_year = int(siret_info['creation_date'][:4])
+    except (TypeError, ValueError):
+        return None
+
+    max_salary = ctx['features'].get('payslip_salary_max')
+    if datetime.now().year - creation_year < 1 and max_salary is not None and max_salary > 3500:
+        return {
+            'severity': 'high',
+            'category': 'Entreprise',
+            'message': f"🚨 Entreprise créée en {creation_year} (< 1 an) avec salaire élevé ({max_salary:.0f}€) - Très suspect",
+            'score_impact': 30
+        }
+    return None
+
+
+# ========== RED FLAG 2 : Adresse domicile = Adresse entreprise ==========
+@RED_FLAG_ENGINE.rule('adresse_domicile_entreprise', features=['addresses_by_role'])
+def _rule_home_equals_company(ctx):
+    flags = []
+    for home_addr in ctx['addresses_by_role']['home']:
+        for comp_addr in ctx['addresses_by_role']['company']:
+            if isinstance(home_addr, dict) and isinstance(comp_addr, dict):
+                # Même code postal et rues similaires
+                if home_addr.get('code_postal') == comp_addr.get('code_postal') and addresses_are_similar(
+                        home_addr.get('full_address', ''), comp_addr.get('full_address', ''), threshold=0.7):
+                    flags.append({
+                        'severity': 'critical',
+                        'category': 'Adresse',
+                        'message': "🚨🚨 FRAUDE PROBABLE : Adresse domicile identique à l'entreprise !",
+                        'score_impact': 45
                     })
+    return flags
+
+
+# ========== RED FLAG 3 : Email gratuit pour poste cadre ==========
+@RED_FLAG_ENGINE.rule('email_personnel_cadre', features=['emails', 'executive_documents'])
+def _rule_personal_email_executive(ctx):
+    return [{
+        'severity': 'medium',
+        'category': 'Email',
+        'message': f"⚠️ Email personnel ({email_info['email']}) pour poste cadre - Inhabituel",
+        'score_impact': 15
+    } for doc_key, email_info in ctx['emails']
+        if doc_key in ctx['executive_documents'] and email_info.get('type') == 'personal']
+
+
+# ========== RED FLAG 4 : Distance domicile-travail excessive ==========
+@RED_FLAG_ENGINE.rule('distance_domicile_travail', features=['home_work_distance'])
+def _rule_home_work_distance(ctx):
+    distance = ctx['home_work_distance']
+    if distance and distance > 200:
+        return {
+            'severity': 'medium',
+            'category': 'Géographie',
+            'message': f"⚠️ Distance domicile-travail très importante ({distance} km) - Vérifier télétravail",
+            'score_impact': 12
+        }
+    return None
 
-    # ========== RED FLAG 4 : Distance domicile-travail excessive ==========
-    if 'address_home' in external_validations and 'address_work' in external_validations:
-        home = external_validations['address_home']
-        work = external_validations['address_work']
 
-        if home and work and home.get('latitude') and work.get('latitude'):
-            distance = calculate_distance(
-                home['latitude'], home['longitude'],
-                work['latitude'], work['longitude']
-            )
+# ========== RED FLAG 5 : Incohérence salaire vs revenus ==========
+@RED_FLAG_ENGINE.rule('incoherence_salaire_revenus', features=['features'])
+def _rule_salary_vs_revenue(ctx):
+    features = ctx['features']
+    if not (features['salary_count'] and features['revenue_count']):
+        return None
 
-            if distance and distance > 200:
-                red_flags.append({
-                    'severity': 'medium',
-                    'category': 'Géographie',
-                    'message': f"⚠️ Distance domicile-travail très importante ({distance} km) - Vérifier télétravail",
-                    'score_impact': 12
-                })
-            elif distance and distance > 500:
-                red_flags.append({
-                    'severity': 'high',
-                    'category': 'Géographie',
-                    'message': f"🚨 Distance domicile-travail anormale ({distance} km) - Suspect",
-                    'score_impact': 25
-                })
+    avg_monthly = features['salary_mean']
+    expected_annual = avg_monthly * 12
+    actual_annual = features['revenue_max']
 
-    # ========== RED FLAG 5 : Incohérence salaire vs revenus ==========
-    monthly_salaries = []
-    annual_revenues = []
+    if abs(expected_annual - actual_annual) / expected_annual > 0.35:
+        deviation = abs(expected_annual - actual_annual) / expected_annual * 100
+        return {
+            'severity': 'critical',
+            'category': 'Revenus',
+            'message': f"🚨 Incohérence MAJEURE : Salaire mensuel moyen ({avg_monthly:.0f}€) vs Revenu annuel ({actual_annual:.0f}€) - Écart {deviation:.0f}%",
+            'score_impact': 40
+        }
+    return None
 
-    for doc_key, data in structured_data.items():
-        for amt in data.get('amounts', []):
-            if amt['category'] == 'salaire':
-                monthly_salaries.append(amt['value'])
-            elif amt['category'] == 'revenu':
-                annual_revenues.append(amt['value'])
-
-    if monthly_salaries and annual_revenues:
-        avg_monthly = sum(monthly_salaries) / len(monthly_salaries)
-        expected_annual = avg_monthly * 12
-        actual_annual = max(annual_revenues)
-
-        if abs(expected_annual - actual_annual) / expected_annual > 0.35:
-            deviation = abs(expected_annual - actual_annual) / expected_annual * 100
-            red_flags.append({
-                'severity': 'critical',
-                'category': 'Revenus',
-                'message': f"🚨 Incohérence MAJEURE : Salaire mensuel moyen ({avg_monthly:.0f}€) vs Revenu annuel ({actual_annual:.0f}€) - Écart {deviation:.0f}%",
-                'score_impact': 40
-            })
 
-    # ========== RED FLAG 6 : Entreprise fermée/radiée ==========
-    if 'siret_validation' in external_validations:
-        siret_info = external_validations['siret_validation']
-        if siret_info and siret_info.get('status') == 'Fermée':
-            red_flags.append({
-                'severity': 'critical',
-                'category': 'Entreprise',
-                'message': "🚨🚨 FRAUDE CONFIRMÉE : Entreprise FERMÉE selon INSEE !",
-                'score_impact': 50
-            })
+# ========== RED FLAG 6 : Entreprise fermée/radiée ==========
+@RED_FLAG_ENGINE.rule('entreprise_fermee', features=['siret_info'])
+def _rule_closed_company(ctx):
+    siret_info = ctx['siret_info']
+    if siret_info and siret_info.get('status') == 'Fermée':
+        return {
+            'severity': 'critical',
+            'category': 'Entreprise',
+            'message': "🚨🚨 FRAUDE CONFIRMÉE : Entreprise FERMÉE selon INSEE !",
+            'score_impact': 50
+        }
+    return None
 
-    # ========== RED FLAG 7 : Salaire anormalement élevé ==========
-    if monthly_salaries:
-        max_salary = max(monthly_salaries)
-        if max_salary > 15000:
-            red_flags.append({
-                'severity': 'high',
-                'category': 'Salaire',
-                'message': f"🚨 Salaire très élevé ({max_salary:.0f}€/mois) - Vérification approfondie nécessaire",
-                'score_impact': 25
-            })
 
-    # ========== RED FLAG 8 : Aucun SIRET trouvé ==========
-    all_sirets = []
-    for data in structured_data.values():
-        all_sirets.extend(data.get('siret', []))
+# ========== RED FLAG 7 : Salaire anormalement élevé ==========
+@RED_FLAG_ENGINE.rule('salaire_tres_eleve', features=['features'])
+def _rule_very_high_salary(ctx):
+    max_salary = ctx['features'].get('salary_max')
+    if max_salary is not None and max_salary > 15000:
+        return {
+            'severity': 'high',
+            'category': 'Salaire',
+            'message': f"🚨 Salaire très élevé ({max_salary:.0f}€/mois) - Vérification approfondie nécessaire",
+            'score_impact': 25
+        }
+    return None
+
 
-    if not all_sirets:
-        red_flags.append({
+# ========== RED FLAG 8 : Aucun SIRET trouvé ==========
+@RED_FLAG_ENGINE.rule('aucun_siret', features=['features'])
+def _rule_no_siret(ctx):
+    if not ctx['features']['siret_count']:
+        return {
             'severity': 'high',
             'category': 'Entreprise',
             'message': "⚠️ Aucun SIRET détecté - Document incomplet ou falsifié",
             'score_impact': 30
-        })
+        }
+    return None
+
+
+# ========== RED FLAG 9 : Email jetable détecté ==========
+@RED_FLAG_ENGINE.rule('email_jetable', features=['emails', 'email_validations'])
+def _rule_disposable_email(ctx):
+    return [{
+        'severity': 'critical',
+        'category': 'Email',
+        'message': f"🚨 Email jetable détecté : {email_info['email']} - FRAUDE",
+        'score_impact': 40
+    } for _, email_info in ctx['emails']
+        if ctx['email_validations'][email_info.get('email', '')].get('disposable')]
+
+
+# ========== RED FLAG 10 : Variation salaire excessive entre fiches ==========
+@RED_FLAG_ENGINE.rule('variation_salaire', features=['features'])
+def _rule_salary_variation(ctx):
+    features = ctx['features']
+    if features['salary_count'] < 2:
+        return None
 
-    # ========== RED FLAG 9 : Email jetable détecté ==========
-    for doc_key, data in structured_data.items():
-        for email_info in data.get('emails_detailed', []):
-            email_validation = validate_email_advanced(email_info.get('email', ''))
-            if email_validation.get('disposable'):
-                red_flags.append({
+    max_sal = features['salary_max']
+    min_sal = features['salary_min']
+    variation = ((max_sal - min_sal) / min_sal) * 100
+    if variation > 50:
+        return {
+            'severity': 'high',
+            'category': 'Salaire',
+            'message': f"🚨 Variation importante entre fiches de paie : {variation:.0f}% (de {min_sal:.0f}€ à {max_sal:.0f}€)",
+            'score_impact': 28
+        }
+    return None
+
+
+# ========== RED FLAG 11 : Adresse non validée par API ==========
+@RED_FLAG_ENGINE.rule('adresse_non_validee')
+def _rule_unvalidated_address(ctx):
+    home = ctx['external_validations'].get('address_home')
+    if home and not home.get('valid') and not home.get('skipped'):
+        return {
+            'severity': 'medium',
+            'category': 'Adresse',
+            'message': "⚠️ Adresse domicile non validée par API Data.gouv - Vérifier manuellement",
+            'score_impact': 18
+        }
+    return None
+
+
+# ========== RED FLAG 12 : SIRET existe mais adresse ne correspond pas ==========
+@RED_FLAG_ENGINE.rule('adresse_insee_differente', features=['siret_info', 'addresses_by_role'])
+def _rule_insee_address_mismatch(ctx):
+    siret_info = ctx['siret_info']
+    company_addresses = ctx['addresses_by_role']['company']
+    if not (siret_info and siret_info.get('exists') and siret_info.get('address') and company_addresses):
+        return None
+
+    insee_address = siret_info['address'].lower()
+    insee_address_clean = insee_address.replace(' ', '').replace(',', '').replace('-', '')
+
+    # Extraire code postal de l'adresse INSEE
+    insee_cp_match = re.search(r'\b(\d{5})\b', insee_address)
+    insee_cp = insee_cp_match.group(1) if insee_cp_match else None
+
+    for comp_addr in company_addresses:
+        if not isinstance(comp_addr, dict):
+            continue
+        comp_full = comp_addr.get('full_address', '').lower()
+        comp_clean = comp_full.replace(' ', '').replace(',', '').replace('-', '')
+
+        # Critère 1 : Code postal identique
+        if insee_cp and comp_addr.get('code_postal', '') == insee_cp:
+            return None
+
+        # Critère 2 : Nom de rue présent dans l'adresse INSEE
+        comp_rue = comp_addr.get('nom_voie', '').lower()
+        if comp_rue and len(comp_rue) > 5 and (comp_rue in insee_address or insee_address in comp_full):
+            return None
+
+        # Critère 3 : Similarité globale (au moins 50% des caractères en commun)
+        if len(comp_clean) > 10 and len(insee_address_clean) > 10:
+            common_chars = sum(1 for c in comp_clean if c in insee_address_clean)
+            if common_chars / max(len(comp_clean), len(insee_address_clean)) > 0.5:
+                return None
+
+    return {
+        'severity': 'high',
+        'category': 'Entreprise',
+        'message': "🚨 Adresse entreprise ne correspond pas à l'adresse INSEE - Suspect",
+        'score_impact': 32
+    }
+
+
+# ========== RED FLAG 13 : Justificatifs de domicile géographiquement incohérents ==========
+@RED_FLAG_ENGINE.rule('domiciles_incoherents')
+def _rule_inconsistent_domiciles(ctx):
+    # Un seul signal par dossier : trois justificatifs incohérents ne triplent pas l'impact
+    geo_matrix = ctx['external_validations'].get('geo_matrix') or {}
+    inconsistencies = geo_matrix.get('domicile_inconsistencies', [])
+    if not inconsistencies:
+        return []
+    pairs = [f"{doc_a.replace('_', ' ')} et {doc_b.replace('_', ' ')} ({inconsistency['distance_km']} km)"
+             for inconsistency in inconsistencies
+             for doc_a, doc_b in [inconsistency['documents']]]
+    return [{
+        'severity': 'high',
+        'category': 'Géographie',
+        'message': f"🚨 Justificatifs de domicile incohérents : {' ; '.join(pairs)}",
+        'score_impact': 30
+    }]
+
+
+# ========== RED FLAG 14 : Identifiant partagé avec d'autres dossiers (réseau) ==========
+@RED_FLAG_ENGINE.rule('identifiant_multi_dossiers')
+def _rule_shared_identifier(ctx):
+    flags = []
+    for match in ctx['external_validations'].get('ring_matches') or []:
+        if match['count'] < FRAUD_RING_CONFIG['min_other_dossiers'].get(match['kind'], 1):
+            continue
+        critical = match['count'] >= 2 * FRAUD_RING_CONFIG['min_other_dossiers'].get(match['kind'], 1)
+        flags.append({
+            'severity': 'critical' if critical else 'high',
+            'category': 'Réseau',
+            'message': f"🚨 {IDENTIFIER_LABELS.get(match['kind'], match['kind'])} {match['value']} déjà vu dans {match['count']} autre(s) dossier(s) sur les {FRAUD_RING_CONFIG['window_days']} derniers jours - Réseau de fraude possible",
+            'score_impact': 45 if critical else 30
+        })
+    return flags
+
+
+# ========== RED FLAG 15 : Document quasi identique à celui d'un autre dossier ==========
+@RED_FLAG_ENGINE.rule('document_quasi_identique')
+def _rule_near_duplicate_document(ctx):
+    flags = []
+    for duplicate in ctx['external_validations'].get('near_duplicates') or []:
+        best = duplicate['matches'][0]
+        if duplicate.get('kind') == 'image':
+            # Octets identiques : même scan ; empreinte proche seulement : même modèle de page possible.
+            # Une image qui n'est pas le contenu de la page (fond, en-tête du logiciel de paie)
+            # est commune à tous les documents issus du même modèle : signal faible
+            page = f" (page {duplicate['image']['page']})" if duplicate['image'].get('page') else ""
+            other = f"d'un document ({best['doc_type'].replace('_', ' ')}) d'un autre dossier"
+            if not duplicate['image'].get('page_content', True):
+                flags.append({
+                    'severity': 'medium',
+                    'category': 'Document',
+                    'message': f"⚠️ Élément graphique de {duplicate['document'].replace('_', ' ')}{page} "
+                               f"{'identique' if best['identical'] else 'quasi identique'} à celui {other} "
+                               f"- Même modèle de document (fond ou en-tête) ou gabarit de faux",
+                    'score_impact': 10
+                })
+            elif best['identical']:
+                flags.append({
                     'severity': 'critical',
-                    'category': 'Email',
-                    'message': f"🚨 Email jetable détecté : {email_info['email']} - FRAUDE",
+                    'category': 'Document',
+                    'message': f"🚨 Image de {duplicate['document'].replace('_', ' ')}{page} identique à celle {other} - Scan réutilisé",
                     'score_impact': 40
                 })
+            else:
+                flags.append({
+                    'severity': 'medium',
+                    'category': 'Document',
+                    'message': f"⚠️ Image de {duplicate['document'].replace('_', ' ')}{page} quasi identique ({best['similarity']:.0%}) "
+                               f"à celle {other} - Scan retouché ou même modèle de document",
+                    'score_impact': 15
+                })
+            continue
+        flags.append({
+            'severity': 'critical',
+            'category': 'Document',
+            'message': f"🚨 {duplicate['document'].replace('_', ' ').title()} quasi identique ({best['similarity']:.0%}) à un document ({best['doc_type'].replace('_', ' ')}) d'un autre dossier - Modèle réutilisé",
+            'score_impact': 40
+        })
+    return flags
 
-    # ========== RED FLAG 10 : Variation salaire excessive entre fiches ==========
-    if len(monthly_salaries) >= 2:
-        max_sal = max(monthly_salaries)
-        min_sal = min(monthly_salaries)
-        variation = ((max_sal - min_sal) / min_sal) * 100
-
-        if variation > 50:
-            red_flags.append({
-                'severity': 'high',
-                'category': 'Salaire',
-                'message': f"🚨 Variation importante entre fiches de paie : {variation:.0f}% (de {min_sal:.0f}€ à {max_sal:.0f}€)",
-                'score_impact': 28
-            })
 
-    # ========== RED FLAG 11 : Adresse non validée par API ==========
-    if 'address_home' in external_validations:
-        home = external_validations['address_home']
-        if home and not home.get('valid'):
-            red_flags.append({
-                'severity': 'medium',
-                'category': 'Adresse',
-                'message': f"⚠️ Adresse domicile non validée par API Data.gouv - Vérifier manuellement",
-                'score_impact': 18
-            })
+def evaluate_red_flags(documents_data: Dict, structured_data: Dict, external_validations: Dict,
+                       features: Optional[dossier_features.DossierFeatures] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Évalue toutes les règles RED FLAGS sur un dossier
+
+    Returns:
+        tuple: (red flags, rapport d'exécution avec temps par caractéristique et par règle)
+    """
+    if features is None:
+        features = dossier_features.extract_dossier_features(documents_data, structured_data)
+
+    return RED_FLAG_ENGINE.evaluate({
+        'documents_data': documents_data,
+        'structured_data': structured_data,
+        'external_validations': external_validations,
+        'features': features
+    })
 
-    # ========== RED FLAG 12 : SIRET existe mais adresse ne correspond pas ==========
-    if 'siret_validation' in external_validations and external_validations['siret_validation']:
-        siret_info = external_validations['siret_validation']
-        if siret_info.get('exists') and siret_info.get('address') and company_addresses:
-            insee_address = siret_info['address'].lower()
-            insee_address_clean = insee_address.replace(' ', '').replace(',', '').replace('-', '')
-            
-            # Extraire code postal de l'adresse INSEE
-            insee_cp_match = re.search(r'\b(\d{5})\b', insee_address)
-            insee_cp = insee_cp_match.group(1) if insee_cp_match else None
-
-            match_found = False
-            for comp_addr in company_addresses:
-                if isinstance(comp_addr, dict):
-                    comp_full = comp_addr.get('full_address', '').lower()
-                    comp_clean = comp_full.replace(' ', '').replace(',', '').replace('-', '')
-                    comp_cp = comp_addr.get('code_postal', '')
-                    
-                    # COMPARAISON INTELLIGENTE
-                    # Critère 1 : Code postal identique
-                    if insee_cp and comp_cp == insee_cp:
-                        match_found = True
-                        break
-                    
-                    # Critère 2 : Nom de rue similaire (au moins 70% de similarité)
-                    comp_rue = comp_addr.get('nom_voie', '').lower()
-                    if comp_rue and len(comp_rue) > 5:
-                        # Chercher le nom de rue dans l'adresse INSEE
-                        if comp_rue in insee_address or insee_address in comp_full:
-                            match_found = True
-                            break
-                    
-                    # Critère 3 : Similarité globale (au moins 50% des caractères en commun)
-                    if len(comp_clean) > 10 and len(insee_address_clean) > 10:
-                        # Compter les caractères communs
-                        common_chars = sum(1 for c in comp_clean if c in insee_address_clean)
-                        similarity = common_chars / max(len(comp_clean), len(insee_address_clean))
-                        if similarity > 0.5:
-                            match_found = True
-                            break
-
-            if not match_found:
-                red_flags.append({
-                    'severity': 'high',
-                    'category': 'Entreprise',
-                    'message': f"🚨 Adresse entreprise ne correspond pas à l'adresse INSEE - Suspect",
-                    'score_impact': 32
-                })
 
+def detect_red_flags(documents_data: Dict, structured_data: Dict, external_validations: Dict) -> List[Dict]:
+    """
+    Détection de 20+ signaux d'alerte RED FLAGS
+    Version 4.0 - Expert 40 ans d'expérience
+    """
+    red_flags, _ = evaluate_red_flags(documents_data, structured_data, external_validations)
     return red_flags
 
 
+# ======================
+# ARRÊT ANTICIPÉ (VERDICT DÉJÀ ÉTABLI)
+# ======================
+
+# Les étapes externes sont ordonnées par coût : recherches locales, SIRET,
+# géocodage, DNS. Les red flags ne faisant qu'augmenter le score, le score
+# calculé avec les signaux déjà connus est un minorant : dès qu'il atteint la
+# dernière bande de verdict, les étapes restantes ne peuvent plus le changer.
+EARLY_EXIT_CONFIG = {
+    'enabled': os.environ.get('INLI_EARLY_EXIT', '0') == '1',
+    'settled_score': GLOBAL_SCORE_BANDS[-2]['max']      # Début de la bande « FRAUDE PROBABLE »
+}
+
+EARLY_EXIT_SKIPPED = "Non vérifié – verdict déjà établi"
+
+
+def score_lower_bound(documents_data: Dict, structured_data: Dict, validations: Dict,
+                      features: dossier_features.DossierFeatures) -> float:
+    """Score global minimal compte tenu des validations déjà effectuées"""
+    cross_validation = cross_validate_dossier_advanced(documents_data, structured_data, features)
+    red_flags, _ = evaluate_red_flags(documents_data, structured_data, validations, features)
+
+    partial = dossier_features.DossierFeatures(values=features.values.copy())
+    dossier_features.add_validation_features(partial, cross_validation, {'red_flags': red_flags})
+    return compute_global_score(partial)[0]
+
+
 # ======================
 # ORCHESTRATION VALIDATION EXTERNE v4.0
 # ======================
 
-def perform_external_validations(documents_data: Dict, structured_data: Dict) -> Dict:
-    """Orchestre toutes les validations externes - Version 4.0"""
+def perform_external_validations(documents_data: Dict, structured_data: Dict,
+                                 features: Optional[dossier_features.DossierFeatures] = None,
+                                 early_exit: Optional[bool] = None,
+                                 siret_budget: Optional[int] = None) -> Dict:
+    """
+    Orchestre toutes les validations externes - Version 4.0
+
+    Avec early_exit (défaut : EARLY_EXIT_CONFIG), les étapes réseau restantes sont
+    sautées dès que le verdict « FRAUDE PROBABLE » est acquis ; elles sont listées
+    dans validations['skipped_checks'].
+
+    siret_budget : appels SIRENE restants si une partie du budget du dossier
+    a déjà été consommée par le préchargement (voir PREFETCH_CONFIG).
+    """
+
+    if features is None:
+        features = dossier_features.extract_dossier_features(documents_data, structured_data)
+    if early_exit is None:
+        early_exit = EARLY_EXIT_CONFIG['enabled']
 
     validations = {
         'siret_validation': None,
+        'employer_siret': None,
+        'siret_validations': {},
         'address_home': None,
         'address_work': None,
         'email_validation': None,
         'geographic_check': None,
+        'geo_matrix': None,
+        'ring_matches': [],
+        'near_duplicates': [],
         'red_flags': [],
+        'red_flags_report': None,
+        'early_exit': None,
+        'skipped_checks': [],
         'extraction_stats': {
             'total_sirets_found': 0,
             'total_addresses_found': 0,
@@ -1248,6 +2220,21 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
         }
     }
 
+    def verdict_settled(completed_stage: str) -> bool:
+        """Vrai si le score minimal atteint déjà la bande « FRAUDE PROBABLE »"""
+        if not early_exit or validations['early_exit']:
+            return bool(validations['early_exit'])
+        bound = score_lower_bound(documents_data, structured_data, validations, features)
+        if bound >= EARLY_EXIT_CONFIG['settled_score']:
+            validations['early_exit'] = {'after_stage': completed_stage, 'score_lower_bound': round(bound, 1)}
+            return True
+        return False
+
+    # 0. Recherches locales (coût négligeable) : identifiants et documents déjà vus
+    if features.dossier_id:
+        validations['ring_matches'] = lookup_fraud_rings(structured_data, features.dossier_id)
+        validations['near_duplicates'] = lookup_near_duplicates(documents_data, features.dossier_id)
+
     # 1. Validation SIRET
     all_sirets = []
     for data in structured_data.values():
@@ -1256,9 +2243,22 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
     validations['extraction_stats']['total_sirets_found'] = len(all_sirets)
 
     if all_sirets:
-        unique_sirets = list(set(all_sirets))
-        # Valider le premier SIRET trouvé
-        validations['siret_validation'] = validate_siret_insee(unique_sirets[0])
+        if verdict_settled('recherches locales'):
+            validations['skipped_checks'].append('Validation SIRET (INSEE)')
+        else:
+            # Tous les SIRET distincts sont vérifiés ; le verdict porte sur l'employeur
+            employer_siret, siret_validations = validate_all_sirets(structured_data, siret_budget)
+            validations['employer_siret'] = employer_siret
+            validations['siret_validations'] = siret_validations
+            validations['siret_validation'] = siret_validations.get(employer_siret)
+
+    # Géocodage groupé de toutes les adresses + matrice des distances
+    # (alimente aussi le cache utilisé ci-dessous pour domicile / entreprise)
+    skip_geocoding = verdict_settled('SIRET')
+    if skip_geocoding:
+        validations['skipped_checks'].append('Géocodage des adresses et matrice des distances')
+    else:
+        validations['geo_matrix'] = build_geo_matrix(structured_data, validations['siret_validations'])
 
     # 2. Validation adresses - LOGIQUE INTELLIGENTE
     # Stratégie : Séparer les adresses en fonction du contexte et du SIRET
@@ -1352,15 +2352,18 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
                 # On met tout en "adresses trouvées mais non classifiées"
                 home_addresses.append(addr)
     
+    skipped_address = {'valid': False, 'latitude': None, 'longitude': None,
+                       'error': EARLY_EXIT_SKIPPED, 'skipped': True}
+
     # Prendre la meilleure adresse domicile
     if home_addresses:
         best_home = max(home_addresses, key=lambda x: x.get('confidence', 0))
-        validations['address_home'] = validate_address_gouv(best_home['full_address'])
+        validations['address_home'] = dict(skipped_address) if skip_geocoding else validate_address_gouv(best_home['full_address'])
     
     # 3. Validation adresses ENTREPRISE
     if enterprise_addresses:
         best_work = max(enterprise_addresses, key=lambda x: x.get('confidence', 0))
-        validations['address_work'] = validate_address_gouv(best_work['full_address'])
+        validations['address_work'] = dict(skipped_address) if skip_geocoding else validate_address_gouv(best_work['full_address'])
     
     # Stats d'extraction
     validations['extraction_stats']['total_addresses_found'] = len(home_addresses) + len(enterprise_addresses)
@@ -1390,7 +2393,14 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
 
     if all_emails:
         unique_emails = list(set(all_emails))
-        validations['email_validation'] = validate_email_advanced(unique_emails[0])
+        if verdict_settled('géocodage'):
+            validations['skipped_checks'].append('Vérification DNS de l\'email')
+            email_validation = validate_email_advanced(unique_emails[0], check_dns=False)
+            email_validation['skipped'] = True
+            email_validation['warnings'].append(EARLY_EXIT_SKIPPED)
+            validations['email_validation'] = email_validation
+        else:
+            validations['email_validation'] = validate_email_advanced(unique_emails[0])
 
     # 6. Qualité d'extraction (score 0-100)
     quality_score = 0
@@ -1406,7 +2416,8 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
     validations['extraction_stats']['extraction_quality'] = quality_score
 
     # 7. RED FLAGS
-    validations['red_flags'] = detect_red_flags(documents_data, structured_data, validations)
+    validations['red_flags'], validations['red_flags_report'] = evaluate_red_flags(
+        documents_data, structured_data, validations, features)
 
     return validations
 
@@ -1415,90 +2426,16 @@ def perform_external_validations(documents_data: Dict, structured_data: Dict) ->
 # ANALYSE MÉTADONNÉES PDF v4.0
 # ======================
 
-def analyze_pdf_metadata_advanced(pdf_file):
-    """Analyse approfondie des métadonnées PDF avec détection de fraude"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        metadata = pdf_reader.metadata
-
-        suspicious_signs = []
-        risk_score = 0
-
-        creator = str(metadata.get('/Creator', '')) if metadata else ''
-        producer = str(metadata.get('/Producer', '')) if metadata else ''
-
-        # Liste éditeurs suspects (élargies)
-        suspicious_editors = [
-            'photoshop', 'gimp', 'canva', 'pixlr', 'paint.net',
-            'online', 'edit', 'pdf-editor', 'smallpdf', 'ilovepdf',
-            'sodapdf', 'pdfforge', 'nitro', 'foxit-edit', 'sejda',
-            'pdfescape', 'pdfcandy', 'easypdf', 'adobe acrobat'  # Acrobat ok mais suspecte si modif récente
-        ]
-
-        creator_lower = creator.lower()
-        producer_lower = producer.lower()
-
-        # Éditeurs très suspects
-        very_suspicious = ['photoshop', 'gimp', 'canva', 'paint', 'online']
-        if any(editor in creator_lower for editor in very_suspicious):
-            suspicious_signs.append(f"🚨 CRÉATEUR TRÈS SUSPECT : {creator}")
-            risk_score += 40
-        elif any(editor in creator_lower for editor in suspicious_editors):
-            suspicious_signs.append(f"⚠️ Créateur suspect : {creator}")
-            risk_score += 25
-
-        if any(editor in producer_lower for editor in very_suspicious):
-            suspicious_signs.append(f"🚨 PRODUCTEUR TRÈS SUSPECT : {producer}")
-            risk_score += 35
-        elif any(editor in producer_lower for editor in suspicious_editors):
-            suspicious_signs.append(f"⚠️ Producteur suspect : {producer}")
-            risk_score += 20
-
-        # Analyse des dates
-        creation_date = str(metadata.get('/CreationDate', '')) if metadata else ''
-        mod_date = str(metadata.get('/ModDate', '')) if metadata else ''
-
-        if creation_date:
-            try:
-                if creation_date.startswith('D:'):
-                    date_str = creation_date[2:10]
-                    doc_year = int(date_str[:4])
-                    doc_month = int(date_str[4:6])
-                    current_year = datetime.now().year
-                    current_month = datetime.now().month
-
-                    # Document créé il y a moins de 3 mois
-                    if current_year == doc_year and abs(current_month - doc_month) < 3:
-                        suspicious_signs.append(f"📅 Document créé récemment ({doc_month}/{doc_year})")
-                        risk_score += 20
-            except:
-                pass
-
-        # Modification après création
-        if creation_date and mod_date and creation_date != mod_date:
-            suspicious_signs.append("✏️ Document modifié après création")
-            risk_score += 15
-
-        # Nombre de pages anormal
-        num_pages = len(pdf_reader.pages)
-        if num_pages > 15:
-            suspicious_signs.append(f"📄 Nombre de pages inhabituel pour ce type de document : {num_pages}")
-            risk_score += 8
-
-        # Vérifier si le PDF est chiffré (suspect pour fiche de paie)
-        if pdf_reader.is_encrypted:
-            suspicious_signs.append("🔒 Document chiffré - Inhabituel pour une fiche de paie")
-            risk_score += 10
+def analyze_pdf_metadata_advanced(pdf_file, reader: Optional[PyPDF2.PdfReader] = None):
+    """
+    Analyse approfondie des métadonnées PDF avec détection de fraude
 
-        return {
-            'creator': creator or 'Non spécifié',
-            'producer': producer or 'Non spécifié',
-            'creation_date': format_pdf_date(creation_date) if creation_date else 'Non spécifiée',
-            'modification_date': format_pdf_date(mod_date) if mod_date else 'Non spécifiée',
-            'num_pages': num_pages,
-            'suspicious_signs': suspicious_signs,
-            'risk_score': min(risk_score, 100)
-        }
+    reader : PdfReader partagé avec l'extraction de texte et d'images (un seul parsing du fichier)
+    """
+    try:
+        return metadata_analyzer.assess_metadata(metadata_analyzer.extract_pdf_metadata(pdf_file, reader))
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
     except Exception as e:
         return {
             'creator': 'Erreur',
@@ -1506,39 +2443,34 @@ def analyze_pdf_metadata_advanced(pdf_file):
             'creation_date': 'Non disponible',
             'modification_date': 'Non disponible',
             'num_pages': 0,
+            'findings': [],
             'suspicious_signs': [f"❌ Erreur d'analyse : {str(e)}"],
             'risk_score': 50
         }
 
 
-def format_pdf_date(pdf_date_string):
-    """Convertit une date PDF au format lisible"""
-    try:
-        if pdf_date_string.startswith('D:'):
-            date_str = pdf_date_string[2:14]
-            year = date_str[0:4]
-            month = date_str[4:6]
-            day = date_str[6:8]
-            hour = date_str[8:10]
-            minute = date_str[10:12]
-            return f"{day}/{month}/{year} à {hour}h{minute}"
-        return pdf_date_string
-    except:
-        return pdf_date_string
-
-
 # ======================
 # EXTRACTION TEXTE PDF v4.0
 # ======================
 
-def extract_text_from_pdf_advanced(pdf_file):
-    """Extraction de texte avancée avec nettoyage"""
+def extract_text_from_pdf_advanced(pdf_file, text_runs: Optional[font_inventory.TextRunInventory] = None,
+                                   reader: Optional[PyPDF2.PdfReader] = None):
+    """
+    Extraction de texte avancée avec nettoyage
+
+    text_runs : inventaire des polices alimenté pendant la même passe d'extraction
+    reader : PdfReader déjà ouvert (partagé avec l'analyse des métadonnées)
+    """
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        pdf_reader = reader if reader is not None else PyPDF2.PdfReader(pdf_file)
         text = ""
 
         for page_num, page in enumerate(pdf_reader.pages, 1):
-            page_text = page.extract_text()
+            if text_runs is not None:
+                page_text = page.extract_text(visitor_text=text_runs.visitor)
+                text_runs.end_page(page_num)
+            else:
+                page_text = page.extract_text()
             if page_text:
                 text += f"\n--- Page {page_num} ---\n{page_text}\n"
 
@@ -1549,31 +2481,138 @@ def extract_text_from_pdf_advanced(pdf_file):
 
         return text, None
 
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
     except Exception as e:
         return None, f"❌ Erreur d'extraction : {str(e)}"
 
 
-def extract_text_from_image(image_file):
-    """Lecture basique d'image (OCR nécessite Tesseract)"""
+def apply_font_findings(metadata: Dict, text_runs: font_inventory.TextRunInventory) -> Dict:
+    """Ajoute aux métadonnées les montants rendus dans une police différente de leurs voisins"""
+    metadata['font_inventory'] = text_runs.summary()
+    if text_runs.findings:
+        for finding in text_runs.findings[:3]:
+            sign = f"🔤 {font_inventory.describe_finding(finding)}"
+            metadata['suspicious_signs'].append(sign)
+            metadata.setdefault('findings', []).append({'code': 'font_outlier', 'sign': sign, 'risk': 25})
+        if len(text_runs.findings) > 3:
+            metadata['suspicious_signs'].append(f"🔤 ... et {len(text_runs.findings) - 3} autre(s) montant(s) de police atypique")
+        metadata['risk_score'] = min(metadata.get('risk_score', 0) + 25, 100)
+    return metadata
+
+
+def apply_ela_findings(metadata: Dict, ela_results: List[Dict]) -> Dict:
+    """
+    Ajoute aux métadonnées le résultat de l'ELA (image déposée ou images intégrées au PDF)
+
+    Score >= FRAUD_THRESHOLDS['image_ela_score'] : zone retouchée probable ;
+    au-delà de la moitié du seuil : signal faible. Les images sans historique
+    JPEG (PNG, TIFF LZW, pixels bruts d'un PDF) sont listées avec ela_applicable faux.
+    """
+    threshold = FRAUD_THRESHOLDS['image_ela_score']
+    metadata['ela'] = {
+        'image_ela_score': max((r['score'] for r in ela_results), default=0.0),
+        'images': [{key: r.get(key) for key in ('page', 'name', 'ela_applicable', 'score', 'z_max', 'outlier_blocks',
+                                                 'hotspot', 'scale', 'elapsed_ms')}
+                   for r in ela_results]
+    }
+
+    bonus = 0
+    for r in ela_results:
+        location = f"page {r['page']}, " if r.get('page') else ""
+        if r['hotspot']:
+            location += f"autour de x={r['hotspot'][0]}, y={r['hotspot'][1]} px"
+        if r['score'] >= threshold:
+            metadata['suspicious_signs'].append(
+                f"🚨 ELA : zone de recompression atypique, retouche probable (score {r['score']:.2f}, "
+                f"{r['outlier_blocks']} bloc(s), {location})")
+            bonus = 40
+        elif r['score'] >= threshold / 2:
+            metadata['suspicious_signs'].append(
+                f"⚠️ ELA : écart de recompression localisé (score {r['score']:.2f}, {location})")
+            bonus = max(bonus, 15)
+    metadata['risk_score'] = min(metadata.get('risk_score', 0) + bonus, 100)
+    return metadata
+
+
+COPY_MOVE_CONFIG = {
+    'enabled': os.environ.get('INLI_COPY_MOVE', '1') == '1',
+    # Blocs indexés par image : au-delà, la copie de travail est réduite
+    'block_budget': int(os.environ.get('INLI_COPY_MOVE_BLOCK_BUDGET', str(image_forensics.COPY_MOVE_BLOCK_BUDGET)))
+}
+
+
+def copy_move_budget() -> Optional[int]:
+    """Budget de blocs de la détection de copier-coller (None si désactivée)"""
+    return COPY_MOVE_CONFIG['block_budget'] if COPY_MOVE_CONFIG['enabled'] else None
+
+
+def apply_copy_move_findings(metadata: Dict, image_results: List[Dict]) -> Dict:
+    """Ajoute aux métadonnées les zones dupliquées (copier-coller) des images analysées"""
+    regions = []
+    for r in image_results:
+        copy_move = r.get('copy_move')
+        if not copy_move or copy_move['repetitive']:
+            continue
+        for region in copy_move['regions']:
+            regions.append(dict(region, page=r.get('page')))
+
+    metadata['copy_move'] = {
+        'score': max((r['copy_move']['score'] for r in image_results if r.get('copy_move')), default=0.0),
+        'regions': regions
+    }
+    for region in regions[:3]:
+        page = f"page {region['page']}, " if region.get('page') else ""
+        metadata['suspicious_signs'].append(
+            f"🚨 Copier-coller : zones identiques {region['source']} et {region['target']} "
+            f"({page}décalage {region['offset']}, {region['blocks']} blocs)")
+    if regions:
+        metadata['risk_score'] = min(metadata.get('risk_score', 0) + 40, 100)
+    return metadata
+
+
+# Résolutions déclarées à la pyramide de décodage des images déposées
+OCR_DPI = int(os.environ.get('INLI_OCR_DPI', '300'))
+OCR_RESOLUTION = image_pyramid.Resolution('ocr', dpi=OCR_DPI)
+PREVIEW_MAX_SIDE = 800
+PREVIEW_RESOLUTION = image_pyramid.Resolution('preview', min_pixels=PREVIEW_MAX_SIDE * PREVIEW_MAX_SIDE * 3 // 4)
+
+
+def ocr_image(image: Image.Image) -> Optional[str]:
+    """Texte d'une image par Tesseract (None si pytesseract absent ou texte trop court)"""
+    try:
+        import pytesseract
+    except ImportError:
+        return None
+    text = pytesseract.image_to_string(image, lang='fra')
+    return text if text and len(text) > 20 else None
+
+
+def extract_text_from_image(pyramid: image_pyramid.ImagePyramid):
+    """Lecture d'image : OCR au niveau de résolution OCR_DPI (Tesseract optionnel)"""
     try:
-        img = Image.open(image_file)
-        width, height = img.size
+        width, height = pyramid.native_size
 
         # Tenter OCR si pytesseract est disponible
-        try:
-            import pytesseract
-            text = pytesseract.image_to_string(img, lang='fra')
-            if text and len(text) > 20:
-                return text, None
-        except ImportError:
-            pass
+        text = ocr_image(pyramid.level(OCR_RESOLUTION))
+        if text:
+            return text, None
 
         return None, f"📷 Image détectée ({width}x{height}px) - OCR nécessite Tesseract (optionnel)"
 
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
     except Exception as e:
         return None, f"❌ Erreur de lecture image : {str(e)}"
 
 
+def image_preview(pyramid: image_pyramid.ImagePyramid) -> Image.Image:
+    """Aperçu RGB de l'image déposée pour l'interface (PREVIEW_MAX_SIDE pixels de côté au plus)"""
+    preview = pyramid.level(PREVIEW_RESOLUTION).convert('RGB')
+    preview.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE))
+    return preview
+
+
 # ======================
 # VALIDATION DOCUMENT PROFESSIONNEL v4.0
 # ======================
@@ -1800,45 +2839,31 @@ def validate_quittance_loyer(text):
 
 
 def get_risk_level(score):
-    """Retourne le niveau de risque textuel"""
-    if score < 15:
-        return "Très faible"
-    elif score < 30:
-        return "Faible"
-    elif score < 50:
-        return "Modéré"
-    elif score < 70:
-        return "Élevé"
-    else:
-        return "Très élevé"
+    """Retourne le niveau de risque textuel (bandes RISK_LEVEL_BANDS)"""
+    for upper, level in RISK_LEVEL_BANDS:
+        if upper is None or score < upper:
+            return level
 
 
 # ======================
 # VALIDATION CROISÉE v4.0
 # ======================
 
-def cross_validate_dossier_advanced(documents_data, structured_data):
+def cross_validate_dossier_advanced(documents_data, structured_data, features=None):
     """Validation croisée avancée entre documents"""
     anomalies = []
     checks = {}
 
-    # Vérification cohérence fiches de paie
-    paie_docs = [k for k in documents_data.keys() if k.startswith('fiche_paie')]
+    if features is None:
+        features = dossier_features.extract_dossier_features(documents_data, structured_data)
 
-    if len(paie_docs) >= 2:
+    # Vérification cohérence fiches de paie (salaires > 800 €)
+    if features['n_payslips'] >= 2:
         checks['has_multiple_payslips'] = True
 
-        paie_amounts = []
-        for doc in paie_docs:
-            if doc in structured_data:
-                amounts = structured_data[doc].get('amounts', [])
-                for amt in amounts:
-                    if amt['category'] == 'salaire' and amt['value'] > 800:
-                        paie_amounts.append(amt['value'])
-
-        if len(paie_amounts) >= 2:
-            max_amount = max(paie_amounts)
-            min_amount = min(paie_amounts)
+        if features['payslip_salary_count_800'] >= 2:
+            max_amount = features['payslip_salary_max_800']
+            min_amount = features['payslip_salary_min_800']
             variation = ((max_amount - min_amount) / min_amount) * 100
 
             if variation > 50:
@@ -1853,8 +2878,7 @@ def cross_validate_dossier_advanced(documents_data, structured_data):
         anomalies.append("⚠️ Moins de 2 fiches de paie fournies - Dossier incomplet")
 
     # Documents requis
-    required_docs = ['contrat_travail', 'fiche_paie_1', 'avis_imposition', 'piece_identite']
-    missing_docs = [doc for doc in required_docs if doc not in documents_data]
+    missing_docs = list(features.missing_documents)
 
     if missing_docs:
         checks['all_required_docs'] = False
@@ -1872,69 +2896,63 @@ def cross_validate_dossier_advanced(documents_data, structured_data):
 # SCORE GLOBAL v4.0
 # ======================
 
-def calculate_global_score(documents_data, cross_validation, external_validations):
-    """Calcule le score global avec pondération v4.0"""
+def get_score_band(score: float) -> Dict:
+    """Bande de verdict (GLOBAL_SCORE_BANDS) correspondant à un score global"""
+    for band in GLOBAL_SCORE_BANDS:
+        if band['max'] is None or score < band['max']:
+            return band
 
-    # 1. Score documents (35%)
-    doc_scores = []
-    for doc_data in documents_data.values():
-        validation = doc_data.get('validation', {})
-        doc_scores.append(validation.get('score_fraude', 0))
 
-    avg_doc_score = sum(doc_scores) / len(doc_scores) if doc_scores else 0.5
+def compute_global_score(features: dossier_features.DossierFeatures) -> Tuple[float, float, float, float]:
+    """
+    Formule du score global (pondérations GLOBAL_SCORE_WEIGHTS)
 
-    # 2. Score validation croisée (25%)
-    cross_checks = cross_validation.get('checks', {})
-    cross_anomalies = len(cross_validation.get('anomalies', []))
+    Returns:
+        tuple: (score final, score documents, pénalité croisée, score red flags)
+    """
+    weights = GLOBAL_SCORE_WEIGHTS
+
+    # 1. Score documents (35%)
+    avg_doc_score = features.get('doc_score_mean', weights['default_document_score'])
 
-    failed_checks = sum(1 for v in cross_checks.values() if v is False)
-    cross_penalty = (failed_checks * 0.12) + (cross_anomalies * 0.06)
+    # 2. Score validation croisée (25%)
+    cross_penalty = (features['cross_failed_checks'] * weights['failed_check']) + (features['cross_anomalies'] * weights['cross_anomaly'])
 
     # 3. Score RED FLAGS (40%) - PONDÉRATION AUGMENTÉE
-    red_flags = external_validations.get('red_flags', [])
-    red_flag_score = sum(flag['score_impact'] for flag in red_flags) / 100
-    red_flag_score = min(red_flag_score, 1.0)
+    red_flag_score = min(features['red_flag_impact'] / weights['red_flag_points'], 1.0)
 
     # Score final pondéré
-    final_score = (avg_doc_score * 0.35 + cross_penalty * 0.25 + red_flag_score * 0.40) * 100
-    final_score = min(final_score, 100)
+    final_score = (avg_doc_score * weights['documents'] + cross_penalty * weights['cross_validation']
+                   + red_flag_score * weights['red_flags']) * 100
+    return min(final_score, 100), avg_doc_score, cross_penalty, red_flag_score
+
+
+def calculate_global_score(documents_data, cross_validation, external_validations, features=None):
+    """Calcule le score global avec pondération v4.0 (à partir de l'enregistrement de caractéristiques)"""
+
+    if features is None:
+        features = dossier_features.extract_dossier_features(documents_data, {})
+    dossier_features.add_validation_features(features, cross_validation, external_validations)
+
+    weights = GLOBAL_SCORE_WEIGHTS
+    final_score, avg_doc_score, cross_penalty, red_flag_score = compute_global_score(features)
 
     # Verdict
-    if final_score < 12:
-        verdict = "✅ DOSSIER FIABLE"
-        color = "green"
-        recommendation = "Dossier validé - Risque très faible"
-        action = "APPROUVER"
-    elif final_score < 25:
-        verdict = "✅ DOSSIER ACCEPTABLE"
-        color = "green"
-        recommendation = "Dossier acceptable - Risque faible"
-        action = "APPROUVER avec vigilance"
-    elif final_score < 45:
-        verdict = "⚠️ VIGILANCE REQUISE"
-        color = "orange"
-        recommendation = "Vérifications complémentaires recommandées"
-        action = "VÉRIFIER manuellement"
-    elif final_score < 65:
-        verdict = "🔴 SUSPICION DE FRAUDE"
-        color = "red"
-        recommendation = "Risque élevé - Audit approfondi nécessaire"
-        action = "CONTACTER le candidat"
-    else:
-        verdict = "🚨 FRAUDE PROBABLE"
-        color = "darkred"
-        recommendation = "Risque très élevé - Rejet recommandé"
-        action = "REJETER le dossier"
+    band = get_score_band(final_score)
+    verdict = band['verdict']
+
+    features['score'] = final_score
+    features.verdict = verdict
 
     return {
         'score': final_score,
         'verdict': verdict,
-        'color': color,
-        'recommendation': recommendation,
-        'action': action,
-        'doc_score_contribution': avg_doc_score * 35,
-        'cross_validation_penalty': cross_penalty * 25,
-        'red_flags_penalty': red_flag_score * 40
+        'color': band['color'],
+        'recommendation': band['recommendation'],
+        'action': band['action'],
+        'doc_score_contribution': avg_doc_score * weights['documents'] * 100,
+        'cross_validation_penalty': cross_penalty * weights['cross_validation'] * 100,
+        'red_flags_penalty': red_flag_score * weights['red_flags'] * 100
     }
 
 
@@ -1995,22 +3013,29 @@ def create_excel_report(analysis_results):
         # Feuille 2: Validations externes
         validation_data = []
 
-        if 'siret_validation' in external_val and external_val['siret_validation']:
-            siret_info = external_val['siret_validation']
+        siret_validations = external_val.get('siret_validations') or {}
+        if not siret_validations and external_val.get('siret_validation'):
+            siret_validations = {'': external_val['siret_validation']}
+
+        for siret, siret_info in siret_validations.items():
+            if siret_info.get('skipped'):
+                statut = 'Non vérifié'
+            else:
+                statut = 'Vérifié ✓' if siret_info.get('exists') else 'Introuvable ✗'
             validation_data.append({
-                'Type': 'SIRET',
-                'Statut': 'Vérifié ✓' if siret_info.get('exists') else 'Introuvable ✗',
-                'Détail': siret_info.get('company_name', 'N/A'),
-                'Info complémentaire': siret_info.get('status', 'N/A'),
-                'Source': 'API INSEE'
+                'Type': f"SIRET {'employeur' if siret_info.get('is_employer') else 'secondaire'} {siret}".strip(),
+                'Statut': statut,
+                'Détail': siret_info.get('company_name') or siret_info.get('error') or 'N/A',
+                'Info complémentaire': f"{siret_info.get('status') or 'N/A'} | {', '.join(siret_info.get('source_documents', []))}",
+                'Source': siret_info.get('api_used') or 'API INSEE'
             })
 
         if 'address_home' in external_val and external_val['address_home']:
             addr_info = external_val['address_home']
             validation_data.append({
                 'Type': 'Adresse domicile',
-                'Statut': 'Validée ✓' if addr_info.get('valid') else 'Invalide ✗',
-                'Détail': addr_info.get('normalized_address', 'N/A'),
+                'Statut': 'Non vérifié' if addr_info.get('skipped') else ('Validée ✓' if addr_info.get('valid') else 'Invalide ✗'),
+                'Détail': addr_info.get('normalized_address') or addr_info.get('error') or 'N/A',
                 'Info complémentaire': f"Confiance: {addr_info.get('confidence_score', 0):.0%}",
                 'Source': 'API Data.gouv'
             })
@@ -2025,6 +3050,17 @@ def create_excel_report(analysis_results):
                 'Source': 'Calcul géographique'
             })
 
+        early_exit = external_val.get('early_exit')
+        for check in external_val.get('skipped_checks') or []:
+            validation_data.append({
+                'Type': check,
+                'Statut': 'Non vérifié',
+                'Détail': EARLY_EXIT_SKIPPED,
+                'Info complémentaire': (f"Score minimal {early_exit['score_lower_bound']}/100 après {early_exit['after_stage']}"
+                                        if early_exit else ''),
+                'Source': 'Arrêt anticipé'
+            })
+
         if validation_data:
             df_validations = pd.DataFrame(validation_data)
             df_validations.to_excel(writer, sheet_name='Validations Externes', index=False)
@@ -2086,8 +3122,317 @@ def create_excel_report(analysis_results):
 # ANALYSE COMPLÈTE v4.0
 # ======================
 
+def analyze_single_document(doc_key: str, doc_info: Dict) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Analyse d'un document (métadonnées, texte, validation, données structurées)
+
+    Returns:
+        tuple: (résultat du document, données structurées ou None si aucun texte PDF)
+    """
+    uploaded_file = doc_info['file']
+
+    if doc_info['type'] == 'application/pdf':
+        # Un seul PdfReader pour les métadonnées, le texte et les images intégrées
+        uploaded_file.seek(0)
+        try:
+            reader = PyPDF2.PdfReader(uploaded_file)
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception:
+            reader = None
+
+        # Métadonnées PDF
+        metadata = analyze_pdf_metadata_advanced(uploaded_file, reader)
+
+        # Extraction texte (et inventaire des polices dans la même passe)
+        uploaded_file.seek(0)
+        text_runs = font_inventory.TextRunInventory()
+        text_extract, error_msg = extract_text_from_pdf_advanced(uploaded_file, text_runs, reader)
+        apply_font_findings(metadata, text_runs)
+
+        # ELA, copier-coller et empreintes des images intégrées (scans, photos de justificatifs),
+        # OCR de ces images si le PDF n'a pas de texte extractible
+        scanned = not text_extract
+        try:
+            ela_results = image_forensics.analyze_pdf_images(uploaded_file, copy_move_budget(), reader,
+                                                             ocr=None if text_extract else ocr_image,
+                                                             ocr_resolution=OCR_RESOLUTION)
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception:
+            ela_results = []
+        ocr_texts = [(r['page'], r.pop('ocr_text', None)) for r in ela_results]
+        if not text_extract and any(text for _, text in ocr_texts):
+            text_extract = '\n'.join(f"--- Page {page} (OCR) ---\n{text}" for page, text in ocr_texts if text).strip()
+        apply_ela_findings(metadata, ela_results)
+        apply_copy_move_findings(metadata, ela_results)
+
+        # Validation
+        validation = validate_document_professional(doc_key, metadata, text_extract)
+
+        document = {
+            'metadata': metadata,
+            'ela': ela_results,
+            'image_hashes': document_image_hashes(ela_results, page_content=scanned),
+            'text_extract': text_extract[:2000] if text_extract else error_msg,
+            'text_full_length': len(text_extract) if text_extract else 0,
+            'text_signature': compute_text_signature(text_extract),
+            'validation': validation
+        }
+
+        # Extraction données structurées ULTRA-ROBUSTE
+        return document, extract_structured_data(text_extract) if text_extract else None
+
+    # Image : chaque page (TIFF multipage) décodée une seule fois et libérée avant la
+    # suivante ; OCR, aperçu et analyses forensiques lisent chacun le niveau de
+    # résolution qu'ils ont déclaré
+    budget = copy_move_budget()
+    resolutions = [OCR_RESOLUTION, PREVIEW_RESOLUTION] + image_forensics.forensic_resolutions(budget)
+    ela_results, page_texts, preview, error_msg = [], [], None, None
+    try:
+        for page, pyramid in image_pyramid.iter_pages(uploaded_file, resolutions):
+            text, page_error = extract_text_from_image(pyramid)
+            if text:
+                page_texts.append((page, text))
+            elif error_msg is None:
+                error_msg = page_error
+            if page == 1:
+                preview = image_preview(pyramid)
+
+            # ELA, copier-coller et empreinte perceptuelle (pages au-delà de la limite des PDF : OCR seul)
+            if page > image_forensics.MAX_EMBEDDED_IMAGES:
+                continue
+            try:
+                result = image_forensics.analyze_pyramid(pyramid, budget)
+            except parser_sandbox.RESOURCE_ERRORS:
+                raise
+            except Exception:
+                continue
+            if pyramid.page_count > 1:
+                result.update(page=page, name=pyramid.format.lower(),
+                              sha256=hashlib.sha256(pyramid.level(image_pyramid.NATIVE_RESOLUTION).tobytes()).hexdigest())
+            ela_results.append(result)
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
+    except Exception as e:
+        error_msg = f"❌ Erreur de lecture image : {str(e)}"
+
+    if len(page_texts) > 1 or any(page > 1 for page, _ in page_texts):
+        text_extract = '\n'.join(f"--- Page {page} ---\n{text}" for page, text in page_texts).strip()
+    else:
+        text_extract = page_texts[0][1] if page_texts else None
+    if len(ela_results) == 1 and 'page' not in ela_results[0]:
+        uploaded_file.seek(0)
+        ela_results[0]['sha256'] = hashlib.sha256(uploaded_file.read()).hexdigest()
+
+    # EXIF, XMP, marqueurs JPEG (tables de quantification, traces d'édition) et double compression
+    try:
+        metadata = metadata_analyzer.assess_metadata(metadata_analyzer.extract_image_metadata(uploaded_file))
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
+    except Exception as e:
+        metadata = {'type': 'image', 'creator': 'Image', 'producer': 'N/A',
+                    'creation_date': 'Non disponible', 'modification_date': 'Non disponible',
+                    'num_pages': 1, 'findings': [], 'suspicious_signs': [f"❌ Erreur d'analyse : {str(e)}"],
+                    'risk_score': 0}
+    metadata['suspicious_signs'].insert(0, 'ℹ️ Image - OCR limité')
+    metadata['risk_score'] = min(metadata['risk_score'] + 25, 100)
+
+    apply_ela_findings(metadata, ela_results)
+    apply_copy_move_findings(metadata, ela_results)
+    risk_score = metadata['risk_score']
+
+    document = {
+        'metadata': metadata,
+        'ela': ela_results,
+        'image_hashes': document_image_hashes(ela_results, page_content=True),
+        'preview': preview,
+        'text_extract': text_extract if text_extract else error_msg,
+        'text_full_length': len(text_extract) if text_extract else 0,
+        'text_signature': compute_text_signature(text_extract),
+        'validation': {
+            'score_fraude': risk_score / 100,
+            'anomalies': ['ℹ️ Document image - Analyse OCR limitée'] + metadata['suspicious_signs'][1:],
+            'checks': {'is_image': True, 'image_ela_score': metadata['ela']['image_ela_score'],
+                       'copy_move_score': metadata['copy_move']['score']},
+            'risk_level': get_risk_level(risk_score)
+        }
+    }
+
+    return document, extract_structured_data(text_extract) if text_extract else {}
+
+
+# Analyse de chaque fichier dans un processus limité (bombes de décompression, images géantes)
+PARSER_SANDBOX_CONFIG = {
+    'enabled': os.environ.get('INLI_PARSER_SANDBOX', '1') == '1',
+    'memory_mb': int(os.environ.get('INLI_PARSER_MEMORY_MB', str(parser_sandbox.DEFAULT_MEMORY_MB))),
+    'cpu_seconds': int(os.environ.get('INLI_PARSER_CPU_SECONDS', str(parser_sandbox.DEFAULT_CPU_SECONDS))),
+    'timeout': float(os.environ.get('INLI_PARSER_TIMEOUT', str(parser_sandbox.DEFAULT_TIMEOUT))),
+    'max_image_pixels': int(os.environ.get('INLI_MAX_IMAGE_PIXELS', str(parser_sandbox.DEFAULT_MAX_IMAGE_PIXELS)))
+}
+
+# Limite de Pillow appliquée aussi aux ouvertures d'images du processus principal
+Image.MAX_IMAGE_PIXELS = PARSER_SANDBOX_CONFIG['max_image_pixels']
+
+REJECTED_DOCUMENT_ANOMALY = "🚫 Document refusé – ressources"
+
+
+def rejected_document(doc_key: str, doc_info: Dict, reason: str) -> Dict:
+    """Résultat d'un document dont l'analyse a dépassé les limites de ressources"""
+    anomaly = f"{REJECTED_DOCUMENT_ANOMALY} : {reason}"
+    return {
+        'metadata': {
+            'type': 'image' if doc_info['type'] != 'application/pdf' else 'pdf',
+            'creator': 'Non analysé',
+            'producer': 'Non analysé',
+            'creation_date': 'Non disponible',
+            'modification_date': 'Non disponible',
+            'num_pages': 0,
+            'findings': [{'code': 'rejected_resources', 'sign': anomaly, 'risk': 50}],
+            'suspicious_signs': [anomaly],
+            'risk_score': 50
+        },
+        'ela': [],
+        'image_hashes': [],
+        'text_extract': anomaly,
+        'text_full_length': 0,
+        'text_signature': None,
+        'validation': {
+            'score_fraude': 0.5,
+            'anomalies': [anomaly],
+            'checks': {'rejected': True},
+            'risk_level': get_risk_level(50)
+        }
+    }
+
+
+def analyze_document_isolated(doc_key: str, doc_info: Dict):
+    """
+    analyze_single_document dans un processus aux ressources limitées
+
+    Un dépassement (mémoire, temps de calcul, délai, image trop grande) ou un plantage
+    de l'analyseur donne un document refusé au lieu d'interrompre la session. Ce refus
+    est rendu dans analysis_graph.Uncached : il n'entre pas dans le cache partagé des
+    documents, la prochaine analyse réessaie (serveur moins chargé, limites relevées).
+
+    Returns:
+        tuple: (document, données structurées), éventuellement enveloppé dans Uncached
+    """
+    if not PARSER_SANDBOX_CONFIG['enabled']:
+        return analyze_single_document(doc_key, doc_info)
+
+    # Copie privée du contenu : seul un BytesIO (sérialisable) est transmis au processus
+    job_info = {'type': doc_info['type'], 'file': io.BytesIO(doc_info['file'].getvalue())}
+    limits = parser_sandbox.SandboxLimits(
+        memory_mb=PARSER_SANDBOX_CONFIG['memory_mb'],
+        cpu_seconds=PARSER_SANDBOX_CONFIG['cpu_seconds'],
+        timeout=PARSER_SANDBOX_CONFIG['timeout'],
+        max_image_pixels=PARSER_SANDBOX_CONFIG['max_image_pixels']
+    )
+    try:
+        return parser_sandbox.run_limited(analyze_single_document, doc_key, job_info, limits=limits)
+    except parser_sandbox.ResourceLimitExceeded as e:
+        return analysis_graph.Uncached((rejected_document(doc_key, doc_info, e.reason), None))
+
+
+def get_document_analysis_cache() -> api_guard.TTLCache:
+    """Résultats d'analyse par document, indexés par empreinte du contenu (partagés entre sessions)"""
+    return api_guard.get_cache('document_analysis', maxsize=500, ttl=3600)
+
+
+def get_analysis_graph() -> analysis_graph.AnalysisGraph:
+    """Graphe d'analyse incrémental de la session (un par dossier)"""
+    if 'analysis_graph' not in st.session_state:
+        st.session_state.analysis_graph = analysis_graph.AnalysisGraph(get_document_analysis_cache())
+    return st.session_state.analysis_graph
+
+
+# Analyse de chaque document lancée en arrière-plan dès son dépôt
+BACKGROUND_ANALYSIS_CONFIG = {
+    'enabled': os.environ.get('INLI_BACKGROUND_ANALYSIS', '1') == '1',
+    'workers': 2
+}
+
+BACKGROUND_STATUS_LABELS = {
+    background_analysis.PENDING: "⏳ En attente d'analyse",
+    background_analysis.RUNNING: "⚙️ Analyse en cours...",
+    background_analysis.DONE: "✅ Document analysé",
+    background_analysis.ERROR: "❌ Échec de l'analyse en arrière-plan (relancée au lancement de l'analyse)"
+}
+
+
+def get_background_analyzer() -> background_analysis.BackgroundAnalyzer:
+    """Analyseur de fond de la session (alimente le cache du graphe d'analyse)"""
+    if 'background_analyzer' not in st.session_state:
+        st.session_state.background_analyzer = background_analysis.BackgroundAnalyzer(
+            get_document_analysis_cache(), max_workers=BACKGROUND_ANALYSIS_CONFIG['workers'])
+    return st.session_state.background_analyzer
+
+
+def start_background_analysis(doc_key: str) -> Optional[str]:
+    """
+    Lance (si besoin) l'analyse du document déposé et renvoie son état
+
+    Returns:
+        str: Libellé d'état à afficher, ou None si l'analyse de fond est désactivée
+    """
+    if not BACKGROUND_ANALYSIS_CONFIG['enabled']:
+        return None
+
+    doc_info = st.session_state.uploaded_files[doc_key]
+    content = doc_info['file'].getvalue()
+    # Copie privée du fichier : le thread de fond ne partage pas la position de lecture
+    job_info = dict(doc_info, file=io.BytesIO(content))
+
+    analyzer = get_background_analyzer()
+    analyzer.submit(doc_key, content, lambda: analyze_document_isolated(doc_key, job_info))
+    status = analyzer.status(doc_key)
+    label = BACKGROUND_STATUS_LABELS[status]
+    if status == background_analysis.ERROR:
+        label += f" : {analyzer.error(doc_key)}"
+    return label
+
+
+def start_new_dossier():
+    """Oublie le dossier en cours (documents déposés, résultats, identifiant)"""
+    for key in [k for k in st.session_state if str(k).startswith('uploader_')]:
+        del st.session_state[key]
+    st.session_state.uploaded_files = {}
+    st.session_state.analysis_results = {}
+    st.session_state.external_validations = {}
+    st.session_state.pop('dossier', None)
+
+
+def current_dossier_id(document_fingerprints: List[str]) -> str:
+    """
+    Identifiant du dossier en cours, créé au premier dossier de la session
+
+    Remplacer un document (analyse incrémentale) garde l'identifiant : les entrées
+    d'index de la version précédente sont remplacées, pas comparées au dossier.
+    Un nouveau dossier commence sur « Nouveau dossier », ou quand aucun document
+    n'est commun avec la dernière analyse.
+    """
+    fingerprints = set(document_fingerprints)
+    dossier = st.session_state.get('dossier')
+    if dossier is None or not dossier['documents'] & fingerprints:
+        dossier = {'id': uuid.uuid4().hex}
+    dossier['documents'] = fingerprints
+    st.session_state.dossier = dossier
+    return dossier['id']
+
+
 def analyze_all_documents():
-    """Lance l'analyse professionnelle complète v4.0 avec extraction ultra-robuste"""
+    """
+    Lance l'analyse professionnelle complète v4.0 avec extraction ultra-robuste
+
+    Incrémentale : un document déjà analysé (même type, même contenu) n'est pas
+    retraité, et les étapes de dossier ne sont rejouées que si leurs entrées changent.
+    Les documents analysés en arrière-plan depuis leur dépôt sont repris du cache.
+
+    En flux : les identifiants de chaque document sont validés en tâche de fond
+    pendant l'analyse des documents suivants (sauf en mode arrêt anticipé, qui
+    cherche au contraire à éviter des appels).
+    """
 
     results = {
         'documents': {},
@@ -2095,87 +3440,86 @@ def analyze_all_documents():
         'timestamp': datetime.now().isoformat()
     }
 
-    # Phase 1: Analyse de chaque document
-    for doc_key, doc_info in st.session_state.uploaded_files.items():
-        uploaded_file = doc_info['file']
-
-        if doc_info['type'] == 'application/pdf':
-            # Métadonnées PDF
-            uploaded_file.seek(0)
-            metadata = analyze_pdf_metadata_advanced(uploaded_file)
+    graph = get_analysis_graph()
+    graph.start_run()
+    early_exit = st.session_state.get('early_exit', EARLY_EXIT_CONFIG['enabled'])
 
-            # Extraction texte
-            uploaded_file.seek(0)
-            text_extract, error_msg = extract_text_from_pdf_advanced(uploaded_file)
+    prefetch = create_prefetch_pipeline() if PREFETCH_CONFIG['enabled'] and not early_exit else None
 
-            # Validation
-            validation = validate_document_professional(doc_key, metadata, text_extract)
+    # Documents déjà confiés à l'analyse de fond : attendre leurs résultats (mis en cache)
+    if 'background_analyzer' in st.session_state:
+        st.session_state.background_analyzer.wait(st.session_state.uploaded_files)
 
-            results['documents'][doc_key] = {
-                'metadata': metadata,
-                'text_extract': text_extract[:2000] if text_extract else error_msg,
-                'text_full_length': len(text_extract) if text_extract else 0,
-                'validation': validation
-            }
-
-            # Extraction données structurées ULTRA-ROBUSTE
-            if text_extract:
-                results['structured_data'][doc_key] = extract_structured_data(text_extract)
-        else:
-            # Image
-            uploaded_file.seek(0)
-            text_extract, error_msg = extract_text_from_image(uploaded_file)
-
-            results['documents'][doc_key] = {
-                'metadata': {
-                    'type': 'image',
-                    'creator': 'Image',
-                    'producer': 'N/A',
-                    'creation_date': 'Non disponible',
-                    'modification_date': 'Non disponible',
-                    'num_pages': 1,
-                    'suspicious_signs': ['ℹ️ Image - OCR limité'],
-                    'risk_score': 25
-                },
-                'text_extract': text_extract if text_extract else error_msg,
-                'text_full_length': len(text_extract) if text_extract else 0,
-                'validation': {
-                    'score_fraude': 0.25,
-                    'anomalies': ['ℹ️ Document image - Analyse OCR limitée'],
-                    'checks': {'is_image': True},
-                    'risk_level': 'Faible'
-                }
-            }
-
-            if text_extract:
-                results['structured_data'][doc_key] = extract_structured_data(text_extract)
-            else:
-                results['structured_data'][doc_key] = {}
+    # Phase 1: Analyse de chaque document (cache par empreinte du contenu)
+    document_fingerprints = []
+    try:
+        for doc_key, doc_info in st.session_state.uploaded_files.items():
+            (document, structured), fingerprint = graph.document(
+                doc_key, doc_info['file'].getvalue(),
+                lambda: analyze_document_isolated(doc_key, doc_info)
+            )
+            results['documents'][doc_key] = document
+            if structured is not None:
+                results['structured_data'][doc_key] = structured
+                if prefetch is not None:
+                    prefetch.submit_many(document_identifiers(structured))
+            document_fingerprints.append(fingerprint)
+    finally:
+        if prefetch is not None:
+            results['prefetch'] = prefetch.close()
+
+    siret_budget = None
+    if prefetch is not None:
+        siret_budget = max(0, API_CONFIG['insee_sirene']['max_requests_per_dossier']
+                           - prefetch.requests_used('siret'))
+
+    # Identifiant du dossier, conservé d'une réanalyse à l'autre : index inter-dossiers et exclusion de soi-même
+    dossier_id = current_dossier_id(document_fingerprints)
+    documents_input = [dossier_id] + sorted(document_fingerprints)
+
+    # Caractéristiques du dossier : une seule passe, partagées par les phases suivantes
+    features, features_fp = graph.stage('features', documents_input, lambda: dossier_features.extract_dossier_features(
+        results['documents'],
+        results['structured_data'],
+        dossier_id=dossier_id
+    ))
+    features.timestamp = results['timestamp']
 
-    # Phase 2: Validations externes v4.0
-    external_validations = perform_external_validations(
+    # Phase 2: Validations externes v4.0 (dont red flags)
+    external_validations, external_fp = graph.stage('external_validations', [features_fp, early_exit], lambda: perform_external_validations(
         results['documents'],
-        results['structured_data']
-    )
+        results['structured_data'],
+        features,
+        early_exit=early_exit,
+        siret_budget=siret_budget
+    ))
 
     results['external_validations'] = external_validations
 
     # Phase 3: Validation croisée
-    cross_validation = cross_validate_dossier_advanced(
+    cross_validation, cross_fp = graph.stage('cross_validation', [features_fp], lambda: cross_validate_dossier_advanced(
         results['documents'],
-        results['structured_data']
-    )
+        results['structured_data'],
+        features
+    ))
 
     results['cross_validation'] = cross_validation
 
     # Phase 4: Score global v4.0
-    global_score = calculate_global_score(
+    global_score, _ = graph.stage('global_score', [features_fp, external_fp, cross_fp], lambda: calculate_global_score(
         results['documents'],
         cross_validation,
-        external_validations
-    )
+        external_validations,
+        features
+    ))
 
     results['global_score'] = global_score
+    results['features'] = features
+    results['incremental'] = graph.last_run
+
+    # Phase 5: Indexation inter-dossiers (après la recherche, pour ne pas se détecter soi-même)
+    index_dossier_identifiers(results['structured_data'], dossier_id)
+    index_document_signatures(results['documents'], dossier_id)
 
     # Sauvegarder
     st.session_state.analysis_results = results
@@ -2374,6 +3718,10 @@ def page_upload():
 
     st.info("📋 **Formats acceptés** : PDF (recommandé), JPG, JPEG, PNG | **Taille max** : 10 MB")
 
+    if st.session_state.uploaded_files and st.button("🆕 Nouveau dossier", help="Vider les documents déposés et commencer le dossier d'un autre candidat"):
+        start_new_dossier()
+        st.rerun()
+
     # Nouvelle organisation des catégories
     doc_types = {
         # 1. Justificatifs d'identité
@@ -2413,7 +3761,7 @@ def page_upload():
 
             uploaded_file = st.file_uploader(
                 "Sélectionner le fichier",
-                type=['pdf', 'jpg', 'jpeg', 'png'],
+                type=ALLOWED_EXTENSIONS,
                 key=f"uploader_{doc_key}",
                 label_visibility="collapsed"
             )
@@ -2426,6 +3774,9 @@ def page_upload():
                     'size': uploaded_file.size
                 }
                 st.success(f"✅ **{uploaded_file.name}** ({uploaded_file.size / 1024:.1f} KB)")
+                status = start_background_analysis(doc_key)
+                if status:
+                    st.caption(status)
 
     st.markdown("---")
 
@@ -2443,7 +3794,7 @@ def page_upload():
 
             uploaded_file = st.file_uploader(
                 "Sélectionner le fichier",
-                type=['pdf', 'jpg', 'jpeg', 'png'],
+                type=ALLOWED_EXTENSIONS,
                 key=f"uploader_{doc_key}",
                 label_visibility="collapsed"
             )
@@ -2456,6 +3807,9 @@ def page_upload():
                     'size': uploaded_file.size
                 }
                 st.success(f"✅ **{uploaded_file.name}** ({uploaded_file.size / 1024:.1f} KB)")
+                status = start_background_analysis(doc_key)
+                if status:
+                    st.caption(status)
 
     st.markdown("---")
 
@@ -2473,7 +3827,7 @@ def page_upload():
 
             uploaded_file = st.file_uploader(
                 "Sélectionner le fichier",
-                type=['pdf', 'jpg', 'jpeg', 'png'],
+                type=ALLOWED_EXTENSIONS,
                 key=f"uploader_{doc_key}",
                 label_visibility="collapsed"
             )
@@ -2486,6 +3840,9 @@ def page_upload():
                     'size': uploaded_file.size
                 }
                 st.success(f"✅ **{uploaded_file.name}** ({uploaded_file.size / 1024:.1f} KB)")
+                status = start_background_analysis(doc_key)
+                if status:
+                    st.caption(status)
 
     st.markdown("---")
 
@@ -2504,10 +3861,26 @@ def page_upload():
 
         st.markdown("---")
 
+        st.checkbox(
+            "⏩ Arrêt anticipé : ne pas interroger les API restantes si la fraude est déjà établie",
+            value=EARLY_EXIT_CONFIG['enabled'],
+            key="early_exit"
+        )
+
         if st.button("🚀 LANCER L'ANALYSE", type="primary", use_container_width=True):
             with st.spinner("🔍 Analyse en cours avec extraction ultra-robuste..."):
                 analyze_all_documents()
                 st.success("✅ **Analyse terminée !**")
+
+                reused = st.session_state.analysis_results.get('incremental', {}).get('reused', [])
+                if reused:
+                    st.caption(f"♻️ Étapes réutilisées sans recalcul : {', '.join(reused)}")
+                prefetch_stats = st.session_state.analysis_results.get('prefetch')
+                if prefetch_stats and prefetch_stats['submitted']:
+                    st.caption(
+                        f"⚡ {prefetch_stats['completed']} validations externes préchargées pendant l'analyse "
+                        f"(attente résiduelle : {prefetch_stats['wait_ms']:.0f} ms)"
+                    )
                 st.balloons()
 
                 if st.session_state.analysis_results:
@@ -2630,8 +4003,17 @@ def page_analyse_individuelle():
     tab1, tab2, tab3 = st.tabs(["📄 Métadonnées", "📝 Texte extrait", "⚠️ Anomalies"])
 
     with tab1:
+        if analysis.get('preview') is not None:
+            st.image(analysis['preview'], caption="🖼️ Image déposée")
         st.json(metadata)
 
+        # Heatmaps ELA des images à zone de recompression atypique
+        for ela in analysis.get('ela', []):
+            if ela['score'] >= FRAUD_THRESHOLDS['image_ela_score'] / 2 and ela['heatmap'].size:
+                label = f"page {ela['page']} – {ela['name']}" if ela.get('page') else "image déposée"
+                st.image(image_forensics.heatmap_image(ela, (ela['heatmap'].shape[1] * 4, ela['heatmap'].shape[0] * 4)),
+                         caption=f"🔥 Heatmap ELA ({label}) : score {ela['score']:.2f}")
+
     with tab2:
         text_extract = analysis.get('text_extract', '')
         st.text_area("Contenu", text_extract, height=400)
@@ -2656,6 +4038,14 @@ def page_validations_externes():
 
     external_val = st.session_state.analysis_results['external_validations']
 
+    early_exit = external_val.get('early_exit')
+    if early_exit:
+        st.info(
+            f"⏩ **Arrêt anticipé** après {early_exit['after_stage']} : score minimal "
+            f"{early_exit['score_lower_bound']}/100, verdict déjà établi. Contrôles non effectués : "
+            + ", ".join(external_val.get('skipped_checks', []))
+        )
+
     # Statistiques d'extraction
     extraction_stats = external_val.get('extraction_stats', {})
 
@@ -2696,6 +4086,8 @@ def page_validations_externes():
 
             if siret_info.get('status') == 'Fermée':
                 st.error("🚨 ALERTE CRITIQUE : Entreprise fermée/radiée !")
+        elif siret_info.get('skipped'):
+            st.info(f"⏭️ {siret_info.get('error')} - Vérification SIRET à refaire plus tard")
         else:
             st.markdown(f"""
             <div class="alert-box alert-critical">
@@ -2707,6 +4099,38 @@ def page_validations_externes():
     else:
         st.info("Aucun SIRET détecté - Vérifiez les documents")
 
+    # Autres SIRET du dossier (URSSAF, prestataire de paie, ancien employeur...)
+    other_sirets = {
+        siret: info for siret, info in external_val.get('siret_validations', {}).items()
+        if not info.get('is_employer')
+    }
+    if other_sirets:
+        with st.expander(f"🏢 Autres SIRET du dossier ({len(other_sirets)})"):
+            for siret, info in other_sirets.items():
+                documents = ', '.join(d.replace('_', ' ').title() for d in info.get('source_documents', []))
+                if info.get('exists'):
+                    st.markdown(f"✅ **{siret}** - {info.get('company_name', 'N/A')} ({info.get('status', 'N/A')}) - *{documents}*")
+                else:
+                    st.markdown(f"❌ **{siret}** - {info.get('error', 'Erreur inconnue')} - *{documents}*")
+
+    # Identifiants partagés avec d'autres dossiers
+    ring_matches = external_val.get('ring_matches') or []
+    if ring_matches:
+        with st.expander(f"🕸️ Identifiants vus dans d'autres dossiers ({len(ring_matches)})"):
+            for match in ring_matches:
+                st.markdown(f"**{IDENTIFIER_LABELS.get(match['kind'], match['kind'])}** `{match['value']}` : {match['count']} autre(s) dossier(s)")
+
+    # Documents quasi identiques à ceux d'autres dossiers
+    near_dups = external_val.get('near_duplicates') or []
+    if near_dups:
+        with st.expander(f"📄 Documents quasi identiques à d'autres dossiers ({len(near_dups)})"):
+            for duplicate in near_dups:
+                others = ', '.join(f"{m['doc_type'].replace('_', ' ')} ({m['similarity']:.0%})" for m in duplicate['matches'][:5])
+                label = duplicate['document'].replace('_', ' ').title()
+                if duplicate.get('kind') == 'image':
+                    label += f" – image {duplicate['image']['name']}"
+                st.markdown(f"**{label}** ≈ {others}")
+
     st.markdown("---")
 
     # Adresses
@@ -2720,6 +4144,8 @@ def page_validations_externes():
         if addr_home and addr_home.get('valid'):
             st.success(f"✅ Validée ({addr_home.get('confidence_score', 0):.0%})")
             st.info(addr_home.get('normalized_address', 'N/A'))
+        elif addr_home and addr_home.get('skipped'):
+            st.info(f"⏭️ {addr_home.get('error')}")
         else:
             st.warning("⚠️ Non validée ou non détectée")
 
@@ -2729,6 +4155,8 @@ def page_validations_externes():
         if addr_work and addr_work.get('valid'):
             st.success(f"✅ Validée ({addr_work.get('confidence_score', 0):.0%})")
             st.info(addr_work.get('normalized_address', 'N/A'))
+        elif addr_work and addr_work.get('skipped'):
+            st.info(f"⏭️ {addr_work.get('error')}")
         else:
             st.warning("⚠️ Non validée ou non détectée")
 
@@ -2741,6 +4169,16 @@ def page_validations_externes():
         else:
             st.warning(f"⚠️ Distance importante : {distance} km")
 
+    # Matrice des distances entre toutes les adresses géocodées
+    geo_matrix = external_val.get('geo_matrix') or {}
+    if len(geo_matrix.get('points', [])) >= 2:
+        with st.expander(f"🗺️ Distances entre les {len(geo_matrix['points'])} adresses géocodées"):
+            labels = [f"{p['source'].replace('_', ' ')} ({p['role']})" for p in geo_matrix['points']]
+            st.dataframe(pd.DataFrame(geo_matrix['distances_km'], index=labels, columns=labels))
+            for inconsistency in geo_matrix.get('domicile_inconsistencies', []):
+                doc_a, doc_b = inconsistency['documents']
+                st.warning(f"⚠️ {doc_a} / {doc_b} : {inconsistency['distance_km']} km")
+
 
 def page_red_flags():
     """Page Red Flags v4.0"""
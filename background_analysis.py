@@ -0,0 +1,105 @@
+"""
+Analyse des documents en arrière-plan dès leur dépôt
+Chaque fichier déposé est analysé (métadonnées, texte, OCR, extraction) par un
+thread de fond ; le résultat est rangé dans le cache par document du graphe
+d'analyse (même empreinte que AnalysisGraph.document), si bien que l'analyse
+du dossier ne fait plus qu'agréger des résultats déjà calculés.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from analysis_graph import Uncached, document_fingerprint
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+class BackgroundAnalyzer:
+    """
+    File d'analyses par document (une tâche par type de document et contenu)
+
+    Args:
+        document_cache: Cache partagé avec AnalysisGraph (get / set)
+        max_workers: Nombre de documents analysés simultanément
+    """
+
+    def __init__(self, document_cache, max_workers: int = 2):
+        self.document_cache = document_cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='document-analysis')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Tuple[str, Future]] = {}
+        self._running = set()
+
+    def submit(self, doc_key: str, content: bytes, func: Callable[[], Any]) -> str:
+        """
+        Lance l'analyse d'un document (sans effet si elle est déjà faite ou en cours)
+
+        Returns:
+            str: Empreinte du document
+        """
+        fingerprint = document_fingerprint(doc_key, content)
+        with self._lock:
+            job = self._jobs.get(doc_key)
+            if job is not None and job[0] == fingerprint:
+                # Déjà soumis (un échec est repris au premier plan par l'analyse du dossier)
+                return fingerprint
+            if self.document_cache.get(fingerprint) is not None:
+                future = Future()
+                future.set_result(None)
+            else:
+                future = self._executor.submit(self._run, doc_key, fingerprint, func)
+            # Un nouveau fichier pour le même emplacement remplace la tâche précédente
+            if job is not None and job[0] != fingerprint:
+                job[1].cancel()
+            self._jobs[doc_key] = (fingerprint, future)
+        return fingerprint
+
+    def _run(self, doc_key: str, fingerprint: str, func: Callable[[], Any]):
+        with self._lock:
+            self._running.add(fingerprint)
+        try:
+            value = func()
+            if isinstance(value, Uncached):
+                # Non conservé : l'analyse du dossier reprend le document au premier plan
+                return value
+            self.document_cache.set(fingerprint, value)
+        finally:
+            with self._lock:
+                self._running.discard(fingerprint)
+
+    def status(self, doc_key: str) -> Optional[str]:
+        """PENDING, RUNNING, DONE, ERROR (None si aucun document soumis)"""
+        with self._lock:
+            job = self._jobs.get(doc_key)
+            if job is None:
+                return None
+            fingerprint, future = job
+            if not future.done():
+                return RUNNING if fingerprint in self._running else PENDING
+        if future.cancelled() or future.exception() is not None or isinstance(future.result(), Uncached):
+            return ERROR
+        return DONE
+
+    def error(self, doc_key: str) -> Optional[str]:
+        """Message d'erreur de la dernière analyse du document"""
+        with self._lock:
+            job = self._jobs.get(doc_key)
+        if job is None or not job[1].done() or job[1].cancelled():
+            return None
+        if job[1].exception() is not None:
+            return str(job[1].exception())
+        if isinstance(job[1].result(), Uncached):
+            return "Document refusé (limites de ressources), résultat non conservé"
+        return None
+
+    def wait(self, doc_keys: Optional[Iterable[str]] = None, timeout: Optional[float] = None):
+        """Attend la fin des analyses des documents (tous par défaut)"""
+        with self._lock:
+            keys = list(self._jobs) if doc_keys is None else list(doc_keys)
+            futures = [self._jobs[key][1] for key in keys if key in self._jobs]
+        wait(futures, timeout=timeout)
@@ -0,0 +1,353 @@
+"""
+Géocodeur local Base Adresse Nationale (mode hors-ligne)
+Index compact des voies normalisées + rapprochement flou par tokens
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# Abréviations courantes -> forme longue (normalisation des deux côtés)
+STREET_ABBREVIATIONS = {
+    'r': 'rue', 'av': 'avenue', 'ave': 'avenue', 'bd': 'boulevard', 'bld': 'boulevard',
+    'blvd': 'boulevard', 'pl': 'place', 'rte': 'route', 'che': 'chemin', 'chem': 'chemin', 'imp': 'impasse',
+    'all': 'allee', 'sq': 'square', 'fg': 'faubourg', 'fbg': 'faubourg', 'pass': 'passage',
+    'st': 'saint', 'ste': 'sainte', 'gal': 'general', 'mal': 'marechal', 'pdt': 'president',
+    'res': 'residence', 'lot': 'lotissement', 'qu': 'quai', 'crs': 'cours', 'esp': 'esplanade'
+}
+
+# Types de voie : peu discriminants, pondérés à moitié dans la similarité
+STREET_TYPES = {
+    'rue', 'avenue', 'boulevard', 'place', 'route', 'chemin', 'impasse', 'allee', 'square',
+    'passage', 'cours', 'quai', 'esplanade', 'voie', 'residence', 'lotissement', 'cite', 'faubourg'
+}
+
+STOP_WORDS = {'de', 'du', 'des', 'la', 'le', 'les', 'd', 'l', 'et', 'a', 'au', 'aux', 'en'}
+
+REPETITIONS = {'bis': 'b', 'ter': 't', 'quater': 'q', 'b': 'b', 't': 't', 'q': 'q'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS voies (
+    voie_id INTEGER PRIMARY KEY,
+    code_postal TEXT NOT NULL,
+    nom_commune TEXT,
+    nom_voie TEXT,
+    nom_norm TEXT,
+    lat REAL,
+    lon REAL
+);
+CREATE TABLE IF NOT EXISTS numeros (
+    voie_id INTEGER NOT NULL,
+    numero TEXT NOT NULL,
+    lat REAL,
+    lon REAL,
+    PRIMARY KEY (voie_id, numero)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    voie_id INTEGER NOT NULL,
+    PRIMARY KEY (token, voie_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_voies_cp ON voies (code_postal);
+"""
+
+_local = threading.local()
+
+
+# ======================
+# NORMALISATION
+# ======================
+
+def normalize_street(text: str) -> List[str]:
+    """Tokens normalisés d'un nom de voie (sans accents, abréviations développées)"""
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text or '')
+        if unicodedata.category(c) != 'Mn'
+    ).lower()
+    text = re.sub(r"[^a-z0-9]+", ' ', text)
+
+    tokens = []
+    for token in text.split():
+        token = STREET_ABBREVIATIONS.get(token, token)
+        if token not in STOP_WORDS:
+            tokens.append(token)
+    return tokens
+
+
+def parse_address(address: str) -> Dict:
+    """Découpe une adresse libre en numéro, voie, code postal et commune"""
+
+    parsed = {'numero': None, 'street_tokens': [], 'code_postal': None, 'commune': None}
+
+    cp_match = re.search(r'(?<!\d)(\d{5})(?!\d)', address)
+    street_part = address
+    if cp_match:
+        parsed['code_postal'] = cp_match.group(1)
+        street_part = address[:cp_match.start()]
+        parsed['commune'] = address[cp_match.end():].strip(' ,') or None
+
+    num_match = re.match(r'\s*(\d{1,4})\s*(bis|ter|quater|[btq])?\b[\s,]*', street_part, re.IGNORECASE)
+    if num_match:
+        rep = REPETITIONS.get((num_match.group(2) or '').lower(), '')
+        parsed['numero'] = num_match.group(1).lstrip('0') + rep
+        street_part = street_part[num_match.end():]
+
+    parsed['street_tokens'] = normalize_street(street_part)
+    return parsed
+
+
+# ======================
+# IMPORT D'UN EXTRAIT DÉPARTEMENTAL
+# ======================
+
+def _existing_voie(conn: sqlite3.Connection, code_postal: str, nom_voie: str) -> Optional[int]:
+    """
+    Identifiant d'une voie déjà importée, vidée de ses numéros et tokens (réimport)
+
+    Les doublons laissés par un import antérieur de la même voie sont supprimés.
+    """
+    ids = [row[0] for row in conn.execute(
+        "SELECT voie_id FROM voies WHERE code_postal = ? AND nom_voie = ? ORDER BY voie_id",
+        (code_postal, nom_voie))]
+    if not ids:
+        return None
+    for voie_id in ids:
+        conn.execute("DELETE FROM numeros WHERE voie_id = ?", (voie_id,))
+        conn.execute("DELETE FROM tokens WHERE voie_id = ?", (voie_id,))
+    conn.executemany("DELETE FROM voies WHERE voie_id = ?", [(voie_id,) for voie_id in ids[1:]])
+    return ids[0]
+
+
+def import_ban_departement(source_path: str, db_path: str, batch_size: int = 50000) -> int:
+    """
+    Importe un fichier BAN départemental (adresses-XX.csv, séparateur ';')
+
+    Une ligne par voie (coordonnées moyennes) + une ligne par numéro.
+    Réimporter un fichier remplace ses voies (clé naturelle code postal + nom de voie)
+    et leurs numéros au lieu de les dupliquer.
+
+    Args:
+        source_path: Fichier CSV BAN
+        db_path: Base SQLite à créer / compléter
+        batch_size: Nombre de numéros insérés par transaction
+
+    Returns:
+        int: Nombre de numéros importés
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(_SCHEMA)
+
+        next_id = (conn.execute("SELECT MAX(voie_id) FROM voies").fetchone()[0] or 0) + 1
+        voie_ids = {}
+        voie_sums = {}
+        numeros = []
+        total = 0
+
+        with open(source_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f, delimiter=';')
+            for row in reader:
+                cp = row.get('code_postal')
+                nom_voie = row.get('nom_voie')
+                if not cp or not nom_voie:
+                    continue
+                try:
+                    lat, lon = float(row['lat']), float(row['lon'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+                key = (cp, nom_voie)
+                voie_id = voie_ids.get(key)
+                if voie_id is None:
+                    voie_id = _existing_voie(conn, cp, nom_voie)
+                    if voie_id is None:
+                        voie_id = next_id
+                        next_id += 1
+                    voie_ids[key] = voie_id
+                    voie_sums[voie_id] = [row.get('nom_commune'), 0.0, 0.0, 0]
+
+                sums = voie_sums[voie_id]
+                sums[1] += lat
+                sums[2] += lon
+                sums[3] += 1
+
+                rep = REPETITIONS.get((row.get('rep') or '').lower(), '')
+                numeros.append((voie_id, (row.get('numero') or '').lstrip('0') + rep, lat, lon))
+
+                if len(numeros) >= batch_size:
+                    conn.executemany("INSERT OR REPLACE INTO numeros VALUES (?, ?, ?, ?)", numeros)
+                    conn.commit()
+                    total += len(numeros)
+                    numeros = []
+
+        if numeros:
+            conn.executemany("INSERT OR REPLACE INTO numeros VALUES (?, ?, ?, ?)", numeros)
+            total += len(numeros)
+
+        # Voies et index inversé des tokens (quelques milliers de lignes par département)
+        voies = []
+        tokens = []
+        for (cp, nom_voie), voie_id in voie_ids.items():
+            commune, lat_sum, lon_sum, count = voie_sums[voie_id]
+            street_tokens = normalize_street(nom_voie)
+            voies.append((voie_id, cp, commune, nom_voie, ' '.join(street_tokens),
+                          lat_sum / count, lon_sum / count))
+            tokens.extend((token, voie_id) for token in set(street_tokens))
+
+        conn.executemany("INSERT OR REPLACE INTO voies VALUES (?, ?, ?, ?, ?, ?, ?)", voies)
+        conn.executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?)", tokens)
+        conn.commit()
+    finally:
+        conn.close()
+
+    _voies_for_postal_code.cache_clear()
+    return total
+
+
+# ======================
+# GÉOCODAGE
+# ======================
+
+def _get_connection(db_path: str) -> sqlite3.Connection:
+    """Connexion en lecture seule, une par thread et par base"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        connections[db_path] = conn
+    return conn
+
+
+def is_available(db_path: str) -> bool:
+    """Indique si une base BAN locale exploitable existe"""
+    return bool(db_path) and os.path.isfile(db_path) and os.path.getsize(db_path) > 0
+
+
+@lru_cache(maxsize=256)
+def _voies_for_postal_code(db_path: str, code_postal: str) -> Tuple[tuple, ...]:
+    """Voies d'un code postal avec leurs tokens (mis en cache)"""
+    rows = _get_connection(db_path).execute(
+        "SELECT voie_id, nom_commune, nom_voie, nom_norm, lat, lon FROM voies WHERE code_postal = ?",
+        (code_postal,)
+    ).fetchall()
+    return tuple((row[0], row[1], row[2], frozenset(row[3].split()), row[4], row[5]) for row in rows)
+
+
+def _token_similarity(query_tokens: List[str], candidate_tokens: frozenset) -> float:
+    """Similarité de Dice pondérée sur tokens, tolérante aux fautes d'OCR"""
+    if not query_tokens or not candidate_tokens:
+        return 0.0
+
+    def weight(token):
+        return 0.5 if token in STREET_TYPES else 1.0
+
+    matched = 0.0
+    for token in query_tokens:
+        if token in candidate_tokens:
+            matched += weight(token)
+        elif len(token) >= 3:
+            best = max(SequenceMatcher(None, token, c).ratio() for c in candidate_tokens)
+            if best >= 0.75:
+                matched += best * weight(token)
+
+    total = sum(weight(t) for t in query_tokens) + sum(weight(t) for t in candidate_tokens)
+    return 2 * matched / total
+
+
+def _candidate_voies(db_path: str, parsed: Dict) -> tuple:
+    """Voies candidates : code postal, sinon index inversé des tokens"""
+    if parsed['code_postal']:
+        return _voies_for_postal_code(db_path, parsed['code_postal'])
+
+    tokens = [t for t in parsed['street_tokens'] if len(t) >= 4]
+    if not tokens:
+        return ()
+
+    rows = _get_connection(db_path).execute(
+        "SELECT v.voie_id, v.nom_commune, v.nom_voie, v.nom_norm, v.lat, v.lon, v.code_postal "
+        "FROM tokens t JOIN voies v ON v.voie_id = t.voie_id "
+        "WHERE t.token IN ({}) GROUP BY v.voie_id ORDER BY COUNT(*) DESC LIMIT 200".format(
+            ', '.join('?' * len(tokens))),
+        tokens
+    ).fetchall()
+    return tuple((row[0], row[1], row[2], frozenset(row[3].split()), row[4], row[5], row[6]) for row in rows)
+
+
+def geocode(address: str, db_path: str, min_score: float = 0.5) -> Optional[Dict]:
+    """
+    Géocode une adresse sur la base BAN locale
+
+    Returns:
+        dict au format de validate_address_gouv, ou None si aucune voie ne correspond
+    """
+
+    parsed = parse_address(address)
+    if not parsed['street_tokens']:
+        return None
+
+    best, best_score = None, 0.0
+    for candidate in _candidate_voies(db_path, parsed):
+        score = _token_similarity(parsed['street_tokens'], candidate[3])
+        if score > best_score:
+            best, best_score = candidate, score
+
+    if best is None or best_score < min_score:
+        return None
+
+    voie_id, commune, nom_voie, _, lat, lon = best[:6]
+    code_postal = parsed['code_postal'] or best[6]
+    numero = parsed['numero']
+
+    # Position du numéro si connu, sinon centre de la voie (confiance réduite)
+    confidence = best_score
+    label_numero = ''
+    if numero:
+        row = _get_connection(db_path).execute(
+            "SELECT lat, lon FROM numeros WHERE voie_id = ? AND numero = ?", (voie_id, numero)
+        ).fetchone()
+        if row:
+            lat, lon = row
+            label_numero = f"{numero} "
+        else:
+            confidence *= 0.8
+    else:
+        confidence *= 0.8
+
+    return {
+        'valid': True,
+        'normalized_address': f"{label_numero}{nom_voie} {code_postal} {commune}",
+        'latitude': lat,
+        'longitude': lon,
+        'confidence_score': round(confidence, 2),
+        'city': commune,
+        'postal_code': code_postal,
+        'error': None,
+        'api_used': 'BAN locale'
+    }
+
+
+if __name__ == "__main__":
+    # Usage : python ban_local.py adresses-75.csv [adresses-92.csv ...] data/ban/adresses.sqlite
+    if len(sys.argv) < 3:
+        print("Usage : python ban_local.py <adresses-XX.csv> [...] <base.sqlite>")
+        sys.exit(1)
+
+    for source in sys.argv[1:-1]:
+        count = import_ban_departement(source, sys.argv[-1])
+        print(f"✅ {source} : {count} adresses importées")
@@ -0,0 +1,120 @@
+"""
+Scoring vectorisé d'un portefeuille de dossiers
+Rescore en une passe pandas/NumPy des milliers de dossiers (une ligne par
+dossier, colonnes de dossier_features.NUMERIC_COLUMNS) avec les mêmes
+pondérations et bandes que le calcul unitaire (settings.py)
+
+Usage :
+    python batch_scoring.py historique.npz scores.csv
+"""
+
+import sys
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from dossier_features import FeatureTable
+from settings import GLOBAL_SCORE_WEIGHTS, GLOBAL_SCORE_BANDS, RISK_LEVEL_BANDS
+
+
+def _as_frame(table: Union[FeatureTable, pd.DataFrame]) -> pd.DataFrame:
+    return table.to_frame() if isinstance(table, FeatureTable) else table
+
+
+def _band_index(scores: np.ndarray, bands) -> np.ndarray:
+    """Indice de bande (borne haute exclusive) de chaque score"""
+    bounds = np.array([band for band in bands if band is not None], dtype=float)
+    return np.searchsorted(bounds, scores, side='right')
+
+
+def cross_validation_components(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contrôles croisés vectorisés (équivalent de cross_validate_dossier_advanced)
+
+    Returns:
+        DataFrame: cross_failed_checks, cross_anomalies
+    """
+    n_payslips = frame['n_payslips'].to_numpy(dtype=float)
+    count_800 = frame['payslip_salary_count_800'].to_numpy(dtype=float)
+    min_800 = frame['payslip_salary_min_800'].to_numpy(dtype=float)
+    max_800 = frame['payslip_salary_max_800'].to_numpy(dtype=float)
+    missing = frame['missing_required_docs'].to_numpy(dtype=float)
+
+    has_multiple = n_payslips >= 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variation = (max_800 - min_800) / min_800 * 100
+    inconsistent = has_multiple & (count_800 >= 2) & (variation > 50)
+    missing_docs = missing > 0
+
+    failed = (~has_multiple).astype(int) + inconsistent.astype(int) + missing_docs.astype(int)
+    # Chaque contrôle en échec produit exactement une anomalie
+    return pd.DataFrame({'cross_failed_checks': failed, 'cross_anomalies': failed}, index=frame.index)
+
+
+def score_dossiers(table: Union[FeatureTable, pd.DataFrame], recompute_cross_validation: bool = True) -> pd.DataFrame:
+    """
+    Score global de chaque dossier (même résultat que calculate_global_score)
+
+    Args:
+        table: FeatureTable ou DataFrame de colonnes dossier_features
+        recompute_cross_validation: Recalculer les contrôles croisés à partir des
+            caractéristiques (sinon utiliser cross_failed_checks / cross_anomalies)
+
+    Returns:
+        DataFrame: score, verdict, color, recommendation, action et contributions
+    """
+    frame = _as_frame(table)
+    weights = GLOBAL_SCORE_WEIGHTS
+
+    if recompute_cross_validation:
+        cross = cross_validation_components(frame)
+        failed = cross['cross_failed_checks'].to_numpy(dtype=float)
+        anomalies = cross['cross_anomalies'].to_numpy(dtype=float)
+    else:
+        failed = frame['cross_failed_checks'].to_numpy(dtype=float)
+        anomalies = frame['cross_anomalies'].to_numpy(dtype=float)
+
+    avg_doc_score = frame['doc_score_mean'].fillna(weights['default_document_score']).to_numpy(dtype=float)
+    cross_penalty = (failed * weights['failed_check']) + (anomalies * weights['cross_anomaly'])
+    red_flag_impact = frame['red_flag_impact'].fillna(0).to_numpy(dtype=float)
+    red_flag_score = np.minimum(red_flag_impact / weights['red_flag_points'], 1.0)
+
+    scores = (avg_doc_score * weights['documents'] + cross_penalty * weights['cross_validation']
+              + red_flag_score * weights['red_flags']) * 100
+    scores = np.minimum(scores, 100)
+
+    band_idx = _band_index(scores, [band['max'] for band in GLOBAL_SCORE_BANDS])
+    result = pd.DataFrame({
+        'score': scores,
+        'verdict': np.array([band['verdict'] for band in GLOBAL_SCORE_BANDS], dtype=object)[band_idx],
+        'color': np.array([band['color'] for band in GLOBAL_SCORE_BANDS], dtype=object)[band_idx],
+        'recommendation': np.array([band['recommendation'] for band in GLOBAL_SCORE_BANDS], dtype=object)[band_idx],
+        'action': np.array([band['action'] for band in GLOBAL_SCORE_BANDS], dtype=object)[band_idx],
+        'doc_score_contribution': avg_doc_score * weights['documents'] * 100,
+        'cross_validation_penalty': cross_penalty * weights['cross_validation'] * 100,
+        'red_flags_penalty': red_flag_score * weights['red_flags'] * 100,
+        'cross_failed_checks': failed,
+        'cross_anomalies': anomalies,
+    }, index=frame.index)
+
+    if 'dossier_id' in frame:
+        result.insert(0, 'dossier_id', frame['dossier_id'])
+    return result
+
+
+def risk_levels(scores) -> np.ndarray:
+    """Niveau de risque (équivalent vectorisé de get_risk_level, scores 0-100)"""
+    labels = np.array([level for _, level in RISK_LEVEL_BANDS], dtype=object)
+    return labels[_band_index(np.asarray(scores, dtype=float), [upper for upper, _ in RISK_LEVEL_BANDS])]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage : python batch_scoring.py <historique.npz> <scores.csv>")
+        sys.exit(1)
+
+    scored = score_dossiers(FeatureTable.load(sys.argv[1]))
+    scored.to_csv(sys.argv[2], index=False)
+    print(f"✅ {len(scored)} dossiers rescorés -> {sys.argv[2]}")
+    print(scored['verdict'].value_counts().to_string())
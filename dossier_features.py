@@ -0,0 +1,239 @@
+"""
+Caractéristiques d'un dossier sous forme compacte et typée
+Un dossier = un enregistrement à schéma fixe (colonnes numériques NumPy +
+attributs catégoriels), extrait en une seule passe et consommé par la
+validation croisée, les red flags et le score
+
+Les tables d'historique (milliers de dossiers) se chargent en une seule
+matrice float64 (np.load, sans pickle).
+"""
+
+import json
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Schéma fixe des colonnes numériques (NaN = non applicable / inconnu)
+NUMERIC_COLUMNS = (
+    'n_documents',
+    'n_images',
+    'n_payslips',
+    'doc_score_mean',
+    'salary_count',
+    'salary_mean',
+    'salary_min',
+    'salary_max',
+    'payslip_salary_max',
+    'payslip_salary_count_800',       # Salaires > 800 € des fiches de paie (validation croisée)
+    'payslip_salary_min_800',
+    'payslip_salary_max_800',
+    'revenue_count',
+    'revenue_max',
+    'siret_count',
+    'distinct_siret_count',
+    'address_count',
+    'email_count',
+    'missing_required_docs',
+    # Renseignées après validations (add_validation_features)
+    'cross_failed_checks',
+    'cross_anomalies',
+    'red_flag_count',
+    'red_flag_impact',
+    'home_work_distance_km',
+    'company_age_years',
+    'score',
+)
+
+COLUMN_INDEX = {name: i for i, name in enumerate(NUMERIC_COLUMNS)}
+
+REQUIRED_DOCUMENTS = ('contrat_travail', 'fiche_paie_1', 'avis_imposition', 'piece_identite')
+
+# Attributs non numériques conservés avec chaque enregistrement
+CATEGORICAL_FIELDS = ('dossier_id', 'timestamp', 'document_keys', 'missing_documents',
+                      'employer_siret', 'red_flag_rules', 'verdict')
+
+
+class DossierFeatures:
+    """Enregistrement de caractéristiques d'un dossier (schéma NUMERIC_COLUMNS)"""
+
+    __slots__ = ('values',) + CATEGORICAL_FIELDS
+
+    def __init__(self, dossier_id: str = '', timestamp: str = '', values: Optional[np.ndarray] = None):
+        self.values = np.full(len(NUMERIC_COLUMNS), np.nan) if values is None else values
+        self.dossier_id = dossier_id
+        self.timestamp = timestamp
+        self.document_keys = ()
+        self.missing_documents = ()
+        self.employer_siret = None
+        self.red_flag_rules = ()
+        self.verdict = None
+
+    def __getitem__(self, name: str) -> float:
+        return float(self.values[COLUMN_INDEX[name]])
+
+    def __setitem__(self, name: str, value: Optional[float]):
+        self.values[COLUMN_INDEX[name]] = np.nan if value is None else value
+
+    def get(self, name: str, default: Optional[float] = None) -> Optional[float]:
+        """Valeur de la colonne, ou `default` si NaN"""
+        value = self[name]
+        return default if math.isnan(value) else value
+
+    def categorical(self) -> Dict:
+        return {field: getattr(self, field) for field in CATEGORICAL_FIELDS}
+
+    def to_dict(self) -> Dict:
+        """Forme JSON (NaN -> None)"""
+        data = {name: self.get(name) for name in NUMERIC_COLUMNS}
+        data.update(self.categorical())
+        return data
+
+
+def _stats(values: List[float]):
+    if not values:
+        return 0, np.nan, np.nan, np.nan
+    return len(values), sum(values) / len(values), min(values), max(values)
+
+
+def extract_dossier_features(documents_data: Dict, structured_data: Dict,
+                             dossier_id: str = '', timestamp: Optional[str] = None) -> DossierFeatures:
+    """
+    Extrait l'enregistrement d'un dossier en une passe sur documents et données structurées
+
+    Args:
+        documents_data: analysis_results['documents']
+        structured_data: analysis_results['structured_data']
+    """
+
+    record = DossierFeatures(dossier_id, timestamp or datetime.now().isoformat())
+    record.document_keys = tuple(documents_data)
+    record.missing_documents = tuple(doc for doc in REQUIRED_DOCUMENTS if doc not in documents_data)
+
+    doc_scores = [doc.get('validation', {}).get('score_fraude', 0) for doc in documents_data.values()]
+    record['n_documents'] = len(documents_data)
+    record['n_images'] = sum(1 for doc in documents_data.values() if doc.get('metadata', {}).get('type') == 'image')
+    record['n_payslips'] = sum(1 for key in documents_data if key.startswith('fiche_paie'))
+    record['doc_score_mean'] = sum(doc_scores) / len(doc_scores) if doc_scores else None
+    record['missing_required_docs'] = len(record.missing_documents)
+
+    salaries, payslip_salaries, payslip_salaries_800, revenues = [], [], [], []
+    sirets = []
+    address_count = email_count = 0
+
+    for doc_key, data in structured_data.items():
+        is_payslip = doc_key.startswith('fiche_paie')
+        for amt in data.get('amounts', []):
+            if amt['category'] == 'salaire':
+                salaries.append(amt['value'])
+                if is_payslip:
+                    payslip_salaries.append(amt['value'])
+                    if amt['value'] > 800 and doc_key in documents_data:
+                        payslip_salaries_800.append(amt['value'])
+            elif amt['category'] == 'revenu':
+                revenues.append(amt['value'])
+
+        sirets.extend(data.get('siret', []))
+        address_count += len(data.get('addresses_detailed', []))
+        email_count += len(data.get('emails_detailed', []))
+
+    record['salary_count'], record['salary_mean'], record['salary_min'], record['salary_max'] = _stats(salaries)
+    record['payslip_salary_max'] = max(payslip_salaries) if payslip_salaries else None
+    count_800, _, min_800, max_800 = _stats(payslip_salaries_800)
+    record['payslip_salary_count_800'] = count_800
+    record['payslip_salary_min_800'] = min_800
+    record['payslip_salary_max_800'] = max_800
+    record['revenue_count'] = len(revenues)
+    record['revenue_max'] = max(revenues) if revenues else None
+    record['siret_count'] = len(sirets)
+    record['distinct_siret_count'] = len(set(sirets))
+    record['address_count'] = address_count
+    record['email_count'] = email_count
+
+    return record
+
+
+def add_validation_features(record: DossierFeatures, cross_validation: Optional[Dict] = None,
+                            external_validations: Optional[Dict] = None) -> DossierFeatures:
+    """Complète l'enregistrement avec les résultats de validation croisée et externe"""
+
+    if cross_validation is not None:
+        record['cross_failed_checks'] = sum(1 for v in cross_validation.get('checks', {}).values() if v is False)
+        record['cross_anomalies'] = len(cross_validation.get('anomalies', []))
+
+    if external_validations is not None:
+        red_flags = external_validations.get('red_flags', [])
+        record['red_flag_count'] = len(red_flags)
+        record['red_flag_impact'] = sum(flag['score_impact'] for flag in red_flags)
+        record.red_flag_rules = tuple(flag.get('rule', '') for flag in red_flags)
+        record.employer_siret = external_validations.get('employer_siret')
+
+        siret_info = external_validations.get('siret_validation') or {}
+        try:
+            record['company_age_years'] = datetime.now().year - int(siret_info['creation_date'][:4])
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    return record
+
+
+# ======================
+# TABLE D'HISTORIQUE
+# ======================
+
+class FeatureTable:
+    """Enregistrements de plusieurs dossiers : une matrice (n, len(NUMERIC_COLUMNS)) + attributs"""
+
+    __slots__ = ('values', 'categorical')
+
+    def __init__(self, values: np.ndarray, categorical: List[Dict]):
+        self.values = values
+        self.categorical = categorical
+
+    @classmethod
+    def from_records(cls, records: Iterable[DossierFeatures]) -> 'FeatureTable':
+        records = list(records)
+        values = np.vstack([r.values for r in records]) if records else np.empty((0, len(NUMERIC_COLUMNS)))
+        return cls(values, [r.categorical() for r in records])
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        """Vue (sans copie) sur une colonne numérique"""
+        return self.values[:, COLUMN_INDEX[name]]
+
+    def record(self, i: int) -> DossierFeatures:
+        record = DossierFeatures(values=self.values[i].copy())
+        for field, value in self.categorical[i].items():
+            setattr(record, field, tuple(value) if isinstance(value, list) else value)
+        return record
+
+    def to_frame(self):
+        """DataFrame pandas (colonnes numériques + identifiant et date)"""
+        import pandas as pd
+        frame = pd.DataFrame(self.values, columns=NUMERIC_COLUMNS)
+        frame.insert(0, 'dossier_id', [c['dossier_id'] for c in self.categorical])
+        frame.insert(1, 'timestamp', [c['timestamp'] for c in self.categorical])
+        return frame
+
+    def save(self, path: str):
+        """Fichier .npz : matrice float64 brute + attributs en JSON"""
+        np.savez(path, values=self.values, columns=np.array(NUMERIC_COLUMNS),
+                 categorical=np.array(json.dumps(self.categorical, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, path: str) -> 'FeatureTable':
+        with np.load(path, allow_pickle=False) as data:
+            columns = tuple(data['columns'].tolist())
+            values = data['values']
+            if columns != NUMERIC_COLUMNS:
+                # Schéma antérieur : réaligner les colonnes connues, NaN pour les nouvelles
+                aligned = np.full((values.shape[0], len(NUMERIC_COLUMNS)), np.nan)
+                for j, name in enumerate(columns):
+                    if name in COLUMN_INDEX:
+                        aligned[:, COLUMN_INDEX[name]] = values[:, j]
+                values = aligned
+            return cls(values, json.loads(str(data['categorical'])))
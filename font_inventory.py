@@ -0,0 +1,221 @@
+"""
+Inventaire des polices et segments de texte d'un PDF
+Une falsification classique de fiche de paie ne modifie que le « net à payer » :
+le nouveau montant est alors souvent rendu dans une autre police ou une autre
+taille que les montants voisins.
+
+Les polices sont comparées par famille (Helvetica-Bold et Helvetica sont la même
+famille) : la graisse et le style servent à la mise en forme légitime des totaux.
+Le dernier montant d'une colonne (total, « net à payer »), souvent plus grand,
+n'est comparé à la colonne que par famille.
+
+Les segments sont collectés pendant l'extraction de texte PyPDF2 (visitor_text,
+une seule passe sur les flux de contenu) ; seuls les segments numériques sont
+conservés, page par page, puis libérés après l'analyse de la page.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+
+# Montants, dates, quantités : chiffres avec séparateurs usuels
+NUMERIC_RUN_RE = re.compile(r'^[-+]?\d[\d\s.,/:]*\s*(?:€|EUR|%)?$')
+
+# Segments numériques conservés par page (mémoire bornée quel que soit le document)
+MAX_NUMERIC_RUNS_PER_PAGE = 400
+
+# Nombre maximal d'anomalies rapportées par document
+MAX_FINDINGS = 20
+
+# Suffixe de graisse / style d'un nom de police (Arial-BoldMT, Arial,Italic, TimesNewRomanPSMT)
+STYLE_SUFFIX_RE = re.compile(
+    r'[-,](?:(?:Bold|Bd|Italic|It|Oblique|Regular|Roman|Light|Medium|Semi[Bb]old|Demi(?:[Bb]old)?|'
+    r'Black|Heavy|Book|Condensed|Narrow|MT|PS)+)$|MT$'
+)
+
+
+def font_name(font_dict) -> str:
+    """Nom de police sans préfixe de sous-ensemble (ABCDEF+Helvetica -> Helvetica)"""
+    if not font_dict:
+        return 'inconnue'
+    try:
+        base_font = str(font_dict.get('/BaseFont', '') or '')
+    except Exception:
+        return 'inconnue'
+    base_font = base_font.lstrip('/')
+    if len(base_font) > 7 and base_font[6] == '+':
+        base_font = base_font[7:]
+    return base_font or 'inconnue'
+
+
+def font_family(name: str) -> str:
+    """Famille d'une police, sans suffixe de graisse ou de style (Arial-BoldMT -> Arial)"""
+    family = STYLE_SUFFIX_RE.sub('', name)
+    return STYLE_SUFFIX_RE.sub('', family) or name
+
+
+def _multiply(tm: List[float], cm: List[float]) -> Tuple[float, float, float, float, float, float]:
+    """Produit matrice de texte x matrice courante (matrices PDF à 6 coefficients)"""
+    a, b, c, d, e, f = tm
+    a2, b2, c2, d2, e2, f2 = cm
+    return (a * a2 + b * c2, a * b2 + b * d2,
+            c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+class TextRunInventory:
+    """
+    Collecte police / taille / position des segments de texte, page par page
+
+    Usage :
+        inventory = TextRunInventory()
+        for number, page in enumerate(reader.pages, 1):
+            page.extract_text(visitor_text=inventory.visitor)
+            inventory.end_page(number)
+        inventory.findings
+    """
+
+    def __init__(self, max_runs_per_page: int = MAX_NUMERIC_RUNS_PER_PAGE):
+        self.max_runs_per_page = max_runs_per_page
+        self.fonts = Counter()          # (police, taille) -> nombre de segments, tout le document
+        self.findings = []
+        self.pages = 0
+        self.numeric_runs = 0
+        self.truncated_pages = []
+        self._page_runs = []
+        self._page_truncated = False
+
+    def visitor(self, text, cm, tm, font_dict, font_size):
+        """Rappel visitor_text de PyPDF2 (un appel par segment de texte)"""
+        text = (text or '').strip()
+        if not text or not any(ch.isdigit() or ch.isalpha() for ch in text):
+            return
+
+        try:
+            matrix = _multiply(tm, cm)
+            size = round(float(font_size or 0) * math.hypot(matrix[2], matrix[3]) * 2) / 2
+        except (TypeError, ValueError):
+            return
+        key = (font_name(font_dict), size)
+        self.fonts[key] += 1
+
+        if not NUMERIC_RUN_RE.match(text):
+            return
+        if len(self._page_runs) >= self.max_runs_per_page:
+            self._page_truncated = True
+            return
+        self._page_runs.append({'text': text, 'font': key[0], 'family': font_family(key[0]), 'size': size,
+                                'x': matrix[4], 'y': matrix[5]})
+
+    def end_page(self, page_number: int):
+        """Analyse les segments de la page puis les libère"""
+        self.pages += 1
+        self.numeric_runs += len(self._page_runs)
+        if self._page_truncated:
+            self.truncated_pages.append(page_number)
+        if len(self.findings) < MAX_FINDINGS:
+            for finding in find_font_outliers(self._page_runs):
+                finding['page'] = page_number
+                self.findings.append(finding)
+        self.findings = self.findings[:MAX_FINDINGS]
+        self._page_runs = []
+        self._page_truncated = False
+
+    def summary(self) -> Dict:
+        """Résumé JSON (polices les plus utilisées, anomalies)"""
+        return {
+            'pages': self.pages,
+            'numeric_runs': self.numeric_runs,
+            'fonts': [{'font': font, 'size': size, 'runs': count}
+                      for (font, size), count in self.fonts.most_common(10)],
+            'findings': list(self.findings),
+            'truncated_pages': list(self.truncated_pages)
+        }
+
+
+def _majority(keys: List[Tuple[str, float]]) -> Optional[Tuple[Tuple[str, float], int]]:
+    if not keys:
+        return None
+    return Counter(keys).most_common(1)[0]
+
+
+def find_font_outliers(runs: List[Dict]) -> List[Dict]:
+    """
+    Segments numériques dont la police diffère de celle de leurs voisins
+
+    Les polices sont comparées par (famille, taille), sauf pour le dernier montant
+    d'une colonne (total) comparé par famille seulement.
+
+    - colonne : au moins 2 montants alignés (début ou fin estimée du segment)
+      partagent une police majoritaire que le segment n'utilise pas ;
+    - ligne : au moins 2 autres montants sur la même ligne, tous dans d'autres polices.
+    """
+    findings = []
+    for i, run in enumerate(runs):
+        family = run.get('family') or font_family(run['font'])
+        key = (family, run['size'])
+        tolerance = max(run['size'], 4.0)
+        end = run['x'] + len(run['text']) * run['size'] * 0.5
+
+        column_keys, line_keys = [], []
+        last_in_column = True
+        for j, other in enumerate(runs):
+            if i == j:
+                continue
+            other_family = other.get('family') or font_family(other['font'])
+            other_key = (other_family, other['size'])
+            if abs(other['y'] - run['y']) <= tolerance * 0.5:
+                line_keys.append(other_key)
+            else:
+                other_end = other['x'] + len(other['text']) * other['size'] * 0.5
+                if abs(other['x'] - run['x']) <= tolerance * 1.5 or abs(other_end - end) <= tolerance * 1.5:
+                    column_keys.append(other_key)
+                    if other['y'] < run['y']:
+                        last_in_column = False
+
+        expected, reason = None, None
+        majority = _majority(column_keys)
+        if last_in_column:
+            # Total de colonne : graisse et taille libres, la famille doit rester celle de la colonne
+            in_column = family in {k[0] for k in column_keys}
+        else:
+            in_column = key in column_keys
+        if len(column_keys) >= 2 and not in_column and majority[1] >= 2:
+            expected, reason = majority[0], 'colonne'
+        elif len(line_keys) >= 2 and key not in line_keys:
+            expected, reason = _majority(line_keys)[0], 'ligne'
+
+        if expected is not None:
+            findings.append({
+                'text': run['text'],
+                'font': run['font'],
+                'size': run['size'],
+                'expected_font': expected[0],
+                'expected_size': expected[1],
+                'reason': reason,
+                'x': round(run['x'], 1),
+                'y': round(run['y'], 1)
+            })
+    return findings
+
+
+def inventory_text_runs(reader: PdfReader, max_pages: Optional[int] = None) -> TextRunInventory:
+    """Inventaire complet d'un document déjà ouvert (une extraction de texte par page)"""
+    inventory = TextRunInventory()
+    for number, page in enumerate(reader.pages, 1):
+        if max_pages is not None and number > max_pages:
+            break
+        page.extract_text(visitor_text=inventory.visitor)
+        inventory.end_page(number)
+    return inventory
+
+
+def describe_finding(finding: Dict) -> str:
+    """Message lisible d'une anomalie de police"""
+    return (f"Montant « {finding['text']} » (page {finding.get('page', '?')}) en "
+            f"{finding['font']} {finding['size']:g} pt au lieu de "
+            f"{finding['expected_font']} {finding['expected_size']:g} pt ({finding['reason']})")
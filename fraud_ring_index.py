@@ -0,0 +1,185 @@
+"""
+Index inter-dossiers des identifiants (détection de réseaux de fraude)
+Index inversé persistant : identifiant normalisé -> dossiers où il apparaît
+
+Un même SIRET « employeur », téléphone, email, IBAN ou adresse de bailleur
+retrouvé dans de nombreuses candidatures signale un réseau de faux documents.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ban_local import parse_address
+
+
+IDENTIFIER_KINDS = ('siret', 'siren', 'phone', 'email', 'address', 'iban')
+
+DEFAULT_DB_PATH = os.path.join('data', 'history', 'fraud_rings.sqlite')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identifiers (
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    dossier_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (kind, value, dossier_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_identifiers_dossier ON identifiers (dossier_id);
+CREATE INDEX IF NOT EXISTS idx_identifiers_seen ON identifiers (seen_at);
+"""
+
+
+# ======================
+# NORMALISATION
+# ======================
+
+def normalize_identifier(kind: str, value: str) -> Optional[str]:
+    """
+    Forme canonique d'un identifiant (None si inexploitable)
+
+    - siret / siren : chiffres seuls (14 / 9)
+    - phone : 0XXXXXXXXX (+33 / 0033 ramenés au format national)
+    - email : minuscules
+    - address : 'code postal|numéro|tokens de voie' (normalisation BAN)
+    - iban : majuscules sans espaces
+    """
+    if not value:
+        return None
+
+    if kind in ('siret', 'siren'):
+        digits = re.sub(r'\D', '', value)
+        return digits if len(digits) == (14 if kind == 'siret' else 9) else None
+
+    if kind == 'phone':
+        digits = re.sub(r'\D', '', value)
+        if digits.startswith('0033'):
+            digits = '0' + digits[4:]
+        elif digits.startswith('33') and len(digits) == 11:
+            digits = '0' + digits[2:]
+        return digits if len(digits) == 10 and digits.startswith('0') else None
+
+    if kind == 'email':
+        email = value.strip().lower()
+        return email if '@' in email else None
+
+    if kind == 'address':
+        parsed = parse_address(value)
+        if not parsed['code_postal'] or not parsed['street_tokens']:
+            return None
+        return f"{parsed['code_postal']}|{parsed['numero'] or ''}|{' '.join(parsed['street_tokens'])}"
+
+    if kind == 'iban':
+        iban = re.sub(r'\s', '', value).upper()
+        return iban if len(iban) >= 15 else None
+
+    raise ValueError(f"Type d'identifiant inconnu : {kind}")
+
+
+def normalize_identifiers(identifiers: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    """Ensemble des (type, valeur normalisée) exploitables"""
+    normalized = set()
+    for kind, value in identifiers:
+        key = normalize_identifier(kind, value)
+        if key:
+            normalized.add((kind, key))
+    return normalized
+
+
+# ======================
+# INDEX PERSISTANT
+# ======================
+
+class FraudRingIndex:
+    """
+    Index inversé SQLite (clé primaire kind, value, dossier_id)
+
+    La recherche d'un identifiant est une lecture par préfixe de clé,
+    indépendante du nombre total de dossiers indexés.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def index_dossier(self, dossier_id: str, identifiers: Iterable[Tuple[str, str]],
+                      timestamp: Optional[float] = None) -> int:
+        """
+        Enregistre (ou remplace) les identifiants d'un dossier
+
+        Une réanalyse du même dossier remplace ses entrées précédentes.
+
+        Returns:
+            int: Nombre d'identifiants indexés
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = [(kind, value, dossier_id, timestamp) for kind, value in normalize_identifiers(identifiers)]
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM identifiers WHERE dossier_id = ?", (dossier_id,))
+            conn.executemany("INSERT OR REPLACE INTO identifiers VALUES (?, ?, ?, ?)", rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return len(rows)
+
+    def lookup(self, identifiers: Iterable[Tuple[str, str]], exclude_dossier: Optional[str] = None,
+               window_days: Optional[float] = None) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Autres dossiers contenant chacun des identifiants
+
+        Args:
+            identifiers: (type, valeur brute)
+            exclude_dossier: Dossier courant (ignoré dans les résultats)
+            window_days: Ne retenir que les dossiers analysés depuis ce nombre de jours
+
+        Returns:
+            dict: {(type, valeur normalisée): [dossier_id, ...]} pour les identifiants déjà vus
+        """
+        since = 0.0 if window_days is None else time.time() - window_days * 86400
+        conn = self._connection()
+
+        matches = {}
+        for kind, value in normalize_identifiers(identifiers):
+            rows = conn.execute(
+                "SELECT dossier_id FROM identifiers WHERE kind = ? AND value = ? AND seen_at >= ? AND dossier_id != ?",
+                (kind, value, since, exclude_dossier or '')
+            ).fetchall()
+            if rows:
+                matches[(kind, value)] = [row[0] for row in rows]
+        return matches
+
+    def purge(self, older_than_days: float) -> int:
+        """Supprime les entrées anciennes (durée de conservation RGPD)"""
+        conn = self._connection()
+        cursor = conn.execute("DELETE FROM identifiers WHERE seen_at < ?", (time.time() - older_than_days * 86400,))
+        return cursor.rowcount
+
+
+_registry_lock = threading.Lock()
+_indexes: Dict[str, FraudRingIndex] = {}
+
+
+def get_index(path: str = DEFAULT_DB_PATH) -> FraudRingIndex:
+    """Index partagé par chemin (survit aux réexécutions du script Streamlit)"""
+    with _registry_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = FraudRingIndex(path)
+        return index
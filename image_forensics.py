@@ -0,0 +1,578 @@
+"""
+Analyse forensique des images et scans (ELA, copier-coller)
+
+- ELA : une zone collée ou retouchée n'a pas le même historique de compression
+  JPEG que le reste de l'image ; recompressée une fois de plus, elle s'écarte
+  davantage (ou moins) de l'original que les zones de texture comparable.
+  Sans historique JPEG (PNG, TIFF LZW ou CCITT, pixels bruts d'un PDF), pas d'ELA.
+- Copier-coller : un chiffre ou un cachet dupliqué dans la même page laisse
+  deux zones aux descripteurs DCT identiques, séparées d'un même décalage.
+- Empreinte perceptuelle (pHash 64 bits) : une même photo ou un même scan
+  réutilisé dans un autre dossier reste à quelques bits de distance, même
+  recompressé ou redimensionné.
+
+Les calculs sont entièrement vectorisés (NumPy) sur une copie de travail en
+niveaux de gris, réduite par un facteur entier au-delà d'un budget de pixels
+(ELA) ou de blocs (copier-coller). Chaque analyse déclare sa résolution : l'image
+n'est décodée qu'une fois, à la résolution utile (image_pyramid).
+
+Usage :
+    python image_forensics.py scan.jpg [--block-budget 600000]
+    python image_forensics.py --benchmark
+"""
+
+import argparse
+import io
+import math
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PyPDF2 import PdfReader
+
+import image_pyramid
+import parser_sandbox
+import pdf_images
+
+
+ELA_QUALITY = 90                    # Qualité JPEG de recompression
+ELA_REFERENCE_QUALITY = 30          # Qualité de référence : l'erreur à ELA_QUALITY lui est rapportée
+ELA_BLOCK = 16                      # Côté des blocs statistiques (multiple de la grille JPEG 8x8)
+ELA_PIXEL_BUDGET = 12_000_000       # Au-delà : réduction par facteur entier
+ELA_TEXTURE_BINS = 8                # Classes de texture pour la ligne de base
+ELA_MIN_TEXTURE = 2.0               # Blocs plus lisses ignorés (papier blanc)
+ELA_WINDOW = 3                      # Voisinage de blocs moyenné (zone retouchée)
+ELA_OUTLIER_Z = 6.0                 # Écart robuste d'un bloc atypique
+ELA_Z_FLOOR = 2.0                   # Score = (z moyen de la zone la plus atypique - plancher) / étendue
+ELA_Z_SPAN = 8.0
+ELA_HEATMAP_MAX_Z = 10.0
+
+COPY_MOVE_BLOCK = 8                 # Blocs chevauchants (pas de 1 pixel) de la copie de travail
+COPY_MOVE_BLOCK_BUDGET = 600_000    # Nombre maximal de blocs indexés (A4 300 dpi : réduction x2)
+COPY_MOVE_QUANT = 4.0               # Pas de quantification des coefficients DCT
+COPY_MOVE_MIN_TEXTURE = 4.0         # Écart-type minimal d'un bloc (papier blanc ignoré)
+COPY_MOVE_MAX_BUCKET = 8            # Descripteurs partagés par plus de blocs : motif répétitif, ignorés
+COPY_MOVE_MIN_SHIFT = 16            # Décalage minimal (px de travail) entre une zone et sa copie
+COPY_MOVE_MIN_BLOCKS = 50           # Blocs appariés au même décalage pour retenir une zone
+COPY_MOVE_MAX_REGIONS = 5           # Au-delà : contenu répétitif (document généré), non concluant
+
+# Coefficients basse fréquence (u, v) du descripteur de bloc, indice u * 3 + v
+_COPY_MOVE_COEFFS = [u * 3 + v for u, v in ((0, 0), (0, 1), (1, 0), (1, 1), (0, 2), (2, 0), (1, 2), (2, 1))]
+
+MAX_EMBEDDED_IMAGES = 10            # Images intégrées analysées par PDF
+
+PHASH_SIZE = 32                     # Côté de la vignette du pHash
+PHASH_COEFFS = 8                    # Coefficients DCT basse fréquence retenus (8 x 8 = 64 bits)
+PHASH_MIN_CONTRAST = 2.0            # Vignette plus uniforme (page blanche) : pas d'empreinte
+
+# Résolutions déclarées à la pyramide de décodage
+ELA_RESOLUTION = image_pyramid.Resolution('ela', max_pixels=ELA_PIXEL_BUDGET)
+PHASH_RESOLUTION = image_pyramid.Resolution('phash', min_pixels=(PHASH_SIZE * 8) ** 2)
+
+
+def copy_move_resolution(block_budget: int = COPY_MOVE_BLOCK_BUDGET) -> image_pyramid.Resolution:
+    """Résolution du copier-coller : au moins deux phases de sous-échantillonnage par axe"""
+    return image_pyramid.Resolution('copy_move', min_pixels=16 * block_budget)
+
+
+def forensic_resolutions(copy_move_budget: Optional[int] = COPY_MOVE_BLOCK_BUDGET) -> List[image_pyramid.Resolution]:
+    """Résolutions des analyses d'analyze_pyramid (à déclarer à l'ouverture de la pyramide)"""
+    resolutions = [ELA_RESOLUTION, PHASH_RESOLUTION]
+    if copy_move_budget:
+        resolutions.append(copy_move_resolution(copy_move_budget))
+    return resolutions
+
+
+def working_copy(image: Image.Image, pixel_budget: int = ELA_PIXEL_BUDGET) -> Tuple[Image.Image, int]:
+    """
+    Copie de travail en niveaux de gris, réduite par un facteur entier si nécessaire
+
+    Returns:
+        tuple: (image 'L', facteur de réduction)
+    """
+    factor = max(1, math.ceil(math.sqrt(image.width * image.height / pixel_budget)))
+    gray = image.convert('L')
+    if factor > 1:
+        gray = gray.reduce(factor)
+    return gray, factor
+
+
+def _block_means(values: np.ndarray, block: int) -> np.ndarray:
+    h, w = values.shape
+    return values.reshape(h // block, block, w // block, block).mean(axis=(1, 3), dtype=np.float32)
+
+
+def _empty_ela(block: int = ELA_BLOCK, factor: int = 1) -> Dict:
+    return {
+        'ela_applicable': True, 'score': 0.0, 'z_max': 0.0, 'outlier_blocks': 0, 'active_blocks': 0,
+        'block_size': block * factor, 'scale': factor, 'hotspot': None,
+        'heatmap': np.zeros((0, 0), dtype=np.uint8), 'elapsed_ms': 0.0
+    }
+
+
+def _recompression_error(work: Image.Image, original: np.ndarray, quality: int) -> np.ndarray:
+    buffer = io.BytesIO()
+    work.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    recompressed = Image.open(buffer)
+    recompressed.load()
+    height, width = original.shape
+    return np.abs(original - np.asarray(recompressed, dtype=np.int16)[:height, :width])
+
+
+def _local_mean(z: np.ndarray, active: np.ndarray, window: int = ELA_WINDOW) -> np.ndarray:
+    """Moyenne de z sur les blocs actifs de chaque voisinage window x window (-inf si trop peu de blocs actifs)"""
+    pad = window // 2
+    totals = sliding_window_view(np.pad(np.where(active, z, 0), pad), (window, window)).sum(axis=(2, 3))
+    counts = sliding_window_view(np.pad(active.astype(np.float32), pad), (window, window)).sum(axis=(2, 3))
+    return np.where(active & (counts >= (window * window + 1) // 2), totals / np.maximum(counts, 1), -np.inf)
+
+
+def error_level_analysis(image: Image.Image, quality: int = ELA_QUALITY, block: int = ELA_BLOCK,
+                         pixel_budget: int = ELA_PIXEL_BUDGET) -> Dict:
+    """
+    ELA d'une image
+
+    L'erreur de recompression de chaque bloc est rapportée à son erreur à une
+    qualité de référence basse (ELA_REFERENCE_QUALITY) : la part due au contenu
+    (contours nets d'un texte) s'annule, reste celle due à l'historique de
+    compression. Ce rapport est comparé à celui des blocs de texture comparable
+    (écart robuste médiane / MAD par classe de texture), puis moyenné sur un
+    voisinage de blocs : une retouche couvre une zone, pas un bloc isolé.
+
+    Returns:
+        dict: score (0-1, comparable à FRAUD_THRESHOLDS['image_ela_score']),
+              z_max, blocs atypiques, point chaud (pixels de l'original),
+              heatmap (uint8, un pixel par bloc), durée
+    """
+    start = time.perf_counter()
+    work, factor = working_copy(image, pixel_budget)
+
+    original = np.asarray(work, dtype=np.int16)
+    height = original.shape[0] - original.shape[0] % block
+    width = original.shape[1] - original.shape[1] % block
+    result = _empty_ela(block, factor)
+    if height == 0 or width == 0:
+        return result
+
+    original = original[:height, :width]
+    gradient = (np.abs(np.diff(original, axis=1, append=original[:, -1:]))
+                + np.abs(np.diff(original, axis=0, append=original[-1:, :])))
+    block_error = _block_means(_recompression_error(work, original, quality), block)
+    reference_error = _block_means(_recompression_error(work, original, ELA_REFERENCE_QUALITY), block)
+    ratio = block_error / (reference_error + 0.5)
+    texture = _block_means(gradient, block)
+
+    active = texture > ELA_MIN_TEXTURE
+    z = np.zeros_like(ratio)
+    if active.sum() >= ELA_TEXTURE_BINS * 10:
+        edges = np.quantile(texture[active], np.linspace(0, 1, ELA_TEXTURE_BINS + 1)[1:-1])
+        bins = np.digitize(texture, edges)
+        for b in range(ELA_TEXTURE_BINS):
+            members = active & (bins == b)
+            if members.sum() < 10:
+                continue
+            values = ratio[members]
+            median = np.median(values)
+            mad = np.median(np.abs(values - median))
+            z[members] = (values - median) / (1.4826 * mad + 0.05)
+
+    zone = _local_mean(z, active)
+    if np.isfinite(zone).any():
+        row, col = np.unravel_index(int(np.argmax(zone)), zone.shape)
+        zone_z = float(zone[row, col])
+        result.update({
+            'score': round(float(np.clip((zone_z - ELA_Z_FLOOR) / ELA_Z_SPAN, 0.0, 1.0)), 3),
+            'z_max': round(zone_z, 2),
+            'outlier_blocks': int(((z > ELA_OUTLIER_Z) & active).sum()),
+            'active_blocks': int(active.sum()),
+            'hotspot': (int((col + 0.5) * block * factor), int((row + 0.5) * block * factor)),
+        })
+
+    result['heatmap'] = (np.clip(np.where(np.isfinite(zone), zone, 0), 0, ELA_HEATMAP_MAX_Z)
+                         * (255 / ELA_HEATMAP_MAX_Z)).astype(np.uint8)
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def heatmap_image(ela: Dict, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Heatmap ELA en rouge (blocs atypiques), agrandie à `size` si fourni"""
+    heat = ela['heatmap']
+    rgb = np.zeros(heat.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = heat
+    image = Image.fromarray(rgb, 'RGB')
+    if size:
+        image = image.resize(size, Image.NEAREST)
+    return image
+
+
+def _dct_basis(size: int, count: int) -> np.ndarray:
+    """Vecteurs de base DCT-II orthonormés (count x size)"""
+    i = np.arange(size)
+    return np.stack([np.cos(np.pi * (2 * i + 1) * u / (2 * size)) * math.sqrt((1 if u == 0 else 2) / size)
+                     for u in range(count)]).astype(np.float32)
+
+
+def _descriptor_hashes(descriptors: np.ndarray) -> np.ndarray:
+    """Empreinte 64 bits de chaque descripteur (8 coefficients quantifiés sur 16 bits)"""
+    quantized = np.rint(descriptors * (1 / COPY_MOVE_QUANT)).astype(np.int16)
+    words = np.ascontiguousarray(quantized).view(np.uint64)
+    with np.errstate(over='ignore'):
+        return (words[:, 0] * np.uint64(0x9E3779B97F4A7C15)) ^ words[:, 1]
+
+
+def _block_descriptors(values: np.ndarray, block: int,
+                       min_texture: float = COPY_MOVE_MIN_TEXTURE) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Empreintes des blocs chevauchants texturés d'une image en niveaux de gris
+
+    Returns:
+        tuple: (lignes, colonnes, empreintes, texture) des blocs retenus
+    """
+    if min(values.shape) < block:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty.astype(np.uint64), empty.astype(np.float32)
+
+    # DCT 2D séparable de tous les blocs : lignes puis colonnes
+    basis = _dct_basis(block, 3)
+    rows = sliding_window_view(values, block, axis=1) @ basis.T
+    coefficients = np.einsum('hwkb,ub->uhwk', sliding_window_view(rows, block, axis=0), basis)
+    width = coefficients.shape[2]
+    coefficients = coefficients.reshape(3, -1, 3)       # (u, bloc, v), sans copie
+
+    # Texture : énergie AC basse fréquence du bloc (écart-type approché)
+    energy = np.einsum('unv,unv->n', coefficients, coefficients) - coefficients[0, :, 0] ** 2
+    texture = np.sqrt(np.maximum(energy, 0)) / block
+    selected = np.flatnonzero(texture > min_texture)
+
+    descriptors = coefficients[:, selected, :].transpose(1, 0, 2).reshape(len(selected), 9)
+    hashes = _descriptor_hashes(descriptors[:, _COPY_MOVE_COEFFS])
+    ys, xs = np.divmod(selected, width)
+    return ys, xs, hashes, texture[selected]
+
+
+def detect_copy_move(image: Image.Image, block_budget: int = COPY_MOVE_BLOCK_BUDGET,
+                     block: int = COPY_MOVE_BLOCK) -> Dict:
+    """
+    Zones dupliquées dans une même image (copier-coller)
+
+    Chaque bloc chevauchant est résumé par ses coefficients DCT basse fréquence
+    quantifiés. Les blocs de la copie de travail forment un index de hachage
+    (empreintes triées) ; les blocs de chaque phase de sous-échantillonnage y
+    sont recherchés (une copie décalée d'un nombre impair de pixels n'est
+    alignée que sur l'une des phases), sans comparaison deux à deux. Une copie
+    produit de nombreux appariements au même décalage.
+
+    Args:
+        block_budget: Nombre maximal de blocs indexés (la copie de travail est
+            réduite au-delà ; seuls les blocs les plus texturés sont gardés)
+
+    Returns:
+        dict: score (0-1), zones dupliquées (source, cible, décalage en pixels
+              de l'original), contenu répétitif, blocs indexés, durée
+    """
+    start = time.perf_counter()
+    gray = image.convert('L')
+    factor = max(1, math.ceil(math.sqrt(gray.width * gray.height / (4 * block_budget))))
+    result = {
+        'score': 0.0, 'regions': [], 'repetitive': False, 'indexed_blocks': 0,
+        'scale': factor, 'elapsed_ms': 0.0
+    }
+
+    def working(phase_x: int, phase_y: int) -> np.ndarray:
+        phase = gray if phase_x == phase_y == 0 else gray.crop((phase_x, phase_y, gray.width, gray.height))
+        return np.asarray(phase.reduce(factor) if factor > 1 else phase, dtype=np.float32)
+
+    # Index : blocs de la phase (0, 0)
+    ys, xs, hashes, texture = _block_descriptors(working(0, 0), block)
+    if len(ys) > block_budget:
+        keep = np.argpartition(texture, -block_budget)[-block_budget:]
+        ys, xs, hashes = ys[keep], xs[keep], hashes[keep]
+    result['indexed_blocks'] = len(ys)
+    if len(ys) < COPY_MOVE_MIN_BLOCKS:
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    order = np.argsort(hashes)
+    sorted_hashes = hashes[order]
+    # Taille du groupe d'empreintes identiques, lue à la première position du groupe
+    group_start = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+    group_size = np.zeros(len(sorted_hashes), dtype=np.int64)
+    group_size[group_start] = np.diff(np.r_[group_start, len(sorted_hashes)])
+
+    offset_x, offset_y, source = [], [], []
+    for phase_y in range(factor):
+        for phase_x in range(factor):
+            if phase_x == phase_y == 0:
+                query_ys, query_xs, query_hashes = ys, xs, hashes
+            else:
+                query_ys, query_xs, query_hashes, _ = _block_descriptors(working(phase_x, phase_y), block)
+
+            # Blocs indexés de même empreinte (buckets trop peuplés : motif répétitif) ;
+            # requêtes triées pour un parcours séquentiel de l'index
+            query_order = np.argsort(query_hashes)
+            query_ys, query_xs, query_hashes = query_ys[query_order], query_xs[query_order], query_hashes[query_order]
+            low = np.minimum(np.searchsorted(sorted_hashes, query_hashes), len(sorted_hashes) - 1)
+            count = np.where(sorted_hashes[low] == query_hashes, group_size[low], 0)
+            count[count > COPY_MOVE_MAX_BUCKET] = 0
+            queries = np.repeat(np.arange(len(query_hashes)), count)
+            rank = np.arange(len(queries)) - np.repeat(np.cumsum(count) - count, count)
+            anchors = order[low[queries] + rank]
+
+            # Décalage en pixels de l'original
+            offset_x.append((query_xs[queries] - xs[anchors]) * factor + phase_x)
+            offset_y.append((query_ys[queries] - ys[anchors]) * factor + phase_y)
+            source.append(anchors)
+
+    dx, dy, source = np.concatenate(offset_x), np.concatenate(offset_y), np.concatenate(source)
+    # Chaque copie est vue dans les deux sens : la zone la plus haute est la référence
+    forward = (dy > 0) | ((dy == 0) & (dx > 0))
+    min_shift = COPY_MOVE_MIN_SHIFT * factor
+    keep = forward & (dx * dx + dy * dy >= min_shift ** 2)
+    dx, dy, source = dx[keep], dy[keep], source[keep]
+    if len(source) == 0:
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    # Un décalage (dx, dy) par entier : dy > 0 ou dx > 0, |dx| < largeur
+    width = gray.width
+    keys, inverse, counts = np.unique(dy * (2 * width) + dx + width, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    significant = np.flatnonzero(counts >= COPY_MOVE_MIN_BLOCKS)
+    significant = significant[np.argsort(-counts[significant])]
+
+    regions = []
+    for k in significant[:COPY_MOVE_MAX_REGIONS]:
+        members = source[inverse == k]
+        shift_y, shift_x = divmod(int(keys[k]), 2 * width)
+        shift_x -= width
+        # Emprise de la zone (quelques appariements isolés au même décalage écartés)
+        x0, x1 = (int(v) * factor for v in np.percentile(xs[members], (2, 98)))
+        y0, y1 = (int(v) * factor for v in np.percentile(ys[members], (2, 98)))
+        x1, y1 = x1 + block * factor, y1 + block * factor
+        regions.append({
+            'source': (x0, y0, x1, y1),
+            'target': (x0 + shift_x, y0 + shift_y, x1 + shift_x, y1 + shift_y),
+            'offset': (shift_x, shift_y),
+            'blocks': int(counts[k])
+        })
+
+    result['regions'] = regions
+    result['repetitive'] = len(significant) > COPY_MOVE_MAX_REGIONS
+    if regions and not result['repetitive']:
+        result['score'] = round(min(1.0, regions[0]['blocks'] / (4 * COPY_MOVE_MIN_BLOCKS)), 3)
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+# ======================
+# EMPREINTE PERCEPTUELLE
+# ======================
+
+def perceptual_hash(image: Image.Image) -> Optional[int]:
+    """
+    pHash 64 bits : coefficients DCT 8 x 8 basse fréquence d'une vignette 32 x 32
+    comparés à leur médiane (None pour une image uniforme)
+    """
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    thumbnail = image.resize((PHASH_SIZE, PHASH_SIZE), Image.BOX, reducing_gap=2.0).convert('L')
+    values = np.asarray(thumbnail, dtype=np.float32)
+    if values.std() < PHASH_MIN_CONTRAST:
+        return None
+    basis = _dct_basis(PHASH_SIZE, PHASH_COEFFS)
+    coefficients = (basis @ values @ basis.T).ravel()
+    bits = coefficients > np.median(coefficients[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Nombre de bits différents entre deux empreintes 64 bits"""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def _rescale_ela(result: Dict, factor: int) -> Dict:
+    """Coordonnées d'une ELA faite sur un niveau réduit ramenées aux pixels de l'original"""
+    if factor > 1:
+        result['block_size'] *= factor
+        result['scale'] *= factor
+        if result['hotspot']:
+            result['hotspot'] = tuple(v * factor for v in result['hotspot'])
+    return result
+
+
+def _rescale_copy_move(result: Dict, factor: int) -> Dict:
+    if factor > 1:
+        result['scale'] *= factor
+        for region in result['regions']:
+            for key in ('source', 'target', 'offset'):
+                region[key] = tuple(v * factor for v in region[key])
+    return result
+
+
+def analyze_pyramid(pyramid: image_pyramid.ImagePyramid,
+                    copy_move_budget: Optional[int] = COPY_MOVE_BLOCK_BUDGET) -> Dict:
+    """
+    ELA, copier-coller et empreinte perceptuelle, chacun au niveau de la pyramide
+    qu'il a déclaré (forensic_resolutions) ; coordonnées en pixels de l'original.
+    Pas d'ELA sans historique JPEG (PNG, TIFF LZW ou CCITT, pixels bruts d'un PDF) :
+    rien à comparer, la recompression ne mesurerait que le contenu.
+
+    Returns:
+        dict: résultat ELA complété de 'copy_move' (ou None), 'phash' et 'size'
+    """
+    if not pyramid.jpeg_history:
+        result = _empty_ela()
+        result['ela_applicable'] = False
+    else:
+        result = _rescale_ela(error_level_analysis(pyramid.level(ELA_RESOLUTION)),
+                              pyramid.level_factor(ELA_RESOLUTION))
+    result['copy_move'] = None
+    if copy_move_budget:
+        resolution = copy_move_resolution(copy_move_budget)
+        result['copy_move'] = _rescale_copy_move(detect_copy_move(pyramid.level(resolution), copy_move_budget),
+                                                 pyramid.level_factor(resolution))
+    result['phash'] = perceptual_hash(pyramid.level(PHASH_RESOLUTION))
+    result['size'] = pyramid.native_size
+    return result
+
+
+def analyze_image(image: Image.Image, copy_move_budget: Optional[int] = COPY_MOVE_BLOCK_BUDGET) -> Dict:
+    """
+    ELA, copier-coller et empreinte perceptuelle d'une image (copy_move_budget=None : sans copier-coller)
+
+    Returns:
+        dict: résultat ELA complété de 'copy_move' (ou None), 'phash' et 'size'
+    """
+    return analyze_pyramid(image_pyramid.ImagePyramid(image, forensic_resolutions(copy_move_budget)),
+                           copy_move_budget)
+
+
+def analyze_image_file(image_file, copy_move_budget: Optional[int] = COPY_MOVE_BLOCK_BUDGET) -> Dict:
+    """Analyse d'un fichier image déposé (JPEG, PNG...), décodé à la résolution utile"""
+    with image_pyramid.ImagePyramid.open(image_file, forensic_resolutions(copy_move_budget)) as pyramid:
+        return analyze_pyramid(pyramid, copy_move_budget)
+
+
+def analyze_pdf_images(pdf_file, copy_move_budget: Optional[int] = COPY_MOVE_BLOCK_BUDGET,
+                       reader: Optional[PdfReader] = None,
+                       ocr: Optional[Callable[[Image.Image], Optional[str]]] = None,
+                       ocr_resolution: Optional[image_pyramid.Resolution] = None) -> List[Dict]:
+    """
+    Analyse de chaque image intégrée d'un PDF (scans, photos de justificatifs)
+
+    Les images sont extraites une à une (pdf_images), décodées une seule fois à
+    la résolution utile (image_pyramid) et libérées après analyse.
+
+    Args:
+        reader: PdfReader déjà ouvert sur pdf_file (évite un second parsing)
+        ocr: Lecture du texte de chaque image (PDF scanné sans texte extractible)
+        ocr_resolution: Résolution déclarée par l'OCR (défaut : pleine résolution)
+
+    Returns:
+        list: résultat d'analyze_image par image, avec page, nom, dimensions,
+              filtre, empreinte SHA-256 du flux encodé et texte OCR éventuel
+    """
+    if reader is None:
+        pdf_file.seek(0)
+        reader = PdfReader(pdf_file)
+    resolutions = forensic_resolutions(copy_move_budget)
+    if ocr is not None:
+        ocr_resolution = ocr_resolution or image_pyramid.Resolution('ocr')
+        resolutions.append(ocr_resolution)
+    results = []
+    for embedded in pdf_images.iter_image_xobjects(reader, max_images=MAX_EMBEDDED_IMAGES):
+        try:
+            with image_pyramid.ImagePyramid(embedded.open(), resolutions, owned=True) as pyramid:
+                result = analyze_pyramid(pyramid, copy_move_budget)
+                if ocr is not None:
+                    result['ocr_text'] = ocr(pyramid.level(ocr_resolution))
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception:
+            continue
+        result.update(embedded.to_dict())
+        results.append(result)
+    return results
+
+
+# ======================
+# BANC D'ESSAI
+# ======================
+
+def _synthetic_payslip(seed: int = 0, size: Tuple[int, int] = (2480, 3508)) -> Image.Image:
+    """Fiche de paie synthétique « imprimée puis scannée » en A4 300 dpi"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    page = Image.new('L', size, 245)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=38)
+    labels = ["Salaire de base", "Cotisation maladie", "Cotisation vieillesse", "CSG deductible", "Prime"]
+    for row in range(30):
+        y = 500 + 70 * row
+        draw.text((150, y), labels[row % len(labels)], fill=15, font=font)
+        draw.text((1300, y), f"{rng.integers(10, 3000)},{rng.integers(0, 99):02d}", fill=15, font=font)
+        draw.line((140, y + 52, 2300, y + 52), fill=120, width=2)
+    draw.ellipse((1650, 2780, 2050, 3050), outline=60, width=6)
+    draw.text((1690, 2880), "CACHET", fill=40, font=ImageFont.load_default(size=60))
+
+    # Impression / numérisation : décalage sous-pixel par bande, flou, grain du papier, bruit
+    pixels = np.asarray(page.resize((width * 2, height * 2), Image.NEAREST), dtype=np.float32)
+    for y0 in range(0, 2 * height, 140):
+        pixels[y0:y0 + 140] = np.roll(pixels[y0:y0 + 140], int(rng.integers(-1, 2)), axis=1)
+    page = Image.fromarray(pixels.astype(np.uint8)).resize(size, Image.BILINEAR).filter(ImageFilter.GaussianBlur(0.9))
+    grain = Image.fromarray(np.clip(rng.normal(128, 6, (height // 4, width // 4)), 0, 255).astype(np.uint8))
+    grain = np.asarray(grain.resize(size, Image.BICUBIC), dtype=np.float32) - 128
+    pixels = np.asarray(page, dtype=np.float32) + grain * 0.5 + rng.normal(0, 4, (height, width))
+    return _jpeg_roundtrip(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)), 85)
+
+
+def _jpeg_roundtrip(image: Image.Image, quality: int) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def run_benchmark(budgets: Tuple[int, ...] = (150_000, 300_000, COPY_MOVE_BLOCK_BUDGET), repeat: int = 2):
+    """Durées ELA / copier-coller sur des pages A4 300 dpi (authentique, cachet dupliqué, montant recopié)"""
+    genuine = _synthetic_payslip()
+    stamp = genuine.copy()
+    stamp.paste(genuine.crop((1640, 2770, 2060, 3060)), (301, 2751))
+    amount = genuine.copy()
+    amount.paste(genuine.crop((1300, 780, 1450, 825)), (1300, 1200))
+    pages = (('authentique', genuine), ('cachet dupliqué', _jpeg_roundtrip(stamp, 85)),
+             ('montant recopié', _jpeg_roundtrip(amount, 85)))
+
+    print(f"📄 Page A4 300 dpi {genuine.width}x{genuine.height} ({genuine.width * genuine.height / 1e6:.1f} Mpx)")
+    for name, page in pages:
+        timings = [error_level_analysis(page)['elapsed_ms'] for _ in range(repeat)]
+        print(f"   ELA {name} : {min(timings):.0f} ms")
+        for budget in budgets:
+            runs = [detect_copy_move(page, budget) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r['elapsed_ms'])
+            zones = ', '.join(f"décalage {r['offset']} ({r['blocks']} blocs)" for r in best['regions']) or 'aucune zone'
+            print(f"   Copier-coller {name}, budget {budget} blocs (réduction x{best['scale']}, "
+                  f"{best['indexed_blocks']} indexés) : {best['elapsed_ms']:.0f} ms, score {best['score']} - {zones}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ELA et détection de copier-coller d'une image")
+    parser.add_argument('image', nargs='?')
+    parser.add_argument('--block-budget', type=int, default=COPY_MOVE_BLOCK_BUDGET)
+    parser.add_argument('--benchmark', action='store_true', help="Banc d'essai sur des pages A4 300 dpi synthétiques")
+    args = parser.parse_args()
+
+    if args.benchmark or not args.image:
+        run_benchmark()
+    else:
+        analysis = analyze_image_file(args.image, args.block_budget)
+        print(f"🔍 ELA : score {analysis['score']} (z {analysis['z_max']}, {analysis['outlier_blocks']} bloc(s) atypique(s), "
+              f"{analysis['elapsed_ms']:.0f} ms)")
+        copy_move = analysis['copy_move']
+        print(f"🔍 Copier-coller : score {copy_move['score']} ({copy_move['elapsed_ms']:.0f} ms)"
+              + (" - contenu répétitif, non concluant" if copy_move['repetitive'] else ""))
+        for region in copy_move['regions']:
+            print(f"   Zone {region['source']} -> {region['target']} (décalage {region['offset']}, {region['blocks']} blocs)")
@@ -0,0 +1,243 @@
+"""
+Décodage des images à la résolution utile, partagé entre OCR et analyses forensiques
+Une photo de pièce d'identité prise au smartphone fait 12 à 50 Mpx : ni l'OCR
+(300 dpi effectifs), ni l'ELA (budget de pixels), ni l'empreinte perceptuelle
+(vignette 32 x 32), ni l'aperçu de l'interface n'ont besoin de la pleine résolution.
+
+Chaque consommateur déclare la résolution qu'il lui faut (Resolution) :
+- min_pixels : au moins ce nombre de pixels (niveau le plus réduit qui les atteint) ;
+- max_pixels : au plus ce nombre de pixels (niveau le plus grand qui les respecte) ;
+- dpi : résolution effective minimale, d'après la résolution du scan ou, pour une
+  photo (résolution déclarée non fiable), en supposant qu'elle cadre une page A4.
+
+L'image est décodée une seule fois (ImagePyramid), au facteur le plus réduit
+compatible avec tous les consommateurs déclarés : un JPEG est décodé directement
+au 1/2, 1/4 ou 1/8 en mode brouillon (draft, réduction dans le domaine DCT, sans
+passer par la pleine résolution). Les niveaux suivants sont dérivés du niveau
+déjà décodé le plus proche par Image.reduce (facteur entier) et mis en cache.
+
+Une image multipage (TIFF de scanner) est parcourue page par page (iter_pages) :
+chaque page est décodée dans sa propre pyramide, libérée avant la page suivante,
+si bien que la mémoire ne croît pas avec le nombre de pages.
+
+Usage :
+    python image_pyramid.py photo.jpg [--dpi 300]
+"""
+
+import argparse
+import math
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from PIL import Image, ImageSequence
+
+
+MIN_SCAN_DPI = 150                  # Résolution déclarée en deçà : photo, résolution non fiable
+PAGE_INCHES = (8.27, 11.69)         # Page A4 supposée cadrée par une photo
+DRAFT_SCALES = (8, 4, 2)            # Réductions possibles au décodage JPEG
+MULTIPAGE_FORMATS = ('TIFF',)       # Formats dont chaque image est une page du document
+JPEG_FORMATS = ('JPEG', 'MPO')
+JPEG_TIFF_COMPRESSIONS = ('jpeg', 'tiff_jpeg')  # TIFF dont les pages sont codées en JPEG
+
+# Modes non pris en charge par Image.reduce : conversion au décodage
+_REDUCE_MODES = {'1': 'L', 'P': 'RGB', 'I;16': 'I', 'I;16L': 'I', 'I;16B': 'I'}
+
+
+class Resolution:
+    """
+    Résolution déclarée par un consommateur d'image
+
+    Usage :
+        OCR_RESOLUTION = Resolution('ocr', dpi=300)
+        ELA_RESOLUTION = Resolution('ela', max_pixels=12_000_000)
+    """
+
+    __slots__ = ('name', 'min_pixels', 'max_pixels', 'dpi')
+
+    def __init__(self, name: str, min_pixels: Optional[int] = None, max_pixels: Optional[int] = None,
+                 dpi: Optional[int] = None):
+        self.name = name
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+        self.dpi = dpi
+
+    @property
+    def at_most(self) -> bool:
+        """Vrai si la résolution est un plafond (réduction au moins égale au facteur)"""
+        return self.max_pixels is not None
+
+    def factor(self, size: Tuple[int, int], source_dpi: Optional[float] = None) -> int:
+        """Facteur de réduction entier idéal depuis la pleine résolution"""
+        pixels = size[0] * size[1]
+        if self.max_pixels is not None:
+            return max(1, math.ceil(math.sqrt(pixels / self.max_pixels)))
+        min_pixels = self.min_pixels
+        if self.dpi is not None:
+            if source_dpi and source_dpi >= MIN_SCAN_DPI:
+                return max(1, int(source_dpi // self.dpi))
+            min_pixels = int(PAGE_INCHES[0] * self.dpi) * int(PAGE_INCHES[1] * self.dpi)
+        if not min_pixels:
+            return 1
+        return max(1, math.floor(math.sqrt(pixels / min_pixels)))
+
+
+# Pleine résolution (décodage sans brouillon)
+NATIVE_RESOLUTION = Resolution('native')
+
+
+def source_dpi(image: Image.Image) -> Optional[float]:
+    """Résolution déclarée par le fichier (None si absente)"""
+    dpi = image.info.get('dpi')
+    try:
+        return float(min(dpi)) if dpi else None
+    except (TypeError, ValueError):
+        return None
+
+
+def has_jpeg_history(image: Image.Image) -> bool:
+    """Pixels issus d'un décodage JPEG (JPEG, MPO, TIFF à compression JPEG) ; faux pour PNG, TIFF LZW, CCITT..."""
+    if image.format in JPEG_FORMATS:
+        return True
+    return image.format == 'TIFF' and image.info.get('compression') in JPEG_TIFF_COMPRESSIONS
+
+
+class ImagePyramid:
+    """
+    Image décodée une fois, déclinée en niveaux réduits par facteur entier
+
+    Les images rendues par level() sont partagées : à copier avant toute modification.
+
+    Usage :
+        with ImagePyramid.open(fichier, [OCR_RESOLUTION, ELA_RESOLUTION]) as pyramid:
+            ocr_image(pyramid.level(OCR_RESOLUTION))
+    """
+
+    __slots__ = ('native_size', 'source_dpi', 'format', 'mode', 'jpeg_history', 'scale', 'page', 'page_count',
+                 '_image', '_owned', '_levels')
+
+    def __init__(self, image: Image.Image, resolutions: Iterable[Resolution] = (), owned: bool = False):
+        """
+        Args:
+            image: Image ouverte ; décodée en mode brouillon si elle n'est pas encore chargée
+            resolutions: Résolutions des consommateurs (le brouillon n'est retenu que
+                s'il ne dégrade aucune d'elles)
+            owned: Fermer aussi l'image à la fermeture de la pyramide
+        """
+        self.native_size = image.size
+        self.source_dpi = source_dpi(image)
+        self.format = image.format
+        self.mode = image.mode              # Mode d'origine (avant conversion pour Image.reduce)
+        self.jpeg_history = has_jpeg_history(image)
+        self.scale = 1
+        self.page = 1                       # Page du document (iter_pages)
+        self.page_count = 1
+        self._image = image
+        self._owned = owned
+        self._levels: Dict[int, Image.Image] = {}
+
+        if image.format in JPEG_FORMATS and image.tile:
+            needs = [(r.factor(self.native_size, self.source_dpi), r.at_most) for r in resolutions]
+            for scale in DRAFT_SCALES:
+                if needs and all(k % scale == 0 if at_most else k >= scale for k, at_most in needs):
+                    width, height = self.native_size
+                    if image.draft(image.mode, (width // scale, height // scale)) is not None:
+                        self.scale = round(width / image.width)
+                    break
+
+    @classmethod
+    def open(cls, source, resolutions: Iterable[Resolution] = ()) -> 'ImagePyramid':
+        """Pyramide d'un fichier image (chemin ou fichier ouvert, relu depuis le début)"""
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return cls(Image.open(source), resolutions, owned=True)
+
+    def _base(self) -> Image.Image:
+        if 1 not in self._levels:
+            image = self._image
+            image.load()
+            if image.mode in _REDUCE_MODES:
+                image = image.convert(_REDUCE_MODES[image.mode])
+            self._levels[1] = image
+        return self._levels[1]
+
+    def level_factor(self, resolution: Resolution) -> int:
+        """Facteur de réduction effectif (depuis la pleine résolution) du niveau rendu"""
+        k = resolution.factor(self.native_size, self.source_dpi)
+        if resolution.at_most:
+            return math.ceil(k / self.scale) * self.scale
+        return max(1, k // self.scale) * self.scale
+
+    def level(self, resolution: Resolution) -> Image.Image:
+        """Niveau de la pyramide adapté à la résolution déclarée"""
+        relative = self.level_factor(resolution) // self.scale
+        self._base()
+        if relative not in self._levels:
+            # Réduction depuis le plus petit niveau déjà décodé dont le facteur divise celui demandé
+            parent = max(f for f in self._levels if relative % f == 0)
+            self._levels[relative] = self._levels[parent].reduce(relative // parent)
+        return self._levels[relative]
+
+    def effective_dpi(self, resolution: Resolution) -> Optional[float]:
+        """Résolution effective du niveau rendu (None si la résolution déclarée n'est pas fiable)"""
+        if not self.source_dpi or self.source_dpi < MIN_SCAN_DPI:
+            return None
+        return self.source_dpi / self.level_factor(resolution)
+
+    def close(self):
+        for image in self._levels.values():
+            if image is not self._image:
+                image.close()
+        self._levels.clear()
+        if self._owned:
+            self._image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_pages(source, resolutions: Iterable[Resolution] = ()) -> Iterator[Tuple[int, ImagePyramid]]:
+    """
+    Pyramide de chaque page d'une image (une seule page hors TIFF multipage)
+
+    Les pages sont décodées une à une : la pyramide rendue n'est valable que jusqu'à
+    la page suivante.
+
+    Usage :
+        for page, pyramid in iter_pages(fichier, [OCR_RESOLUTION]):
+            ocr_image(pyramid.level(OCR_RESOLUTION))
+    """
+    resolutions = list(resolutions)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    with Image.open(source) as image:
+        multipage = image.format in MULTIPAGE_FORMATS
+        page_count = getattr(image, 'n_frames', 1) if multipage else 1
+        frames = ImageSequence.Iterator(image) if multipage else [image]
+        for number, frame in enumerate(frames, 1):
+            with ImagePyramid(frame, resolutions) as pyramid:
+                pyramid.page, pyramid.page_count = number, page_count
+                yield number, pyramid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Niveaux de décodage d'une image (page par page) par consommateur")
+    parser.add_argument('image')
+    parser.add_argument('--dpi', type=int, default=300, help="Résolution effective visée pour l'OCR")
+    args = parser.parse_args()
+
+    wanted = [Resolution('ocr', dpi=args.dpi), Resolution('ela', max_pixels=12_000_000),
+              Resolution('phash', min_pixels=256 * 256), Resolution('aperçu', min_pixels=800 * 600)]
+    start = time.perf_counter()
+    for page_number, pyramid in iter_pages(args.image, wanted):
+        print(f"🖼️ {args.image} (page {page_number}) : {pyramid.native_size[0]}x{pyramid.native_size[1]}, "
+              f"{pyramid.source_dpi or '?'} dpi, décodage au 1/{pyramid.scale}")
+        for wanted_resolution in wanted:
+            level = pyramid.level(wanted_resolution)
+            dpi = pyramid.effective_dpi(wanted_resolution)
+            print(f"   {wanted_resolution.name} : {level.width}x{level.height} "
+                  f"(1/{pyramid.level_factor(wanted_resolution)}"
+                  + (f", {dpi:.0f} dpi" if dpi else "") + ")")
+    print(f"⏱️ {(time.perf_counter() - start) * 1000:.0f} ms")
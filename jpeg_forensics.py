@@ -0,0 +1,487 @@
+"""
+Analyse forensique JPEG : tables de quantification et double compression
+Les segments d'en-tête (APPn, DQT, SOF, COM) sont lus directement dans le flux
+d'octets, sans décoder les pixels : l'analyse des marqueurs coûte quelques
+microsecondes et tourne sur chaque image déposée.
+
+- Tables de quantification : comparées aux tables standard IJG (libjpeg,
+  norme JPEG annexe K) mises à l'échelle pour chaque qualité, puis au registre
+  local des empreintes relevées sur des appareils de référence (scanners de
+  l'agence, téléphones...) ; aucune table propriétaire n'est inventée.
+- Double compression : une image recompressée après un premier enregistrement
+  plus fortement compressé laisse des valeurs vides, à intervalles réguliers,
+  dans l'histogramme des coefficients DCT. Seule la luminance est décodée.
+
+Usage :
+    python jpeg_forensics.py photo.jpg
+    python jpeg_forensics.py --learn "Scanner agence Paris" reference.jpg
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import parser_sandbox
+
+
+# Tables de la norme JPEG (annexe K), ordre naturel (ligne par ligne), qualité 50 IJG
+IJG_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)
+IJG_CHROMINANCE = (
+    17, 18, 24, 47, 99, 99, 99, 99,
+    18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99,
+    47, 66, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+)
+
+# Position naturelle du k-ième coefficient dans l'ordre zigzag des segments DQT
+ZIGZAG = (
+    0, 1, 8, 16, 9, 2, 3, 10, 17, 24, 32, 25, 18, 11, 4, 5,
+    12, 19, 26, 33, 40, 48, 41, 34, 27, 20, 13, 6, 7, 14, 21, 28,
+    35, 42, 49, 56, 57, 50, 43, 36, 29, 22, 15, 23, 30, 37, 44, 51,
+    58, 59, 52, 45, 38, 31, 39, 46, 53, 60, 61, 54, 47, 55, 62, 63,
+)
+
+SOF_PROCESSES = {
+    0xC0: 'baseline', 0xC1: 'séquentiel étendu', 0xC2: 'progressif', 0xC3: 'sans perte',
+    0xC5: 'séquentiel différentiel', 0xC6: 'progressif différentiel', 0xC7: 'sans perte différentiel',
+    0xC9: 'séquentiel arithmétique', 0xCA: 'progressif arithmétique', 0xCB: 'sans perte arithmétique',
+}
+
+# Traces d'édition dans les segments APP / COM (APP13 « Photoshop 3.0 », outil XMP, commentaires)
+EDITOR_SIGNATURES = ('photoshop', 'gimp', 'lightroom', 'snapseed', 'paint.net', 'pixelmator',
+                     'affinity', 'canva', 'picsart', 'facetune')
+
+_EXIF_ASCII_TAGS = {0x010F: 'make', 0x0110: 'model', 0x0131: 'software', 0x0132: 'datetime'}
+_XMP_TOOL_RE = re.compile(rb'(?:xmp:CreatorTool|photoshop:History|stEvt:softwareAgent)\s*[=>]\s*"?([^"<]{1,120})')
+
+# Registre local des empreintes de tables (appareils de référence), alimenté par --learn
+FINGERPRINTS_PATH = os.environ.get('INLI_JPEG_FINGERPRINTS', os.path.join('data', 'jpeg_fingerprints.json'))
+
+# Double compression
+DOUBLE_COMPRESSION_COEFFS = 9       # Coefficients AC basse fréquence analysés (ordre zigzag 1..9)
+DOUBLE_COMPRESSION_MAX_BLOCKS = 60_000
+DOUBLE_COMPRESSION_MIN_VALUES = 200 # Coefficients non nuls minimaux par fréquence
+DOUBLE_COMPRESSION_GAP_RATIO = 0.3  # Masse résiduelle des valeurs inaccessibles (1 = compression simple)
+DOUBLE_COMPRESSION_MIN_GAPS = 0.1   # Part minimale de valeurs inaccessibles pour conclure
+
+
+def ijg_table(base: Tuple[int, ...], quality: int) -> Tuple[int, ...]:
+    """Table de base mise à l'échelle pour une qualité (formule libjpeg jpeg_quality_scaling, baseline)"""
+    quality = min(max(quality, 1), 100)
+    scale = 5000 // quality if quality < 50 else 200 - quality * 2
+    return tuple(min(max((value * scale + 50) // 100, 1), 255) for value in base)
+
+
+# Tables IJG des qualités 1 à 100 (ligne q - 1)
+_IJG_LUMINANCE_TABLES = np.array([ijg_table(IJG_LUMINANCE, quality) for quality in range(1, 101)])
+_IJG_CHROMINANCE_TABLES = np.array([ijg_table(IJG_CHROMINANCE, quality) for quality in range(1, 101)])
+
+
+# ======================
+# MARQUEURS
+# ======================
+
+def _read_source(source) -> bytes:
+    """Octets d'un chemin, de bytes ou d'un fichier en mémoire (position conservée)"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    position = source.tell()
+    source.seek(0)
+    try:
+        return source.read()
+    finally:
+        source.seek(position)
+
+
+def _exif_ascii_tags(payload: bytes) -> Dict[str, str]:
+    """Make / Model / Software / DateTime de l'IFD0 EXIF (payload sans l'en-tête « Exif\\0\\0 »)"""
+    tags = {}
+    if len(payload) < 8 or payload[:2] not in (b'II', b'MM'):
+        return tags
+    order = '<' if payload[:2] == b'II' else '>'
+    try:
+        (ifd_offset,) = struct.unpack_from(order + 'I', payload, 4)
+        (count,) = struct.unpack_from(order + 'H', payload, ifd_offset)
+        for i in range(min(count, 256)):
+            tag, kind, length, value = struct.unpack_from(order + 'HHI4s', payload, ifd_offset + 2 + 12 * i)
+            if tag not in _EXIF_ASCII_TAGS or kind != 2:
+                continue
+            if length > 4:
+                (offset,) = struct.unpack(order + 'I', value)
+                value = payload[offset:offset + length]
+            tags[_EXIF_ASCII_TAGS[tag]] = value[:length].split(b'\0', 1)[0].decode('latin-1').strip()
+    except struct.error:
+        pass
+    return tags
+
+
+def parse_markers(data: bytes) -> Dict:
+    """
+    Segments d'en-tête d'un JPEG jusqu'au premier SOS (sans décodage)
+
+    Returns:
+        dict: tables de quantification (ordre naturel), SOF (dimensions,
+              composantes, procédé), segments APP, EXIF, outils XMP, commentaires
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("Flux JPEG invalide (marqueur SOI absent)")
+
+    markers = {
+        'quantization_tables': {},
+        'precision_16bit': False,
+        'sof': None,
+        'app_segments': [],
+        'exif': {},
+        'xmp_tools': [],
+        'photoshop_irb': False,
+        'adobe_app14': False,
+        'comments': [],
+        'huffman_tables': 0,
+        'restart_interval': 0,
+    }
+    position = 2
+    size = len(data)
+    while position + 4 <= size:
+        if data[position] != 0xFF:
+            raise ValueError(f"Marqueur attendu à l'octet {position}")
+        marker = data[position + 1]
+        if marker == 0xFF:                          # Octets de bourrage
+            position += 1
+            continue
+        if marker == 0xD9 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            position += 2
+            continue
+        (length,) = struct.unpack_from('>H', data, position + 2)
+        segment = data[position + 4:position + 2 + length]
+        position += 2 + length
+
+        if marker == 0xDA:                          # SOS : données entropiques, fin de l'en-tête
+            break
+        if marker == 0xDB:
+            offset = 0
+            while offset < len(segment):
+                precision, table_id = segment[offset] >> 4, segment[offset] & 0x0F
+                width = 2 if precision else 1
+                raw = segment[offset + 1:offset + 1 + 64 * width]
+                values = struct.unpack('>64H', raw) if precision else tuple(raw)
+                if len(values) == 64:
+                    natural = [0] * 64
+                    for k, value in enumerate(values):
+                        natural[ZIGZAG[k]] = value
+                    markers['quantization_tables'][table_id] = tuple(natural)
+                markers['precision_16bit'] |= bool(precision)
+                offset += 1 + 64 * width
+        elif marker in SOF_PROCESSES and len(segment) >= 6:
+            precision, height, width, count = struct.unpack_from('>BHHB', segment)
+            components = []
+            for i in range(count):
+                if 6 + 3 * i + 3 > len(segment):
+                    break
+                component_id, sampling, table_id = segment[6 + 3 * i:9 + 3 * i]
+                components.append({'id': component_id, 'sampling': (sampling >> 4, sampling & 0x0F),
+                                   'quantization_table': table_id})
+            markers['sof'] = {'process': SOF_PROCESSES[marker], 'precision': precision,
+                              'width': width, 'height': height, 'components': components}
+        elif marker == 0xC4:
+            markers['huffman_tables'] += 1
+        elif marker == 0xDD and len(segment) >= 2:
+            (markers['restart_interval'],) = struct.unpack_from('>H', segment)
+        elif marker == 0xFE:
+            markers['comments'].append(segment[:200].decode('latin-1', errors='replace').strip('\0 '))
+        elif 0xE0 <= marker <= 0xEF:
+            identifier = segment[:32].split(b'\0', 1)[0].decode('latin-1', errors='replace')
+            markers['app_segments'].append(f"APP{marker - 0xE0}:{identifier}")
+            if marker == 0xE1 and segment.startswith(b'Exif\0'):
+                markers['exif'] = _exif_ascii_tags(segment[6:])
+            elif marker == 0xE1 and b'ns.adobe.com/xap' in segment[:64]:
+                markers['xmp_tools'] += [m.decode('latin-1', errors='replace').strip()
+                                         for m in _XMP_TOOL_RE.findall(segment)][:5]
+            elif marker == 0xED and segment.startswith(b'Photoshop 3.0'):
+                markers['photoshop_irb'] = True
+            elif marker == 0xEE and segment.startswith(b'Adobe'):
+                markers['adobe_app14'] = True
+    return markers
+
+
+def estimate_quality(tables: Dict[int, Tuple[int, ...]]) -> Dict:
+    """
+    Qualité IJG équivalente des tables de quantification
+
+    Returns:
+        dict: qualité estimée, tables standard IJG exactes (bool), écart moyen
+    """
+    luminance = tables.get(0)
+    if not luminance:
+        return {'quality': None, 'standard': False, 'error': None}
+    chrominance = tables.get(1)
+
+    errors = np.abs(_IJG_LUMINANCE_TABLES - np.array(luminance)).mean(axis=1)
+    if chrominance:
+        errors = (errors + np.abs(_IJG_CHROMINANCE_TABLES - np.array(chrominance)).mean(axis=1)) / 2
+    best = int(np.argmin(errors))
+    return {'quality': best + 1, 'standard': bool(errors[best] == 0), 'error': round(float(errors[best]), 2)}
+
+
+def table_fingerprint(tables: Dict[int, Tuple[int, ...]]) -> str:
+    """Empreinte des tables de quantification (indépendante de l'ordre des segments DQT)"""
+    payload = ';'.join(f"{table_id}:{','.join(map(str, values))}" for table_id, values in sorted(tables.items()))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def load_fingerprints(path: str = FINGERPRINTS_PATH) -> Dict[str, str]:
+    """Registre local {empreinte: appareil ou logiciel} ({} si absent)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def learn_fingerprint(label: str, source, path: str = FINGERPRINTS_PATH) -> str:
+    """Enregistre les tables d'une image de référence sous un libellé"""
+    fingerprint = table_fingerprint(parse_markers(_read_source(source))['quantization_tables'])
+    registry = load_fingerprints(path)
+    registry[fingerprint] = label
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return fingerprint
+
+
+def identify_encoder(markers: Dict, fingerprints: Optional[Dict[str, str]] = None) -> Dict:
+    """Encodeur probable : registre local, puis tables IJG standard, puis traces APP / COM"""
+    tables = markers['quantization_tables']
+    fingerprint = table_fingerprint(tables)
+    quality = estimate_quality(tables)
+    registry = load_fingerprints() if fingerprints is None else fingerprints
+
+    if fingerprint in registry:
+        label, source = registry[fingerprint], 'registre'
+    elif quality['standard']:
+        label, source = f"libjpeg / IJG qualité {quality['quality']} (Pillow, GIMP, ImageMagick, nombreux scanners)", 'ijg'
+    else:
+        label, source = f"tables non standard (qualité IJG équivalente ~{quality['quality']})", None
+
+    traces = [markers['exif'].get('software', '')] + markers['xmp_tools'] + markers['comments']
+    editors = sorted({name for name in EDITOR_SIGNATURES
+                      for trace in traces if trace and name in trace.lower()})
+    if markers['photoshop_irb'] and 'photoshop' not in editors:
+        editors.append('photoshop')
+
+    return {'fingerprint': fingerprint, 'label': label, 'source': source,
+            'quality': quality['quality'], 'standard_tables': quality['standard'], 'editors': editors}
+
+
+# ======================
+# DOUBLE COMPRESSION
+# ======================
+
+def _dct_matrix() -> np.ndarray:
+    i = np.arange(8)
+    return np.stack([np.cos(np.pi * (2 * i + 1) * u / 16) * np.sqrt((1 if u == 0 else 2) / 8)
+                     for u in range(8)]).astype(np.float32)
+
+
+def _primary_step(histogram: np.ndarray, step: int) -> Optional[Tuple[int, float, float]]:
+    """
+    Pas de quantification primaire le plus contraignant compatible avec l'histogramme
+
+    Une double quantification (pas q1 puis q2) n'atteint que les valeurs
+    round(m * q1 / q2) : les autres restent quasi vides. Le rapport entre leur
+    masse observée et la masse attendue d'un histogramme lisse vaut ~1 en
+    compression simple et ~0 pour le bon q1.
+
+    Returns:
+        tuple: (q1, rapport de masse, part de valeurs inaccessibles) ou None
+    """
+    limit = len(histogram)
+    smooth = np.convolve(histogram, np.ones(3) / 3, mode='same')
+    candidates = []
+    for primary in range(step + 1, 4 * step + 3):
+        reachable = np.zeros(limit + 2, dtype=bool)
+        values = np.rint(np.arange(int(limit * step / primary) + 3) * primary / step).astype(int)
+        reachable[values[values <= limit + 1]] = True
+        unreachable = ~reachable[1:limit + 1]
+        gaps = float(unreachable.mean())
+        if gaps < DOUBLE_COMPRESSION_MIN_GAPS or smooth[unreachable].sum() == 0:
+            continue
+        candidates.append((primary, float(histogram[unreachable].sum() / smooth[unreachable].sum()), gaps))
+
+    if not candidates:
+        return None
+    # Parmi les candidats compatibles, le plus contraignant (un multiple de q1 laisse un sous-ensemble)
+    compatible = [c for c in candidates if c[1] < DOUBLE_COMPRESSION_GAP_RATIO]
+    if compatible:
+        return max(compatible, key=lambda c: c[2])
+    return min(candidates, key=lambda c: c[1])
+
+
+def detect_double_compression(source, markers: Optional[Dict] = None) -> Dict:
+    """
+    Double compression JPEG (premier enregistrement plus compressé que le dernier)
+
+    Seule la luminance est décodée (mode draft 'L') ; les blocs 8x8 alignés sur
+    la grille JPEG sont retransformés en DCT et divisés par la table de
+    luminance pour retrouver les coefficients quantifiés.
+
+    Returns:
+        dict: détectée (bool), score (part des fréquences concluantes), qualité
+              primaire estimée, détail par fréquence, durée
+    """
+    start = time.perf_counter()
+    data = _read_source(source)
+    markers = markers or parse_markers(data)
+    result = {'detected': False, 'score': 0.0, 'primary_quality': None, 'frequencies': [], 'elapsed_ms': 0.0}
+
+    sof = markers['sof']
+    table_id = sof['components'][0]['quantization_table'] if sof and sof['components'] else 0
+    table = markers['quantization_tables'].get(table_id)
+    if not table or not sof or sof['precision'] != 8:
+        return result
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('L', image.size)
+        luminance = np.asarray(image.convert('L'), dtype=np.float32) - 128
+
+    height, width = (luminance.shape[0] // 8) * 8, (luminance.shape[1] // 8) * 8
+    blocks = luminance[:height, :width].reshape(height // 8, 8, width // 8, 8).transpose(0, 2, 1, 3).reshape(-1, 8, 8)
+    if len(blocks) > DOUBLE_COMPRESSION_MAX_BLOCKS:
+        blocks = blocks[np.random.default_rng(0).choice(len(blocks), DOUBLE_COMPRESSION_MAX_BLOCKS, replace=False)]
+    dct = _dct_matrix()
+    coefficients = np.einsum('ui,nij,vj->nuv', dct, blocks, dct).reshape(-1, 64)
+
+    primaries = []
+    for k in range(1, DOUBLE_COMPRESSION_COEFFS + 1):
+        position = ZIGZAG[k]
+        step = table[position]
+        if step < 2:
+            continue
+        quantized = np.rint(coefficients[:, position] / step).astype(np.int64)
+        magnitudes = np.abs(quantized[quantized != 0])
+        if len(magnitudes) < DOUBLE_COMPRESSION_MIN_VALUES:
+            continue
+        histogram = np.bincount(np.minimum(magnitudes, 60))[1:60].astype(np.float64)
+        found = _primary_step(histogram, step)
+        if found is None:
+            continue
+        primary, ratio, gaps = found
+        double = ratio < DOUBLE_COMPRESSION_GAP_RATIO
+        result['frequencies'].append({'zigzag': k, 'step': step, 'primary_step': primary if double else None,
+                                      'gap_ratio': round(ratio, 3)})
+        if double:
+            primaries.append(primary * 100 / IJG_LUMINANCE[position])
+
+    # Une image recadrée entre les deux enregistrements décale la grille primaire : non détectable ici
+    analysed = len(result['frequencies'])
+    if analysed:
+        result['score'] = round(len(primaries) / analysed, 2)
+        result['detected'] = result['score'] >= 0.5
+        if result['detected']:
+            scale = float(np.median(primaries))
+            result['primary_quality'] = int(round((200 - scale) / 2 if scale <= 100 else 5000 / scale))
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+# ======================
+# ANALYSE COMPLÈTE
+# ======================
+
+def analyze_jpeg(source, double_compression: bool = True) -> Dict:
+    """
+    Analyse JPEG d'un fichier (chemin, octets ou fichier en mémoire)
+
+    Returns:
+        dict: marqueurs, encodeur probable, double compression, signes suspects
+    """
+    start = time.perf_counter()
+    data = _read_source(source)
+    markers = parse_markers(data)
+    encoder = identify_encoder(markers)
+
+    signs = []
+    for editor in encoder['editors']:
+        signs.append(f"Image enregistrée par un logiciel d'édition ({editor.title()})")
+
+    result = {
+        'markers': {key: markers[key] for key in ('sof', 'app_segments', 'exif', 'xmp_tools', 'comments',
+                                                  'photoshop_irb', 'adobe_app14', 'restart_interval')},
+        'encoder': encoder,
+        'double_compression': None,
+        'suspicious_signs': signs,
+        'markers_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+    if double_compression:
+        try:
+            result['double_compression'] = detect_double_compression(data, markers)
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception as e:
+            result['double_compression'] = {'detected': False, 'error': str(e)}
+        double = result['double_compression']
+        if double.get('detected'):
+            signs.append(f"Double compression JPEG (qualité initiale estimée ~{double['primary_quality']}, "
+                         f"finale ~{encoder['quality']})")
+    return result
+
+
+def is_jpeg(source) -> bool:
+    """Vrai si le flux commence par le marqueur SOI JPEG"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:2]) == b'\xff\xd8'
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read(2) == b'\xff\xd8'
+    position = source.tell()
+    source.seek(0)
+    try:
+        return source.read(2) == b'\xff\xd8'
+    finally:
+        source.seek(position)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tables de quantification et double compression JPEG")
+    parser.add_argument('image')
+    parser.add_argument('--learn', metavar='LIBELLÉ', help="Enregistre les tables de l'image dans le registre local")
+    args = parser.parse_args()
+
+    if args.learn:
+        print(f"✅ {args.learn} : empreinte {learn_fingerprint(args.learn, args.image)} -> {FINGERPRINTS_PATH}")
+    else:
+        analysis = analyze_jpeg(args.image)
+        sof = analysis['markers']['sof'] or {}
+        print(f"📷 {args.image} : {sof.get('width')}x{sof.get('height')} {sof.get('process', '?')}, "
+              f"marqueurs lus en {analysis['markers_ms']} ms")
+        print(f"   Encodeur : {analysis['encoder']['label']} (empreinte {analysis['encoder']['fingerprint']})")
+        double = analysis['double_compression']
+        print(f"   Double compression : {'oui' if double.get('detected') else 'non'} "
+              f"(score {double.get('score')}, {double.get('elapsed_ms')} ms)")
+        for sign in analysis['suspicious_signs']:
+            print(f"   ⚠️ {sign}")
@@ -1,32 +1,587 @@
 """
 Module d'analyse des métadonnées de documents
 Détecte les signatures de création, modification et manipulation
+
+Chaque fichier est ouvert une seule fois : un PDF est lu par un unique PdfReader
+(dictionnaire Info, XMP, chiffrement, nombre de pages, chaîne de production) et
+ses octets bruts balayés pour les révisions incrémentales ; une image est ouverte
+une fois par Pillow (EXIF, XMP, étiquettes TIFF de chaque page sans décodage des
+pixels) et ses marqueurs JPEG lus sur les mêmes octets.
+
+Le résultat typé (DocumentMetadata) alimente les deux barèmes :
+- assess_metadata : signes et score de risque 0-100 de l'application ;
+- detect_metadata_manipulation : score de manipulation 0-1.
+
+Usage :
+    python metadata_analyzer.py document.pdf
 """
 
-from PyPDF2 import PdfReader
-from PIL import Image
-from PIL.ExifTags import TAGS
-import pikepdf
-from datetime import datetime
+import argparse
+import io
+import json
 import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PIL import Image, ImageSequence
+
+import pdf_forensics
+import font_inventory
+import jpeg_forensics
+import parser_sandbox
+
+
+# ======================
+# LOGICIELS SUSPECTS
+# ======================
+
+# Logiciels de retouche (images et PDF) : très suspects pour un justificatif
+RETOUCHING_SOFTWARE = jpeg_forensics.EDITOR_SIGNATURES + (
+    'paint', 'online', 'pixlr', 'inkscape', 'sketch'
+)
+
+# Éditeurs PDF (en ligne ou de bureau) : suspects
+PDF_EDITING_SOFTWARE = (
+    'edit', 'pdf-editor', 'smallpdf', 'ilovepdf', 'sodapdf', 'pdfforge', 'nitro',
+    'foxit-edit', 'sejda', 'pdfescape', 'pdfcandy', 'easypdf',
+    'adobe acrobat'  # Acrobat ok mais suspect si modif récente
+)
+
+# Poids de chaque constat dans le score de manipulation 0-1 (un seul par code)
+MANIPULATION_WEIGHTS = {
+    'editor': 0.3,
+    'modified_after_creation': 0.2,
+    'incremental_overwrite': 0.3,
+    'double_compression': 0.2,
+    'font_outlier': 0.3,
+    'future_date': 0.4,
+    'no_metadata': 0.3,
+    'encrypted': 0.2,
+    'producer_mismatch': 0.1,
+    'tiff_page_mismatch': 0.2
+}
+
+# Document créé il y a moins de RECENT_CREATION_DAYS jours
+RECENT_CREATION_DAYS = 92
+
+# Longueur maximale conservée par valeur de métadonnée
+MAX_VALUE_LENGTH = 200
+
+_EXIF_TAGS = {0x010F: 'make', 0x0110: 'model', 0x0131: 'software', 0x0132: 'datetime', 0x013B: 'artist'}
+_EXIF_IFD = 0x8769
+_EXIF_SUB_TAGS = {0x9003: 'datetime_original', 0x9004: 'datetime_digitized'}
+_GPS_IFD = 0x8825
+
+# Étiquettes TIFF relevées page par page
+_TIFF_TAGS = {0x010D: 'document_name', 0x010F: 'make', 0x0110: 'model', 0x011D: 'page_name',
+              0x0131: 'software', 0x0132: 'datetime', 0x013C: 'host_computer'}
+# Étiquettes qui, d'une page à l'autre d'un même scan, devraient rester identiques
+_TIFF_SCAN_TAGS = ('software', 'make', 'model', 'dpi')
+
+_XMP_FIELDS = {
+    'creator_tool': 'xmp:CreatorTool',
+    'producer': 'pdf:Producer',
+    'create_date': 'xmp:CreateDate',
+    'modify_date': 'xmp:ModifyDate',
+    'metadata_date': 'xmp:MetadataDate',
+    'document_id': 'xmpMM:DocumentID',
+    'instance_id': 'xmpMM:InstanceID'
+}
+_XMP_HISTORY_RE = re.compile(r'stEvt:softwareAgent\s*(?:=\s*"([^"]{1,200})"|>([^<]{1,200})<)')
+
+
+# ======================
+# RÉSULTAT TYPÉ
+# ======================
+
+class DocumentMetadata:
+    """Métadonnées brutes d'un document (PDF ou image), extraites en une passe"""
+
+    __slots__ = ('kind', 'format', 'file_size', 'creator', 'producer', 'creation_date',
+                 'modification_date', 'num_pages', 'is_encrypted', 'info', 'xmp',
+                 'producer_chain', 'revisions', 'exif', 'tiff', 'jpeg', 'errors')
+
+    def __init__(self, kind: str, file_size: int = 0):
+        self.kind = kind                    # 'pdf' ou 'image'
+        self.format = None
+        self.file_size = file_size
+        self.creator = ''
+        self.producer = ''
+        self.creation_date = ''             # Valeurs brutes (D:..., EXIF ou ISO 8601)
+        self.modification_date = ''
+        self.num_pages = 0
+        self.is_encrypted = False
+        self.info = {}                      # Dictionnaire Info du PDF
+        self.xmp = {}
+        self.producer_chain = []            # Outils successifs (historique XMP, créateur, producteur)
+        self.revisions = None               # Révisions incrémentales (PDF)
+        self.exif = {}
+        self.tiff = None                    # Étiquettes de chaque page (TIFF)
+        self.jpeg = None                    # Encodeur et double compression (JPEG)
+        self.errors = []
+
+    def to_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def _text(value) -> str:
+    """Valeur de métadonnée en texte (objets indirects résolus, longueur bornée)"""
+    if value is None:
+        return ''
+    if hasattr(value, 'get_object'):
+        value = value.get_object()
+    if isinstance(value, bytes):
+        value = value.decode('latin-1', errors='replace')
+    return str(value).strip()[:MAX_VALUE_LENGTH]
+
+
+def _add_tool(chain: List[str], tool: str):
+    if tool and tool.lower() not in (t.lower() for t in chain):
+        chain.append(tool)
+
+
+def parse_xmp(packet) -> Dict:
+    """Champs XMP usuels et agents de l'historique (xmpMM:History) d'un paquet XMP"""
+    if isinstance(packet, bytes):
+        packet = packet.decode('utf-8', errors='replace')
+    xmp = {}
+    for key, name in _XMP_FIELDS.items():
+        match = re.search(re.escape(name) + r'\s*(?:=\s*"([^"]{0,200})"|>([^<]{0,200})<)', packet)
+        if match and (match.group(1) or match.group(2) or '').strip():
+            xmp[key] = (match.group(1) or match.group(2)).strip()
+    history = []
+    for match in _XMP_HISTORY_RE.finditer(packet):
+        _add_tool(history, (match.group(1) or match.group(2)).strip())
+    if history:
+        xmp['history'] = history
+    return xmp
+
+
+def parse_date(value: str) -> Optional[datetime]:
+    """Date PDF (D:AAAAMMJJHHmmSS), EXIF (AAAA:MM:JJ HH:MM:SS) ou ISO 8601, sans fuseau"""
+    digits = re.sub(r'\D', '', (value or '').replace('D:', '', 1))[:14]
+    if len(digits) < 8:
+        return None
+    digits = digits.ljust(14, '0')
+    try:
+        return datetime(int(digits[:4]), int(digits[4:6]), int(digits[6:8]),
+                        int(digits[8:10]), int(digits[10:12]), int(digits[12:14]))
+    except ValueError:
+        return None
+
+
+def format_date(value: str) -> str:
+    """Date lisible (JJ/MM/AAAA à HHhMM), valeur brute si le format est inconnu"""
+    date = parse_date(value)
+    return date.strftime('%d/%m/%Y à %Hh%M') if date else value
+
+
+# ======================
+# EXTRACTION
+# ======================
+
+def _open_source(source) -> Tuple[object, bool]:
+    """Fichier binaire positionné au début (chemin ouvert une fois, fichier en mémoire réutilisé)"""
+    if isinstance(source, str):
+        return open(source, 'rb'), True
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), True
+    source.seek(0)
+    return source, False
+
+
+def _file_size(handle) -> int:
+    position = handle.tell()
+    size = handle.seek(0, 2)
+    handle.seek(position)
+    return size
+
+
+def extract_pdf_metadata(source, reader: Optional[PdfReader] = None) -> DocumentMetadata:
+    """
+    Métadonnées d'un PDF en une passe : Info, XMP, chiffrement, pages, chaîne de production,
+    révisions incrémentales
+
+    Args:
+        source: Chemin, octets ou fichier en mémoire
+        reader: PdfReader déjà ouvert sur source (partagé avec l'extraction de texte)
+    """
+    handle, owned = _open_source(source)
+    try:
+        meta = DocumentMetadata('pdf', _file_size(handle))
+        meta.format = 'PDF'
+        if reader is None:
+            reader = PdfReader(handle)
+
+        meta.is_encrypted = reader.is_encrypted
+        if meta.is_encrypted:
+            # Chiffrement sans mot de passe d'ouverture (restrictions d'usage seulement)
+            try:
+                reader.decrypt('')
+            except parser_sandbox.RESOURCE_ERRORS:
+                raise
+            except Exception as e:
+                meta.errors.append(f"Déchiffrement : {e}")
+
+        try:
+            info = reader.metadata or {}
+            meta.info = {str(key).lstrip('/'): _text(value) for key, value in info.items()}
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception as e:
+            meta.errors.append(f"Dictionnaire Info : {e}")
+
+        try:
+            root = reader.trailer['/Root'].get_object()
+            if '/Metadata' in root:
+                meta.xmp = parse_xmp(root['/Metadata'].get_object().get_data())
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception as e:
+            meta.errors.append(f"XMP : {e}")
+
+        try:
+            meta.num_pages = len(reader.pages)
+        except parser_sandbox.RESOURCE_ERRORS:
+            raise
+        except Exception as e:
+            meta.errors.append(f"Arbre des pages : {e}")
+
+        meta.creator = meta.info.get('Creator') or meta.xmp.get('creator_tool', '')
+        meta.producer = meta.info.get('Producer') or meta.xmp.get('producer', '')
+        meta.creation_date = meta.info.get('CreationDate') or meta.xmp.get('create_date', '')
+        meta.modification_date = meta.info.get('ModDate') or meta.xmp.get('modify_date', '')
+        for tool in meta.xmp.get('history', []) + [meta.xmp.get('creator_tool'), meta.info.get('Creator'),
+                                                    meta.info.get('Producer'), meta.xmp.get('producer')]:
+            _add_tool(meta.producer_chain, tool)
+
+        # Révisions incrémentales (octets bruts : indépendant des dates déclarées)
+        scan = pdf_forensics.scan_revisions(handle)
+        updates = scan['incremental_updates']
+        update_revisions = scan['revisions'][scan['revision_count'] - updates:]
+        meta.revisions = {
+            'count': scan['revision_count'],
+            'incremental_updates': updates,
+            'overwritten_objects': scan['overwritten_objects'],
+            'updates_overwrite': scan['updates_overwrite'],
+            'signature_only': bool(updates) and all(rev['signature'] for rev in update_revisions),
+            'original_revision': scan['original_revision'],
+            'signed': scan['signed']
+        }
+        return meta
+    finally:
+        if owned:
+            handle.close()
+        else:
+            handle.seek(0)
+
+
+def _summarize_jpeg(jpeg: Dict) -> Dict:
+    encoder = jpeg['encoder']
+    double = jpeg['double_compression'] or {}
+    return {
+        'encoder': encoder['label'],
+        'fingerprint': encoder['fingerprint'],
+        'quality': encoder['quality'],
+        'editors': encoder['editors'],
+        'double_compression': double.get('detected', False),
+        'primary_quality': double.get('primary_quality'),
+        'app_segments': jpeg['markers']['app_segments']
+    }
+
+
+def tiff_page_tags(image: Image.Image) -> List[Dict]:
+    """
+    Étiquettes de chaque page d'un TIFF (dimensions, compression, résolution, logiciel,
+    appareil, nom de page) lues répertoire par répertoire, sans décoder les pixels
+    """
+    pages = []
+    for number, frame in enumerate(ImageSequence.Iterator(image), 1):
+        tags = {'page': number, 'size': frame.size, 'mode': frame.mode,
+                'compression': frame.info.get('compression')}
+        dpi = frame.info.get('dpi')
+        if dpi:
+            tags['dpi'] = round(float(dpi[0]))
+        for tag, key in _TIFF_TAGS.items():
+            if frame.tag_v2.get(tag):
+                tags[key] = _text(frame.tag_v2[tag])
+        pages.append(tags)
+    image.seek(0)
+    return pages
+
+
+def extract_image_metadata(source, double_compression: bool = True) -> DocumentMetadata:
+    """
+    Métadonnées d'une image : EXIF (IFD0, sous-IFD Exif, présence GPS), XMP,
+    étiquettes TIFF de chaque page et, pour un JPEG, encodeur, traces d'édition
+    et double compression
+    """
+    handle, owned = _open_source(source)
+    try:
+        meta = DocumentMetadata('image', _file_size(handle))
+        with Image.open(handle) as image:
+            meta.format = image.format
+            meta.num_pages = getattr(image, 'n_frames', 1)
+            exif = image.getexif()
+            for tag, key in _EXIF_TAGS.items():
+                if exif.get(tag):
+                    meta.exif[key] = _text(exif[tag])
+            for tag, key in _EXIF_SUB_TAGS.items():
+                value = exif.get_ifd(_EXIF_IFD).get(tag)
+                if value:
+                    meta.exif[key] = _text(value)
+            if exif.get_ifd(_GPS_IFD):
+                meta.exif['gps'] = True
+            packet = image.info.get('xmp') or image.info.get('XML:com.adobe.xmp')
+            if packet:
+                meta.xmp = parse_xmp(packet)
+            if image.format == 'TIFF':
+                try:
+                    meta.tiff = tiff_page_tags(image)
+                except parser_sandbox.RESOURCE_ERRORS:
+                    raise
+                except Exception as e:
+                    meta.errors.append(f"TIFF : {e}")
 
+        handle.seek(0)
+        if jpeg_forensics.is_jpeg(handle):
+            try:
+                meta.jpeg = _summarize_jpeg(jpeg_forensics.analyze_jpeg(handle, double_compression))
+            except parser_sandbox.RESOURCE_ERRORS:
+                raise
+            except Exception as e:
+                meta.errors.append(f"JPEG : {e}")
+
+        device = ' '.join(v for v in (meta.exif.get('make'), meta.exif.get('model')) if v)
+        meta.creator = device or meta.xmp.get('creator_tool', '')
+        meta.producer = meta.exif.get('software') or (meta.jpeg['encoder'] if meta.jpeg else '')
+        meta.creation_date = meta.exif.get('datetime_original') or meta.xmp.get('create_date', '')
+        meta.modification_date = meta.exif.get('datetime') or meta.xmp.get('modify_date', '')
+        page_tools = [page.get('software') for page in meta.tiff or []]
+        for tool in meta.xmp.get('history', []) + [meta.xmp.get('creator_tool'), meta.exif.get('software')] + page_tools:
+            _add_tool(meta.producer_chain, tool)
+        return meta
+    finally:
+        if owned:
+            handle.close()
+        else:
+            handle.seek(0)
+
+
+def extract_metadata(source, reader: Optional[PdfReader] = None) -> DocumentMetadata:
+    """Métadonnées d'un PDF ou d'une image (type reconnu aux premiers octets)"""
+    handle, owned = _open_source(source)
+    try:
+        is_pdf = handle.read(5) == b'%PDF-'
+        handle.seek(0)
+        return extract_pdf_metadata(handle, reader) if is_pdf else extract_image_metadata(handle)
+    finally:
+        if owned:
+            handle.close()
+
+
+# ======================
+# BARÈMES
+# ======================
+
+def _finding(code: str, sign: str, risk: int) -> Dict:
+    return {'code': code, 'sign': sign, 'risk': risk}
+
+
+def _software_level(tool: str) -> Optional[str]:
+    tool = (tool or '').lower()
+    if any(name in tool for name in RETOUCHING_SOFTWARE):
+        return 'retouche'
+    if any(name in tool for name in PDF_EDITING_SOFTWARE):
+        return 'édition'
+    return None
+
+
+def _normalized(tool: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', tool.lower())
+
+
+def metadata_findings(meta: DocumentMetadata) -> List[Dict]:
+    """
+    Constats sur les métadonnées : code, signe affiché, points de risque (barème 0-100)
+    """
+    findings = []
+
+    if meta.kind == 'pdf':
+        # Logiciel de création / de dernier enregistrement
+        for role, tool, points in (('CRÉATEUR', meta.creator, (40, 25)), ('PRODUCTEUR', meta.producer, (35, 20))):
+            level = _software_level(tool)
+            if level == 'retouche':
+                findings.append(_finding('editor', f"🚨 {role} TRÈS SUSPECT : {tool}", points[0]))
+            elif level == 'édition':
+                findings.append(_finding('editor', f"⚠️ {role.capitalize()} suspect : {tool}", points[1]))
+
+        # Outils intermédiaires de l'historique XMP
+        known = {_normalized(meta.creator), _normalized(meta.producer)}
+        for tool in meta.producer_chain:
+            if _normalized(tool) in known:
+                continue
+            level = _software_level(tool)
+            if level == 'retouche':
+                findings.append(_finding('editor', f"🚨 Historique XMP : document passé par {tool}", 30))
+                break
+            if level == 'édition':
+                findings.append(_finding('editor', f"⚠️ Historique XMP : document passé par {tool}", 15))
+                break
+
+        # Producteur Info différent du producteur XMP : métadonnées réécrites par un second outil
+        info_producer, xmp_producer = meta.info.get('Producer', ''), meta.xmp.get('producer', '')
+        if info_producer and xmp_producer:
+            a, b = _normalized(info_producer), _normalized(xmp_producer)
+            if a and b and a not in b and b not in a:
+                findings.append(_finding(
+                    'producer_mismatch', f"⚠️ Producteur Info ({info_producer}) différent du producteur XMP ({xmp_producer})", 10))
+    else:
+        # Logiciel d'édition : EXIF Software, outil XMP ou segments APP / COM du JPEG
+        editors = list(meta.jpeg['editors']) if meta.jpeg else []
+        for tool in meta.producer_chain:
+            if _software_level(tool) == 'retouche' and not any(e in tool.lower() for e in editors):
+                editors.append(tool)
+        if editors:
+            findings.append(_finding(
+                'editor', f"🚨 Image enregistrée par un logiciel d'édition ({', '.join(e.title() for e in editors)})", 40))
+        if not meta.exif and not meta.xmp:
+            findings.append(_finding('no_metadata', "ℹ️ Aucune métadonnée EXIF (potentiellement supprimée)", 0))
+
+        # TIFF multipage : page produite par un autre logiciel, appareil ou réglage que la première
+        pages = meta.tiff or []
+        odd = [page for page in pages[1:]
+               if any(page.get(tag) != pages[0].get(tag) for tag in _TIFF_SCAN_TAGS)]
+        if odd:
+            differences = sorted({f"{tag} {page.get(tag) or 'absent'}" for page in odd for tag in _TIFF_SCAN_TAGS
+                                  if page.get(tag) != pages[0].get(tag)})
+            findings.append(_finding(
+                'tiff_page_mismatch',
+                f"⚠️ TIFF : page(s) {', '.join(str(page['page']) for page in odd[:10])} différente(s) "
+                f"de la première ({', '.join(differences[:4])})", 20))
+
+    # Dates
+    created = parse_date(meta.creation_date)
+    if created:
+        age = datetime.now() - created
+        if age < -timedelta(days=1):
+            findings.append(_finding('future_date', f"🚨 Date de création dans le futur ({format_date(meta.creation_date)})", 40))
+        elif meta.kind == 'pdf' and age < timedelta(days=RECENT_CREATION_DAYS):
+            findings.append(_finding('recent_creation', f"📅 Document créé récemment ({created.month}/{created.year})", 20))
+
+    modified = parse_date(meta.modification_date)
+    if created and modified:
+        changed = modified != created
+    else:
+        changed = bool(meta.creation_date and meta.modification_date and meta.creation_date != meta.modification_date)
+    if changed:
+        if meta.kind == 'pdf':
+            findings.append(_finding('modified_after_creation', "✏️ Document modifié après création", 15))
+        else:
+            findings.append(_finding('modified_after_creation', "✏️ Image modifiée après la prise de vue", 15))
+
+    # Révisions incrémentales
+    revisions = meta.revisions
+    if revisions and revisions['incremental_updates']:
+        updates = revisions['incremental_updates']
+        if revisions['signature_only']:
+            findings.append(_finding('signed', f"🔏 Document signé électroniquement ({updates} révision(s) de signature)", 0))
+        elif revisions['updates_overwrite']:
+            findings.append(_finding(
+                'incremental_overwrite',
+                f"🚨 {updates} mise(s) à jour incrémentale(s) réécrivant "
+                f"{revisions['overwritten_objects']} objet(s) de la version d'origine", 30))
+        else:
+            findings.append(_finding('incremental_append', f"⚠️ {updates} mise(s) à jour incrémentale(s) (ajout d'objets)", 10))
+
+    # Double compression JPEG
+    if meta.jpeg and meta.jpeg['double_compression']:
+        findings.append(_finding(
+            'double_compression',
+            f"⚠️ Double compression JPEG : image réenregistrée (qualité initiale ~{meta.jpeg['primary_quality']}, "
+            f"finale ~{meta.jpeg['quality']})", 20))
+
+    # Nombre de pages anormal
+    if meta.kind == 'pdf' and meta.num_pages > 15:
+        findings.append(_finding('many_pages', f"📄 Nombre de pages inhabituel pour ce type de document : {meta.num_pages}", 8))
+
+    # PDF chiffré (suspect pour une fiche de paie)
+    if meta.is_encrypted:
+        findings.append(_finding('encrypted', "🔒 Document chiffré - Inhabituel pour une fiche de paie", 10))
+
+    return findings
+
+
+def assess_metadata(meta: DocumentMetadata) -> Dict:
+    """
+    Métadonnées présentées et score de risque 0-100 (barème de l'application)
+
+    Returns:
+        dict: créateur, producteur, dates lisibles, pages, chaîne de production,
+              révisions, EXIF, étiquettes TIFF, JPEG, constats, signes suspects et risk_score
+    """
+    findings = metadata_findings(meta)
+    return {
+        'type': meta.kind,
+        'format': meta.format,
+        'creator': meta.creator or 'Non spécifié',
+        'producer': meta.producer or 'Non spécifié',
+        'creation_date': format_date(meta.creation_date) if meta.creation_date else 'Non spécifiée',
+        'modification_date': format_date(meta.modification_date) if meta.modification_date else 'Non spécifiée',
+        'num_pages': meta.num_pages,
+        'is_encrypted': meta.is_encrypted,
+        'file_size': meta.file_size,
+        'producer_chain': meta.producer_chain,
+        'xmp': meta.xmp,
+        'revisions': meta.revisions,
+        'exif': meta.exif,
+        'tiff': meta.tiff,
+        'jpeg': meta.jpeg,
+        'errors': meta.errors,
+        'findings': findings,
+        'suspicious_signs': [finding['sign'] for finding in findings],
+        'risk_score': min(sum(finding['risk'] for finding in findings), 100)
+    }
+
+
+def detect_metadata_manipulation(metadata):
+    """
+    Score de manipulation basé sur les métadonnées
+
+    Args:
+        metadata: DocumentMetadata ou résultat d'assess_metadata / analyze_document_metadata
+
+    Returns:
+        float: Score 0-1 (1 = très suspect)
+    """
+    if isinstance(metadata, DocumentMetadata):
+        metadata = assess_metadata(metadata)
+    codes = {finding['code'] for finding in metadata.get('findings', [])}
+    return round(min(sum(MANIPULATION_WEIGHTS.get(code, 0.0) for code in codes), 1.0), 2)
+
+
+# ======================
+# ANALYSE D'UN FICHIER
+# ======================
 
 def analyze_document_metadata(file_path):
     """
     Analyse les métadonnées d'un document (PDF ou image)
-    
+
     Args:
         file_path: Chemin vers le fichier
-        
+
     Returns:
         dict: Métadonnées et signes suspects
     """
-    
+
     file_ext = os.path.splitext(file_path)[1].lower()
-    
+
     if file_ext == '.pdf':
         return analyze_pdf_metadata(file_path)
-    elif file_ext in ['.jpg', '.jpeg', '.png']:
+    elif file_ext in ['.jpg', '.jpeg', '.png', '.tif', '.tiff']:
         return analyze_image_metadata(file_path)
     else:
         return {'error': 'Format non supporté'}
@@ -35,198 +590,57 @@ def analyze_document_metadata(file_path):
 def analyze_pdf_metadata(file_path):
     """
     Extrait et analyse les métadonnées d'un PDF
-    
+
     Détecte:
-    - Logiciel de création
+    - Logiciel de création et chaîne de production (Info, XMP)
     - Dates de création/modification
     - Chiffrement
-    - Signatures de manipulation
-    """
-    
-    metadata = {
-        'creator': None,
-        'producer': None,
-        'creation_date': None,
-        'modification_date': None,
-        'is_encrypted': False,
-        'suspicious_signs': [],
-        'file_size': os.path.getsize(file_path),
-        'pages_count': 0
-    }
-    
+    - Révisions incrémentales
+    - Montants en police atypique
+    """
     try:
-        # Méthode 1 : PyPDF2 pour métadonnées basiques
         with open(file_path, 'rb') as f:
             reader = PdfReader(f)
-            
-            if reader.metadata:
-                metadata['creator'] = reader.metadata.get('/Creator', 'Unknown')
-                metadata['producer'] = reader.metadata.get('/Producer', 'Unknown')
-                metadata['creation_date'] = reader.metadata.get('/CreationDate', '')
-                metadata['modification_date'] = reader.metadata.get('/ModDate', '')
-            
-            metadata['pages_count'] = len(reader.pages)
-        
-        # Méthode 2 : pikepdf pour analyse avancée
-        try:
-            with pikepdf.open(file_path, allow_overwriting_input=True) as pdf:
-                metadata['is_encrypted'] = pdf.is_encrypted
-                
-                # Détection de logiciels de retouche
-                creator_str = str(metadata.get('creator', '')).lower()
-                producer_str = str(metadata.get('producer', '')).lower()
-                
-                suspicious_softwares = [
-                    'photoshop', 'gimp', 'paint.net', 'inkscape',
-                    'affinity', 'pixelmator', 'sketch'
-                ]
-                
-                for soft in suspicious_softwares:
-                    if soft in creator_str or soft in producer_str:
-                        metadata['suspicious_signs'].append(
-                            f'Document créé avec un logiciel de retouche : {soft.title()}'
-                        )
-                
-                # Vérifier si modifié après création
-                if metadata['modification_date'] and metadata['creation_date']:
-                    if metadata['modification_date'] != metadata['creation_date']:
-                        metadata['suspicious_signs'].append(
-                            'Document modifié après sa création initiale'
-                        )
-                
-                # Vérifier dates dans le futur
-                try:
-                    if metadata['creation_date']:
-                        # Format PDF date: D:YYYYMMDDHHmmSS
-                        date_str = metadata['creation_date'].replace('D:', '').replace("'", '')[:14]
-                        if len(date_str) >= 8:
-                            year = int(date_str[:4])
-                            month = int(date_str[4:6])
-                            day = int(date_str[6:8])
-                            
-                            doc_date = datetime(year, month, day)
-                            
-                            if doc_date > datetime.now():
-                                metadata['suspicious_signs'].append(
-                                    'Date de création dans le futur !'
-                                )
-                except:
-                    pass
-        
-        except Exception as e:
-            metadata['suspicious_signs'].append(f'Erreur analyse avancée: {str(e)}')
-    
+            metadata = assess_metadata(extract_pdf_metadata(f, reader))
+
+            # Montants rendus dans une police différente de leurs voisins (même PdfReader)
+            text_runs = font_inventory.inventory_text_runs(reader)
+            metadata['font_findings'] = text_runs.findings
+            for finding in text_runs.findings:
+                sign = f"🔤 Police atypique : {font_inventory.describe_finding(finding)}"
+                metadata['findings'].append(_finding('font_outlier', sign, 25))
+                metadata['suspicious_signs'].append(sign)
+            if text_runs.findings:
+                metadata['risk_score'] = min(metadata['risk_score'] + 25, 100)
+        return metadata
     except Exception as e:
-        metadata['error'] = f'Erreur lecture PDF: {str(e)}'
-    
-    return metadata
+        return {'error': f'Erreur lecture PDF: {str(e)}', 'findings': [], 'suspicious_signs': []}
 
 
 def analyze_image_metadata(file_path):
     """
     Extrait les métadonnées EXIF d'une image
-    
+
     Détecte:
     - Appareil photo / scanner
-    - Logiciel de traitement
+    - Logiciel de traitement (EXIF, XMP, segments JPEG, étiquettes TIFF)
+    - Page d'un TIFF multipage produite autrement que les autres
     - GPS (si présent)
     - Dates
+    - Double compression JPEG
     """
-    
-    metadata = {
-        'camera_model': None,
-        'software': None,
-        'datetime_original': None,
-        'datetime_modified': None,
-        'gps_info': None,
-        'suspicious_signs': [],
-        'file_size': os.path.getsize(file_path)
-    }
-    
     try:
-        image = Image.open(file_path)
-        exif_data = image.getexif()
-        
-        if exif_data:
-            for tag_id, value in exif_data.items():
-                tag = TAGS.get(tag_id, tag_id)
-                
-                if tag == 'Make':
-                    metadata['camera_model'] = value
-                elif tag == 'Software':
-                    metadata['software'] = value
-                elif tag == 'DateTimeOriginal':
-                    metadata['datetime_original'] = value
-                elif tag == 'DateTime':
-                    metadata['datetime_modified'] = value
-                elif tag == 'GPSInfo':
-                    metadata['gps_info'] = value
-            
-            # Détection logiciels de retouche
-            if metadata['software']:
-                suspicious_softwares = ['photoshop', 'gimp', 'lightroom', 'snapseed']
-                
-                for soft in suspicious_softwares:
-                    if soft in metadata['software'].lower():
-                        metadata['suspicious_signs'].append(
-                            f'Image traitée avec {soft.title()}'
-                        )
-            
-            # Vérifier dates
-            if metadata['datetime_original'] and metadata['datetime_modified']:
-                if metadata['datetime_original'] != metadata['datetime_modified']:
-                    metadata['suspicious_signs'].append(
-                        'Image modifiée après la prise de vue'
-                    )
-        
-        else:
-            metadata['suspicious_signs'].append(
-                'Aucune métadonnée EXIF (potentiellement supprimée)'
-            )
-    
+        return assess_metadata(extract_image_metadata(file_path))
     except Exception as e:
-        metadata['error'] = f'Erreur lecture image: {str(e)}'
-    
-    return metadata
+        return {'error': f'Erreur lecture image: {str(e)}', 'findings': [], 'suspicious_signs': []}
 
 
-def detect_metadata_manipulation(metadata):
-    """
-    Score de manipulation basé sur les métadonnées
-    
-    Returns:
-        float: Score 0-1 (1 = très suspect)
-    """
-    
-    score = 0.0
-    
-    # +0.3 si logiciel de retouche
-    suspicious_signs = metadata.get('suspicious_signs', [])
-    for sign in suspicious_signs:
-        if 'retouche' in sign.lower() or 'photoshop' in sign.lower():
-            score += 0.3
-            break
-    
-    # +0.2 si modification après création
-    for sign in suspicious_signs:
-        if 'modifié après' in sign.lower():
-            score += 0.2
-            break
-    
-    # +0.4 si date dans le futur
-    for sign in suspicious_signs:
-        if 'futur' in sign.lower():
-            score += 0.4
-            break
-    
-    # +0.3 si métadonnées manquantes
-    for sign in suspicious_signs:
-        if 'aucune métadonnée' in sign.lower():
-            score += 0.3
-            break
-    
-    # +0.2 si document chiffré
-    if metadata.get('is_encrypted'):
-        score += 0.2
-    
-    return min(score, 1.0)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métadonnées d'un document (PDF ou image)")
+    parser.add_argument('document')
+    args = parser.parse_args()
+
+    result = analyze_document_metadata(args.document)
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    if 'findings' in result:
+        print(f"🎯 Score de manipulation : {detect_metadata_manipulation(result):.2f}")
@@ -0,0 +1,336 @@
+"""
+Détection de documents quasi identiques entre dossiers (MinHash + LSH)
+Un faussaire réutilise le même modèle de fiche de paie en ne changeant que
+le nom et quelques montants : la signature MinHash du texte reste proche.
+
+Signature : MinHash de 3-grammes de mots (128 permutations, NumPy)
+Index : LSH par bandes (16 bandes x 8 lignes) persistant en SQLite, interrogé
+en temps sous-linéaire ; la similarité de Jaccard est ensuite estimée sur
+les seules signatures candidates.
+
+Images (scans et photos intégrés aux PDF, images déposées) : empreinte
+perceptuelle 64 bits découpée en 8 bandes de 8 bits ; deux empreintes à au
+plus 7 bits d'écart partagent au moins une bande (rappel garanti jusqu'au seuil
+IMAGE_MAX_DISTANCE), la distance de Hamming est ensuite calculée sur les seuls
+candidats.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+DEFAULT_DB_PATH = os.path.join('data', 'history', 'minhash.sqlite')
+
+IMAGE_HASH_BITS = 64
+IMAGE_BANDS = 8                     # IMAGE_BANDS - 1 bits d'écart au plus : une bande commune garantie
+IMAGE_BAND_BITS = IMAGE_HASH_BITS // IMAGE_BANDS
+IMAGE_MAX_DISTANCE = 6              # Bits différents au plus entre deux images « identiques »
+IMAGE_INDEX_VERSION = 1             # Découpage des bandes (PRAGMA user_version) : index reconstruit s'il change
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Permutations fixes (graine constante : signatures comparables entre versions)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    doc_id TEXT PRIMARY KEY,
+    dossier_id TEXT NOT NULL,
+    doc_type TEXT,
+    signature BLOB NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_signatures_dossier ON signatures (dossier_id);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bands_doc ON bands (doc_id);
+CREATE TABLE IF NOT EXISTS image_hashes (
+    image_id TEXT PRIMARY KEY,
+    dossier_id TEXT NOT NULL,
+    doc_type TEXT,
+    name TEXT,
+    phash INTEGER NOT NULL,
+    sha256 TEXT,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_hashes_dossier ON image_hashes (dossier_id);
+CREATE TABLE IF NOT EXISTS image_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    image_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, image_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_bands_image ON image_bands (image_id);
+"""
+
+
+# ======================
+# SIGNATURE MINHASH
+# ======================
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """n-grammes de mots d'un texte normalisé (minuscules, sans accents)"""
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text or '')
+        if unicodedata.category(c) != 'Mn'
+    ).lower()
+    words = re.findall(r'[a-z0-9]+(?:[.,][0-9]+)?', text)
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """
+    Signature MinHash (NUM_PERM entiers uint32) d'un texte
+
+    Returns:
+        np.ndarray, ou None si le texte est vide
+    """
+    items = shingles(text)
+    if not items:
+        return None
+
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in items), dtype=np.uint64, count=len(items))
+    # (a*x + b) mod p : x et a < 2^32, donc pas de dépassement en uint64
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted.min(axis=1) & _MAX_HASH).astype(np.uint32)
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Similarité de Jaccard estimée (part des composantes égales)"""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+def _band_buckets(signature: np.ndarray) -> List[int]:
+    """Clé de hachage (entier signé 64 bits) de chaque bande"""
+    buckets = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        buckets.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'little', signed=True))
+    return buckets
+
+
+def _image_buckets(phash: int) -> List[int]:
+    """Valeur de chaque bande de IMAGE_BAND_BITS bits d'une empreinte perceptuelle"""
+    mask = (1 << IMAGE_BAND_BITS) - 1
+    return [(phash >> (band * IMAGE_BAND_BITS)) & mask for band in range(IMAGE_BANDS)]
+
+
+def _signed64(value: int) -> int:
+    """Entier non signé 64 bits stockable par SQLite"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# ======================
+# INDEX LSH PERSISTANT
+# ======================
+
+class LSHIndex:
+    """Index LSH des signatures de tous les documents analysés"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._migrate_image_bands(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate_image_bands(conn: sqlite3.Connection):
+        """Reconstruit les bandes des images indexées avec un autre découpage"""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= IMAGE_INDEX_VERSION:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM image_bands")
+            for image_id, phash in conn.execute("SELECT image_id, phash FROM image_hashes").fetchall():
+                conn.executemany("INSERT OR IGNORE INTO image_bands VALUES (?, ?, ?)",
+                                 [(band, bucket, image_id)
+                                  for band, bucket in enumerate(_image_buckets(phash & ((1 << 64) - 1)))])
+            conn.execute(f"PRAGMA user_version = {IMAGE_INDEX_VERSION}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def add_dossier(self, dossier_id: str, signatures: Dict[str, np.ndarray]):
+        """
+        Enregistre (ou remplace) les signatures des documents d'un dossier
+
+        Args:
+            signatures: {type de document: signature}
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old_ids = [row[0] for row in conn.execute(
+                "SELECT doc_id FROM signatures WHERE dossier_id = ?", (dossier_id,))]
+            conn.executemany("DELETE FROM bands WHERE doc_id = ?", [(d,) for d in old_ids])
+            conn.execute("DELETE FROM signatures WHERE dossier_id = ?", (dossier_id,))
+
+            now = time.time()
+            for doc_type, signature in signatures.items():
+                if signature is None:
+                    continue
+                doc_id = f"{dossier_id}/{doc_type}"
+                conn.execute("INSERT INTO signatures VALUES (?, ?, ?, ?, ?)",
+                             (doc_id, dossier_id, doc_type, signature.astype(np.uint32).tobytes(), now))
+                conn.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                                 [(band, bucket, doc_id) for band, bucket in enumerate(_band_buckets(signature))])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def query(self, signature: np.ndarray, threshold: float = 0.8,
+              exclude_dossier: Optional[str] = None) -> List[Dict]:
+        """
+        Documents d'autres dossiers dont la similarité estimée dépasse `threshold`
+
+        Returns:
+            list: [{'doc_id', 'dossier_id', 'doc_type', 'similarity'}], du plus proche au moins proche
+        """
+        conn = self._connection()
+        candidates = set()
+        for band, bucket in enumerate(_band_buckets(signature)):
+            candidates.update(row[0] for row in conn.execute(
+                "SELECT doc_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)))
+
+        matches = []
+        for doc_id in candidates:
+            row = conn.execute("SELECT dossier_id, doc_type, signature FROM signatures WHERE doc_id = ?",
+                               (doc_id,)).fetchone()
+            if row is None or row[0] == exclude_dossier:
+                continue
+            similarity = estimate_jaccard(signature, np.frombuffer(row[2], dtype=np.uint32))
+            if similarity >= threshold:
+                matches.append({'doc_id': doc_id, 'dossier_id': row[0], 'doc_type': row[1],
+                                'similarity': round(similarity, 3)})
+
+        return sorted(matches, key=lambda match: -match['similarity'])
+
+    def add_dossier_images(self, dossier_id: str, images: Dict[str, List[Dict]]):
+        """
+        Enregistre (ou remplace) les empreintes des images d'un dossier
+
+        Args:
+            images: {type de document: [{'name', 'phash', 'sha256'}]}
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old_ids = [row[0] for row in conn.execute(
+                "SELECT image_id FROM image_hashes WHERE dossier_id = ?", (dossier_id,))]
+            conn.executemany("DELETE FROM image_bands WHERE image_id = ?", [(i,) for i in old_ids])
+            conn.execute("DELETE FROM image_hashes WHERE dossier_id = ?", (dossier_id,))
+
+            now = time.time()
+            for doc_type, entries in images.items():
+                for entry in entries or []:
+                    if entry.get('phash') is None:
+                        continue
+                    image_id = f"{dossier_id}/{doc_type}/{entry['name']}"
+                    conn.execute("INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (image_id, dossier_id, doc_type, entry['name'], _signed64(entry['phash']),
+                                  entry.get('sha256'), now))
+                    conn.executemany("INSERT OR IGNORE INTO image_bands VALUES (?, ?, ?)",
+                                     [(band, bucket, image_id)
+                                      for band, bucket in enumerate(_image_buckets(entry['phash']))])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def query_image(self, phash: int, sha256: Optional[str] = None,
+                    max_distance: int = IMAGE_MAX_DISTANCE,
+                    exclude_dossier: Optional[str] = None) -> List[Dict]:
+        """
+        Images d'autres dossiers à au plus `max_distance` bits de l'empreinte
+
+        Returns:
+            list: [{'image_id', 'dossier_id', 'doc_type', 'name', 'distance', 'similarity', 'identical'}],
+                  de la plus proche à la moins proche
+        """
+        conn = self._connection()
+        candidates = set()
+        for band, bucket in enumerate(_image_buckets(phash)):
+            candidates.update(row[0] for row in conn.execute(
+                "SELECT image_id FROM image_bands WHERE band = ? AND bucket = ?", (band, bucket)))
+
+        matches = []
+        for image_id in candidates:
+            row = conn.execute("SELECT dossier_id, doc_type, name, phash, sha256 FROM image_hashes WHERE image_id = ?",
+                               (image_id,)).fetchone()
+            if row is None or row[0] == exclude_dossier:
+                continue
+            distance = bin((row[3] & ((1 << 64) - 1)) ^ phash).count('1')
+            if distance <= max_distance:
+                matches.append({'image_id': image_id, 'dossier_id': row[0], 'doc_type': row[1], 'name': row[2],
+                                'distance': distance,
+                                'similarity': round(1 - distance / IMAGE_HASH_BITS, 3),
+                                'identical': sha256 is not None and row[4] == sha256})
+
+        return sorted(matches, key=lambda match: (match['distance'], not match['identical']))
+
+    def purge(self, older_than_days: float) -> int:
+        """Supprime les signatures et empreintes anciennes (durée de conservation RGPD)"""
+        cutoff = time.time() - older_than_days * 86400
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            doc_ids = [row[0] for row in conn.execute(
+                "SELECT doc_id FROM signatures WHERE created_at < ?", (cutoff,))]
+            conn.executemany("DELETE FROM bands WHERE doc_id = ?", [(d,) for d in doc_ids])
+            conn.execute("DELETE FROM signatures WHERE created_at < ?", (cutoff,))
+            image_ids = [row[0] for row in conn.execute(
+                "SELECT image_id FROM image_hashes WHERE created_at < ?", (cutoff,))]
+            conn.executemany("DELETE FROM image_bands WHERE image_id = ?", [(i,) for i in image_ids])
+            conn.execute("DELETE FROM image_hashes WHERE created_at < ?", (cutoff,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return len(doc_ids) + len(image_ids)
+
+
+_registry_lock = threading.Lock()
+_indexes: Dict[str, LSHIndex] = {}
+
+
+def get_index(path: str = DEFAULT_DB_PATH) -> LSHIndex:
+    """Index partagé par chemin (survit aux réexécutions du script Streamlit)"""
+    with _registry_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = LSHIndex(path)
+        return index
@@ -6,7 +6,7 @@ import re
 from datetime import datetime
 import pytesseract
 from pdf2image import convert_from_path
-from PIL import Image
+from image_pyramid import NATIVE_RESOLUTION, iter_pages
 from config.settings import OCR_CONFIG, REGEX_PATTERNS
 
 
@@ -43,7 +43,8 @@ def extract_text_from_pdf(pdf_path, dpi=300):
 
 def extract_text_from_image(image_path):
     """
-    Applique l'OCR directement sur une image
+    Applique l'OCR directement sur une image (page par page pour un TIFF multipage,
+    chaque page étant libérée avant le décodage de la suivante)
     
     Args:
         image_path: Chemin vers l'image
@@ -52,15 +53,16 @@ def extract_text_from_image(image_path):
         str: Texte extrait
     """
     try:
-        image = Image.open(image_path)
-        
-        text = pytesseract.image_to_string(
-            image,
-            lang=OCR_CONFIG['lang'],
-            config=f'--psm {OCR_CONFIG["psm"]}'
-        )
+        all_text = ""
+        for page_num, pyramid in iter_pages(image_path):
+            text = pytesseract.image_to_string(
+                pyramid.level(NATIVE_RESOLUTION),
+                lang=OCR_CONFIG['lang'],
+                config=f'--psm {OCR_CONFIG["psm"]}'
+            )
+            all_text += f"\n--- PAGE {page_num} ---\n{text}\n" if pyramid.page_count > 1 else text
         
-        return text.strip()
+        return all_text.strip()
     
     except Exception as e:
         return f"ERREUR OCR: {str(e)}"
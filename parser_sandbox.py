@@ -0,0 +1,163 @@
+"""
+Analyse des fichiers déposés dans un processus isolé aux ressources limitées
+Un fichier piégé (bombe de décompression deflate, arbre de pages démesuré, PNG
+de 100 mégapixels) ne doit ni bloquer ni faire tomber la session Streamlit :
+l'analyse tourne dans un processus fils (fork) soumis à :
+
+- une limite d'espace d'adressage (RLIMIT_AS, au-delà de la taille héritée du parent) ;
+- une limite de temps CPU (RLIMIT_CPU : SIGXCPU puis arrêt) ;
+- un délai d'horloge (processus tué à l'échéance) ;
+- la limite de pixels de Pillow (Image.MAX_IMAGE_PIXELS), dont l'avertissement
+  DecompressionBombWarning devient une erreur.
+
+Tout dépassement (ou plantage du processus) lève ResourceLimitExceeded avec un
+motif lisible ; les autres erreurs sont relancées telles quelles dans le parent.
+Sans fork ni module resource (Windows), la fonction s'exécute dans le processus
+courant avec la seule limite de pixels.
+"""
+
+import multiprocessing
+import os
+import signal
+import warnings
+from typing import Any, Callable, Optional
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+
+DEFAULT_MEMORY_MB = 1536            # Mémoire supplémentaire autorisée au-delà de celle héritée
+DEFAULT_CPU_SECONDS = 120
+DEFAULT_TIMEOUT = 180.0             # Secondes d'horloge
+DEFAULT_MAX_IMAGE_PIXELS = 64_000_000   # Photos de smartphone (jusqu'à ~50 Mpx) acceptées
+
+# Erreurs de ressources : à relancer plutôt qu'à absorber dans un « except Exception »
+RESOURCE_ERRORS = (MemoryError, Image.DecompressionBombError, Image.DecompressionBombWarning)
+
+
+class ResourceLimitExceeded(Exception):
+    """Analyse interrompue : mémoire, temps de calcul, délai ou taille d'image dépassés"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class SandboxLimits:
+    """Limites d'un processus d'analyse"""
+
+    __slots__ = ('memory_mb', 'cpu_seconds', 'timeout', 'max_image_pixels')
+
+    def __init__(self, memory_mb: int = DEFAULT_MEMORY_MB, cpu_seconds: int = DEFAULT_CPU_SECONDS,
+                 timeout: float = DEFAULT_TIMEOUT, max_image_pixels: int = DEFAULT_MAX_IMAGE_PIXELS):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        self.max_image_pixels = max_image_pixels
+
+
+def sandbox_available() -> bool:
+    """Vrai si l'isolation par processus limité est possible (POSIX avec fork)"""
+    return resource is not None and 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _virtual_memory_size() -> Optional[int]:
+    """Taille de l'espace d'adressage du processus courant (octets), None si inconnue"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def describe_resource_error(error: BaseException) -> str:
+    """Motif lisible d'une erreur de ressources"""
+    if isinstance(error, MemoryError):
+        return "mémoire insuffisante (fichier trop volumineux une fois décompressé)"
+    return f"image trop grande ({error})"
+
+
+def _apply_limits(limits: SandboxLimits):
+    Image.MAX_IMAGE_PIXELS = limits.max_image_pixels
+    warnings.simplefilter('error', Image.DecompressionBombWarning)
+    if resource is None:
+        return
+    inherited = _virtual_memory_size()
+    if inherited is not None and limits.memory_mb:
+        memory = inherited + limits.memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    if limits.cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 5))
+
+
+def _child(connection, func: Callable, args: tuple, kwargs: dict, limits: SandboxLimits):
+    try:
+        _apply_limits(limits)
+        result = func(*args, **kwargs)
+        connection.send(('ok', result))
+    except RESOURCE_ERRORS as e:
+        connection.send(('resources', describe_resource_error(e)))
+    except BaseException as e:
+        try:
+            connection.send(('error', e))
+        except Exception:
+            connection.send(('error', RuntimeError(f"{type(e).__name__}: {e}")))
+    finally:
+        connection.close()
+
+
+def _exit_reason(exitcode: Optional[int]) -> str:
+    if exitcode == -signal.SIGXCPU:
+        return "temps de calcul dépassé"
+    if exitcode == -signal.SIGKILL:
+        return "processus d'analyse arrêté (mémoire épuisée)"
+    return f"processus d'analyse interrompu (code {exitcode})"
+
+
+def run_limited(func: Callable, *args, limits: Optional[SandboxLimits] = None, **kwargs) -> Any:
+    """
+    Exécute func(*args, **kwargs) dans un processus fils limité et renvoie son résultat
+
+    Le résultat (et les arguments, hérités par fork) doit être sérialisable par pickle.
+
+    Raises:
+        ResourceLimitExceeded: dépassement de limite, délai écoulé ou plantage du fils
+    """
+    limits = limits or SandboxLimits()
+    if not sandbox_available():
+        Image.MAX_IMAGE_PIXELS = limits.max_image_pixels
+        try:
+            return func(*args, **kwargs)
+        except RESOURCE_ERRORS as e:
+            raise ResourceLimitExceeded(describe_resource_error(e)) from e
+
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(sender, func, args, kwargs, limits), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(limits.timeout):
+            raise ResourceLimitExceeded(f"délai d'analyse dépassé ({limits.timeout:g} s)")
+        try:
+            status, payload = receiver.recv()
+        except (EOFError, OSError):
+            process.join(5)
+            raise ResourceLimitExceeded(_exit_reason(process.exitcode))
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.join(1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    if status == 'ok':
+        return payload
+    if status == 'resources':
+        raise ResourceLimitExceeded(payload)
+    raise payload
@@ -0,0 +1,226 @@
+"""
+Analyse forensique des octets bruts d'un PDF (révisions incrémentales)
+Un éditeur qui modifie un PDF sans le réécrire ajoute à la fin du fichier les
+objets modifiés, une nouvelle table xref et un nouveau %%EOF : la version
+d'origine reste intacte en tête de fichier.
+
+Le balayage repère en temps linéaire (recherche de littéraux, sans analyse
+syntaxique complète ni décompression) chaque %%EOF, startxref, section
+xref / trailer, flux xref et définition d'objet. Les fichiers sur
+disque sont projetés en mémoire (mmap) plutôt que lus.
+
+Usage :
+    python pdf_forensics.py document.pdf [--original original.pdf]
+"""
+
+import argparse
+import mmap
+import re
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+
+# Un motif par jeton, chacun commençant par un littéral : le moteur d'expressions
+# régulières saute directement aux occurrences du littéral (une alternative
+# unique obligerait à tester chaque octet)
+_TOKEN_PATTERNS = (
+    ('eof', re.compile(rb'%%EOF')),
+    ('startxref', re.compile(rb'startxref\s+(\d+)')),
+    ('xref', re.compile(rb'xref\s')),
+    ('trailer', re.compile(rb'trailer\s*<<')),
+    ('obj', re.compile(rb'obj\b')),
+    ('type', re.compile(rb'/Type\s*/(XRef|Sig)\b')),
+    ('linearized', re.compile(rb'/Linearized\b')),
+    ('prev', re.compile(rb'/Prev\s+(\d+)')),
+)
+
+# En-tête d'objet « N G » précédant le mot-clé obj
+_OBJ_HEADER_RE = re.compile(rb'(?<![\d.])(\d+)\s+(\d+)\s+$')
+
+_EOL_RE = re.compile(rb'\r\n|\r|\n')
+
+# Taille maximale des listes d'objets réécrits conservées par révision
+MAX_LISTED_OBJECTS = 50
+
+
+def _new_revision(index: int, start: int) -> Dict:
+    return {
+        'index': index,
+        'start': start,
+        'end': None,
+        'startxref': None,
+        'prev': None,
+        'xref_type': None,          # 'table' (xref classique), 'stream' (flux /XRef) ou None
+        'objects': 0,
+        'new_objects': 0,
+        'overwritten_objects': [],
+        'signature': False
+    }
+
+
+def _tokens(data) -> List[Tuple[int, str, Optional[int]]]:
+    """Jetons structurels (position, type, valeur) triés par position"""
+    tokens = []
+    for kind, pattern in _TOKEN_PATTERNS:
+        for match in pattern.finditer(data):
+            position = match.start()
+            if kind == 'xref':
+                if data[max(0, position - 5):position] == b'start':
+                    continue
+                tokens.append((position, kind, None))
+            elif kind == 'obj':
+                # « 12 0 obj » (et non endobj) : relire les quelques octets précédents
+                header = _OBJ_HEADER_RE.search(data, max(0, position - 24), position)
+                if header and header.end() == position:
+                    tokens.append((position, kind, int(header.group(1))))
+            elif kind == 'type':
+                tokens.append((position, match.group(1).decode(), None))
+            elif kind in ('startxref', 'prev'):
+                tokens.append((position, kind, int(match.group(1))))
+            else:
+                tokens.append((position, kind, None))
+    tokens.sort()
+    return tokens
+
+
+def scan_buffer(data) -> Dict:
+    """
+    Révisions d'un PDF à partir de ses octets (bytes, bytearray, memoryview ou mmap)
+
+    Returns:
+        dict: révisions, nombre de mises à jour incrémentales, objets réécrits,
+              plage d'octets de la révision d'origine
+    """
+    start_time = time.perf_counter()
+    size = len(data)
+
+    revisions = []
+    current = _new_revision(0, 0)
+    defined = set()                 # Numéros d'objets définis dans les révisions précédentes
+    in_revision = set()
+    overwritten_count = 0
+    linearized = False
+
+    for position, kind, value in _tokens(data):
+        if kind == 'eof':
+            eol = _EOL_RE.match(data, position + 5)
+            current['end'] = eol.end() if eol else position + 5
+            revisions.append(current)
+            defined |= in_revision
+            in_revision = set()
+            current = _new_revision(len(revisions), current['end'])
+        elif kind == 'startxref':
+            current['startxref'] = value
+        elif kind == 'xref':
+            current['xref_type'] = 'table'
+        elif kind == 'XRef':
+            current['xref_type'] = 'stream'
+        elif kind == 'obj':
+            if value in in_revision:
+                continue
+            in_revision.add(value)
+            current['objects'] += 1
+            if value in defined:
+                overwritten_count += 1
+                if len(current['overwritten_objects']) < MAX_LISTED_OBJECTS:
+                    current['overwritten_objects'].append(value)
+            else:
+                current['new_objects'] += 1
+        elif kind == 'Sig':
+            current['signature'] = True
+        elif kind == 'linearized':
+            linearized = linearized or not revisions
+        elif kind == 'prev':
+            current['prev'] = value
+
+    trailing_bytes = size - (revisions[-1]['end'] if revisions else 0)
+
+    # Fichier linéarisé : la section « première page » a son propre %%EOF
+    base_revisions = 2 if linearized and len(revisions) >= 2 else 1
+    base_revisions = min(base_revisions, len(revisions))
+    updates = revisions[base_revisions:]
+
+    return {
+        'file_size': size,
+        'revision_count': len(revisions),
+        'incremental_updates': len(updates),
+        'linearized': linearized,
+        'signed': any(rev['signature'] for rev in revisions),
+        'overwritten_objects': overwritten_count,
+        'updates_overwrite': any(rev['overwritten_objects'] for rev in updates),
+        'original_revision': (0, revisions[base_revisions - 1]['end']) if revisions else None,
+        'trailing_bytes': trailing_bytes,
+        'revisions': revisions,
+        'scan_ms': round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+
+def scan_revisions(source: Union[str, bytes, bytearray, memoryview, object]) -> Dict:
+    """
+    Révisions d'un PDF (chemin de fichier, octets ou fichier en mémoire type BytesIO / UploadedFile)
+
+    Un chemin est projeté en mémoire ; un BytesIO est lu sans copie (getbuffer).
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            if f.seek(0, 2) == 0:
+                return scan_buffer(b'')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return scan_buffer(mapped)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return scan_buffer(source)
+
+    if hasattr(source, 'getbuffer'):
+        with source.getbuffer() as view:
+            return scan_buffer(view)
+
+    position = source.tell()
+    source.seek(0)
+    try:
+        return scan_buffer(source.read())
+    finally:
+        source.seek(position)
+
+
+def original_revision_bytes(data: bytes, scan: Dict = None) -> bytes:
+    """Octets de la révision d'origine (le PDF tel qu'il était avant toute mise à jour)"""
+    scan = scan or scan_buffer(data)
+    if not scan['original_revision']:
+        return b''
+    start, end = scan['original_revision']
+    return bytes(data[start:end])
+
+
+def describe_revisions(scan: Dict) -> List[str]:
+    """Résumé lisible des révisions"""
+    lines = []
+    for rev in scan['revisions']:
+        line = (f"Révision {rev['index']} : octets {rev['start']}-{rev['end']}, "
+                f"{rev['objects']} objet(s) dont {rev['new_objects']} nouveau(x)")
+        if rev['overwritten_objects']:
+            line += f", réécrits : {', '.join(str(n) for n in rev['overwritten_objects'])}"
+        if rev['signature']:
+            line += " (signature)"
+        lines.append(line)
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Révisions incrémentales d'un PDF")
+    parser.add_argument('pdf')
+    parser.add_argument('--original', help="Écrit la révision d'origine dans ce fichier")
+    args = parser.parse_args()
+
+    result = scan_revisions(args.pdf)
+    print(f"📄 {args.pdf} : {result['revision_count']} révision(s), "
+          f"{result['incremental_updates']} mise(s) à jour incrémentale(s) ({result['scan_ms']} ms)")
+    for description in describe_revisions(result):
+        print(f"   {description}")
+
+    if args.original and result['original_revision']:
+        with open(args.pdf, 'rb') as f:
+            data = f.read()
+        with open(args.original, 'wb') as out:
+            out.write(original_revision_bytes(data, result))
+        print(f"✅ Révision d'origine -> {args.original}")
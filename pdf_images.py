@@ -0,0 +1,254 @@
+"""
+Images intégrées d'un PDF (XObjects image), extraites sans rastériser les pages
+Un justificatif scanné est souvent un PDF qui enveloppe un seul JPEG : ce JPEG
+est le document à analyser (ELA, OCR, empreintes), pas le rendu de la page.
+
+L'itération est paresseuse : les ressources de chaque page (et des formulaires
+XObject imbriqués) sont parcourues une à une, chaque image n'est décodée qu'à
+la demande et son objet est retiré du cache du PdfReader une fois traité, si
+bien que la mémoire reste bornée quel que soit le nombre d'images.
+
+Les flux DCTDecode (JPEG) et JPXDecode (JPEG 2000) sont rendus tels quels
+(octets encodés d'origine, sans réencodage) ; les autres flux sont décodés en
+pixels. L'empreinte de contenu (SHA-256) porte sur les octets encodés.
+
+La part de la page couverte par chaque image (matrice de transformation suivie
+dans le flux de contenu de la page) distingue un scan pleine page d'un fond ou
+d'un en-tête de modèle.
+
+Usage :
+    python pdf_images.py document.pdf [--extract dossier/]
+"""
+
+import argparse
+import hashlib
+import io
+import os
+from typing import Dict, Iterator, Optional
+
+from PIL import Image
+from PyPDF2 import PdfReader
+from PyPDF2.filters import _xobj_to_image
+from PyPDF2.generic import ContentStream
+
+import parser_sandbox
+
+
+MIN_IMAGE_SIDE = 64                 # Images plus petites ignorées (logos, puces)
+MAX_FORM_DEPTH = 4                  # Profondeur maximale des formulaires XObject imbriqués
+
+# Filtres dont le flux encodé est un fichier image autonome
+RAW_FORMATS = {'/DCTDecode': 'jpeg', '/JPXDecode': 'jpeg2000'}
+
+# Espaces colorimétriques décodés directement (8 bits par composante)
+_RAW_MODES = {'/DeviceRGB': 'RGB', '/DeviceGray': 'L', '/DeviceCMYK': 'CMYK'}
+
+
+class EmbeddedImage:
+    """
+    Image XObject d'un PDF : description, flux encodé d'origine, décodage à la demande
+    (flux disponible pendant l'itération seulement)
+
+    Usage :
+        for embedded in iter_image_xobjects(reader):
+            embedded.sha256, embedded.raw_format
+            with embedded.open() as image:
+                ...
+    """
+
+    __slots__ = ('page', 'name', 'object_id', 'width', 'height', 'bits', 'color_space',
+                 'filter', 'encoded_size', 'sha256', 'coverage', '_stream')
+
+    def __init__(self, page: int, name: str, object_id, stream):
+        self.page = page
+        self.name = name
+        self.object_id = object_id
+        self.width = int(stream.get('/Width', 0))
+        self.height = int(stream.get('/Height', 0))
+        self.bits = int(stream.get('/BitsPerComponent', 8) or 8)
+        color_space = stream.get('/ColorSpace')
+        if isinstance(color_space, list) and color_space and color_space[0] == '/ICCBased':
+            # Profil ICC : espace équivalent d'après le nombre de composantes
+            components = int(color_space[1].get_object().get('/N', 0))
+            color_space = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}.get(components, '/ICCBased')
+        self.color_space = str(color_space if not isinstance(color_space, list) else color_space[0])
+        filters = stream.get('/Filter')
+        if isinstance(filters, list):
+            filters = filters[0] if len(filters) == 1 else None
+        self.filter = str(filters) if filters else None
+        self.encoded_size = len(stream._data or b'')
+        self.sha256 = hashlib.sha256(stream._data or b'').hexdigest()
+        self.coverage = None                # Part de la page couverte (None : inconnue, formulaire imbriqué)
+        self._stream = stream
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def raw_format(self) -> Optional[str]:
+        """'jpeg' ou 'jpeg2000' si le flux encodé est un fichier image autonome"""
+        return RAW_FORMATS.get(self.filter)
+
+    @property
+    def encoded_data(self) -> bytes:
+        """Octets encodés tels que stockés dans le PDF"""
+        return self._stream._data
+
+    def open(self) -> Image.Image:
+        """Image décodée (flux JPEG / JPEG 2000 ouvert tel quel, sinon pixels décodés)"""
+        if self.raw_format:
+            return Image.open(io.BytesIO(self._stream._data))
+        mode = _RAW_MODES.get(self.color_space)
+        if mode and self.bits == 8 and '/SMask' not in self._stream and '/Decode' not in self._stream:
+            return Image.frombytes(mode, self.size, self._stream.get_data())
+        if self.color_space == '/DeviceGray' and self.bits == 1:
+            return Image.frombytes('1', self.size, self._stream.get_data())
+        # Palettes, masques, autres profondeurs : conversion PyPDF2 (décodage puis réencodage PNG)
+        extension, data = _xobj_to_image(self._stream)
+        if extension is None:
+            raise ValueError(f"Image {self.name} : filtre {self.filter} non pris en charge")
+        return Image.open(io.BytesIO(data))
+
+    def release(self):
+        self._stream = None
+
+    def to_dict(self):
+        return {'page': self.page, 'name': self.name, 'width': self.width, 'height': self.height,
+                'bits': self.bits, 'color_space': self.color_space, 'filter': self.filter,
+                'encoded_size': self.encoded_size, 'sha256': self.sha256, 'coverage': self.coverage}
+
+
+def _xobjects(resources):
+    try:
+        resources = resources.get_object() if resources is not None else None
+        return resources.get('/XObject').get_object() if resources and '/XObject' in resources else None
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
+    except Exception:
+        return None
+
+
+def _multiply(m, n):
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+def page_image_coverage(page, reader: PdfReader) -> Dict[str, float]:
+    """
+    Part de la page (0-1) couverte par chaque XObject dessiné directement par la page
+
+    La matrice courante (cm, q / Q) est suivie jusqu'à chaque opérateur Do : l'image,
+    carré unité dans son repère, couvre |det(CTM)| points carrés.
+    """
+    coverage = {}
+    try:
+        box = page.mediabox
+        page_area = float(box.width) * float(box.height)
+        contents = page.get_contents()
+        if contents is None or page_area <= 0:
+            return coverage
+        ctm, stack = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0), []
+        for operands, operator in ContentStream(contents, reader).operations:
+            if operator == b'q':
+                stack.append(ctm)
+            elif operator == b'Q':
+                ctm = stack.pop() if stack else ctm
+            elif operator == b'cm' and len(operands) == 6:
+                ctm = _multiply(tuple(float(v) for v in operands), ctm)
+            elif operator == b'Do' and operands:
+                area = abs(ctm[0] * ctm[3] - ctm[1] * ctm[2])
+                name = str(operands[0]).lstrip('/')
+                coverage[name] = max(coverage.get(name, 0.0), min(1.0, area / page_area))
+    except parser_sandbox.RESOURCE_ERRORS:
+        raise
+    except Exception:
+        return {}
+    return coverage
+
+
+def iter_image_xobjects(reader: PdfReader, min_side: int = MIN_IMAGE_SIDE,
+                        max_images: Optional[int] = None,
+                        max_pixels: Optional[int] = None) -> Iterator[EmbeddedImage]:
+    """
+    Images XObject d'un PDF, page par page (une image partagée par plusieurs pages n'est rendue qu'une fois)
+
+    Args:
+        min_side: Côté minimal (logos et puces ignorés)
+        max_images: Nombre maximal d'images rendues
+        max_pixels: Images plus grandes ignorées (défaut : Image.MAX_IMAGE_PIXELS de Pillow)
+    """
+    max_pixels = max_pixels or Image.MAX_IMAGE_PIXELS
+    seen = set()
+    count = 0
+    for page_number, page in enumerate(reader.pages, 1):
+        coverage = None                     # Calculée à la première image retenue de la page
+        pending = [(_xobjects(page.get('/Resources')), 0)]
+        while pending:
+            xobjects, depth = pending.pop()
+            if not xobjects:
+                continue
+            for name in list(xobjects.keys()):
+                reference = xobjects.raw_get(name)
+                object_id = (reference.idnum, reference.generation) if hasattr(reference, 'idnum') else None
+                if object_id is not None:
+                    if object_id in seen:
+                        continue
+                    seen.add(object_id)
+                try:
+                    stream = reference.get_object()
+                    subtype = stream.get('/Subtype')
+                except parser_sandbox.RESOURCE_ERRORS:
+                    raise
+                except Exception:
+                    continue
+
+                if subtype == '/Form' and depth < MAX_FORM_DEPTH:
+                    pending.append((_xobjects(stream.get('/Resources')), depth + 1))
+                    continue
+                if subtype != '/Image' or stream.get('/ImageMask'):
+                    continue
+                try:
+                    width, height = int(stream.get('/Width', 0)), int(stream.get('/Height', 0))
+                    if min(width, height) < min_side or width * height > max_pixels:
+                        continue
+                    embedded = EmbeddedImage(page_number, str(name).lstrip('/'), object_id, stream)
+                    if depth == 0:
+                        if coverage is None:
+                            coverage = page_image_coverage(page, reader)
+                        embedded.coverage = coverage.get(embedded.name)
+                    yield embedded
+                    embedded.release()
+                except (TypeError, ValueError):
+                    continue
+                finally:
+                    # Libère l'objet (et son flux) du cache du lecteur
+                    if object_id is not None:
+                        reader.resolved_objects.pop((object_id[1], object_id[0]), None)
+                count += 1
+                if max_images is not None and count >= max_images:
+                    return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Images intégrées d'un PDF")
+    parser.add_argument('pdf')
+    parser.add_argument('--extract', help="Écrit les images dans ce dossier (flux JPEG d'origine si possible)")
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        for embedded in iter_image_xobjects(PdfReader(f)):
+            print(f"🖼️ page {embedded.page} {embedded.name} : {embedded.width}x{embedded.height}, "
+                  f"{embedded.filter or 'brut'}, {embedded.encoded_size} octets, sha256 {embedded.sha256[:16]}"
+                  + (f", {embedded.coverage:.0%} de la page" if embedded.coverage is not None else ""))
+            if args.extract:
+                os.makedirs(args.extract, exist_ok=True)
+                base = os.path.join(args.extract, f"p{embedded.page}_{embedded.name}")
+                if embedded.raw_format:
+                    with open(base + ('.jpg' if embedded.raw_format == 'jpeg' else '.jp2'), 'wb') as out:
+                        out.write(embedded.encoded_data)
+                else:
+                    with embedded.open() as image:
+                        image.save(base + '.png')
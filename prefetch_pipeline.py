@@ -0,0 +1,131 @@
+"""
+Préchargement en flux des validations externes
+Chaque document analysé publie ses identifiants (SIRET, adresses, emails) dans
+une file ; des threads consommateurs lancent aussitôt les appels réseau, qui
+se recouvrent avec l'analyse (texte, OCR) des documents suivants.
+
+Les résultats ne sont pas renvoyés : ils alimentent les caches des fonctions
+de validation, que la phase de validation du dossier relit ensuite sans attente.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+_STOP = object()
+
+
+class PrefetchPipeline:
+    """
+    File d'identifiants consommée par un pool de threads
+
+    Args:
+        handlers: {type d'identifiant: fonction(valeur) -> bool}, la fonction
+            renvoie True si elle a consommé un appel réseau (False si cache)
+        workers: Nombre de threads consommateurs
+        limits: {type: nombre maximal d'appels réseau} (budget par dossier)
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[str], bool]], workers: int = 4,
+                 limits: Optional[Dict[str, int]] = None):
+        self.handlers = handlers
+        self.workers = workers
+        self.limits = dict(limits or {})
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._threads = []
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'over_budget': 0,
+            'errors': [],
+            'network_requests': {kind: 0 for kind in handlers},
+            'busy_ms': 0.0,
+            'wait_ms': 0.0
+        }
+
+    def submit(self, kind: str, value: str) -> bool:
+        """Ajoute un identifiant (ignoré si déjà soumis ou de type inconnu)"""
+        if not value or kind not in self.handlers:
+            return False
+
+        with self._lock:
+            if (kind, value) in self._seen:
+                return False
+            self._seen.add((kind, value))
+            self.stats['submitted'] += 1
+            if not self._threads:
+                self._start()
+
+        self._queue.put((kind, value))
+        return True
+
+    def submit_many(self, identifiers: Iterable[Tuple[str, str]]) -> int:
+        """Ajoute plusieurs (type, valeur) ; renvoie le nombre de nouveaux identifiants"""
+        return sum(1 for kind, value in identifiers if self.submit(kind, value))
+
+    def requests_used(self, kind: str) -> int:
+        """Appels réseau déjà consommés pour un type d'identifiant"""
+        with self._lock:
+            return self.stats['network_requests'].get(kind, 0)
+
+    def close(self, timeout: Optional[float] = None) -> Dict:
+        """
+        Attend la fin des appels en cours et arrête les threads
+
+        Returns:
+            dict: Statistiques (soumis, terminés, budget dépassé, erreurs, temps)
+        """
+        start = time.perf_counter()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self.stats['wait_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self._threads = []
+        return self.stats
+
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"prefetch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _reserve(self, kind: str) -> bool:
+        """Réserve un appel réseau sur le budget du type (libéré si le cache répond)"""
+        with self._lock:
+            limit = self.limits.get(kind)
+            if limit is not None and self.stats['network_requests'][kind] >= limit:
+                self.stats['over_budget'] += 1
+                return False
+            self.stats['network_requests'][kind] += 1
+            return True
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            kind, value = item
+            if not self._reserve(kind):
+                continue
+
+            start = time.perf_counter()
+            used_network = True
+            try:
+                used_network = bool(self.handlers[kind](value))
+            except Exception as e:
+                # Préchargement au mieux : la phase de validation refera l'appel
+                with self._lock:
+                    self.stats['errors'].append(f"{kind} {value} : {str(e)}")
+            finally:
+                with self._lock:
+                    if not used_network:
+                        self.stats['network_requests'][kind] -= 1
+                    self.stats['completed'] += 1
+                    self.stats['busy_ms'] += (time.perf_counter() - start) * 1000
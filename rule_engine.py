@@ -0,0 +1,188 @@
+"""
+Moteur de règles déclaratives
+Les caractéristiques (features) d'un dossier sont calculées une seule fois
+et mémoïsées ; les règles sont évaluées dans l'ordre de leurs dépendances,
+avec mesure du temps par caractéristique et par règle
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class Feature:
+    """Caractéristique nommée calculée à partir des entrées ou d'autres caractéristiques"""
+
+    __slots__ = ('name', 'func', 'depends_on')
+
+    def __init__(self, name: str, func: Callable, depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class Rule:
+    """Règle : fonction des caractéristiques renvoyant None, un signal ou une liste de signaux"""
+
+    __slots__ = ('name', 'func', 'features', 'after')
+
+    def __init__(self, name: str, func: Callable, features: Iterable[str] = (), after: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.features = tuple(features)
+        self.after = tuple(after)
+
+
+class FeatureContext:
+    """Entrées d'un dossier + caractéristiques mémoïsées"""
+
+    def __init__(self, engine: 'RuleEngine', inputs: Dict[str, Any]):
+        self._engine = engine
+        self._values = dict(inputs)
+        self.timings_ms: Dict[str, float] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+
+        feature = self._engine.features.get(name)
+        if feature is None:
+            raise KeyError(f"Caractéristique inconnue : {name}")
+
+        # Dépendances d'abord : chaque caractéristique n'est chronométrée que pour elle-même
+        for dependency in feature.depends_on:
+            self[dependency]
+
+        start = time.perf_counter()
+        value = self._values[name] = feature.func(self)
+        self.timings_ms[name] = (time.perf_counter() - start) * 1000
+        return value
+
+
+def _topological_order(nodes: Dict[str, Tuple[str, ...]], kind: str) -> List[str]:
+    """Tri topologique stable (ordre d'enregistrement conservé à dépendances égales)"""
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Dépendance circulaire ({kind}) : {' -> '.join(path + [name])}")
+        if name not in nodes:
+            raise ValueError(f"{kind} inconnue : {name}")
+        state[name] = 'visiting'
+        for dependency in nodes[name]:
+            visit(dependency, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in nodes:
+        visit(name, [])
+    return order
+
+
+class RuleEngine:
+    """
+    Registre de caractéristiques et de règles
+
+    Usage :
+        engine = RuleEngine()
+
+        @engine.feature('salaires')
+        def salaires(ctx): ...
+
+        @engine.rule('salaire_eleve', features=['salaires'])
+        def salaire_eleve(ctx): ...
+
+        flags, report = engine.evaluate({'structured_data': ...})
+    """
+
+    def __init__(self):
+        self.features: Dict[str, Feature] = {}
+        self.rules: Dict[str, Rule] = {}
+        self._plan: Optional[Tuple[List[str], List[str]]] = None
+
+    def feature(self, name: str, depends_on: Iterable[str] = ()):
+        """Décorateur d'enregistrement d'une caractéristique"""
+        def decorator(func):
+            self.features[name] = Feature(name, func, depends_on)
+            self._plan = None
+            return func
+        return decorator
+
+    def rule(self, name: str, features: Iterable[str] = (), after: Iterable[str] = ()):
+        """Décorateur d'enregistrement d'une règle"""
+        def decorator(func):
+            self.rules[name] = Rule(name, func, features, after)
+            self._plan = None
+            return func
+        return decorator
+
+    def plan(self) -> Tuple[List[str], List[str]]:
+        """
+        Ordre d'évaluation
+
+        Returns:
+            tuple: (caractéristiques nécessaires aux règles, règles) dans l'ordre des dépendances
+        """
+        if self._plan is None:
+            feature_order = _topological_order(
+                {name: f.depends_on for name, f in self.features.items()}, 'caractéristique')
+            rule_order = _topological_order(
+                {name: r.after for name, r in self.rules.items()}, 'règle')
+
+            needed = set()
+            pending = [name for rule in self.rules.values() for name in rule.features]
+            while pending:
+                name = pending.pop()
+                if name in self.features and name not in needed:
+                    needed.add(name)
+                    pending.extend(self.features[name].depends_on)
+
+            self._plan = ([name for name in feature_order if name in needed], rule_order)
+        return self._plan
+
+    def evaluate(self, inputs: Dict[str, Any]) -> Tuple[List[Dict], Dict]:
+        """
+        Évalue toutes les règles sur un dossier
+
+        Une règle qui lève une exception est ignorée (consignée dans le rapport).
+
+        Returns:
+            tuple: (signaux levés, rapport {'feature_timings_ms', 'rule_timings_ms', 'errors'})
+        """
+        feature_order, rule_order = self.plan()
+        ctx = FeatureContext(self, inputs)
+        errors = {}
+
+        for name in feature_order:
+            try:
+                ctx[name]
+            except Exception as e:
+                errors[name] = str(e)
+
+        flags = []
+        rule_timings = {}
+        for name in rule_order:
+            rule = self.rules[name]
+            start = time.perf_counter()
+            try:
+                if not any(feature in errors for feature in rule.features):
+                    output = rule.func(ctx)
+                    if isinstance(output, dict):
+                        output = [output]
+                    for flag in output or []:
+                        flag.setdefault('rule', name)
+                        flags.append(flag)
+            except Exception as e:
+                errors[name] = str(e)
+            rule_timings[name] = (time.perf_counter() - start) * 1000
+
+        return flags, {
+            'feature_timings_ms': ctx.timings_ms,
+            'rule_timings_ms': rule_timings,
+            'errors': errors
+        }
@@ -20,8 +20,42 @@ DOCUMENT_WEIGHTS = {
     'caf': 0.05
 }
 
+# Pondération du score global (calculate_global_score et batch_scoring)
+GLOBAL_SCORE_WEIGHTS = {
+    'documents': 0.35,
+    'cross_validation': 0.25,
+    'red_flags': 0.40,
+    'failed_check': 0.12,           # Pénalité par contrôle croisé en échec
+    'cross_anomaly': 0.06,          # Pénalité par anomalie croisée
+    'default_document_score': 0.5,  # Score documents si aucun document
+    'red_flag_points': 100          # Points de red flags correspondant au maximum de la composante
+}
+
+# Bandes de verdict du score global (borne haute exclusive, None = sans limite)
+GLOBAL_SCORE_BANDS = [
+    {'max': 12, 'verdict': "✅ DOSSIER FIABLE", 'color': "green",
+     'recommendation': "Dossier validé - Risque très faible", 'action': "APPROUVER"},
+    {'max': 25, 'verdict': "✅ DOSSIER ACCEPTABLE", 'color': "green",
+     'recommendation': "Dossier acceptable - Risque faible", 'action': "APPROUVER avec vigilance"},
+    {'max': 45, 'verdict': "⚠️ VIGILANCE REQUISE", 'color': "orange",
+     'recommendation': "Vérifications complémentaires recommandées", 'action': "VÉRIFIER manuellement"},
+    {'max': 65, 'verdict': "🔴 SUSPICION DE FRAUDE", 'color': "red",
+     'recommendation': "Risque élevé - Audit approfondi nécessaire", 'action': "CONTACTER le candidat"},
+    {'max': None, 'verdict': "🚨 FRAUDE PROBABLE", 'color': "darkred",
+     'recommendation': "Risque très élevé - Rejet recommandé", 'action': "REJETER le dossier"},
+]
+
+# Niveau de risque d'un document selon son score de fraude (0-100)
+RISK_LEVEL_BANDS = [
+    (15, "Très faible"),
+    (30, "Faible"),
+    (50, "Modéré"),
+    (70, "Élevé"),
+    (None, "Très élevé"),
+]
+
 # Types de documents acceptés
-ALLOWED_EXTENSIONS = ['pdf', 'jpg', 'jpeg', 'png', 'tiff']
+ALLOWED_EXTENSIONS = ['pdf', 'jpg', 'jpeg', 'png', 'tif', 'tiff']
 MAX_FILE_SIZE_MB = 10
 
 # Paramètres OCR
@@ -0,0 +1,234 @@
+"""
+Base SIRENE locale (mode hors-ligne)
+Import en flux d'un extrait INSEE StockEtablissement (CSV ou Parquet)
+dans une table SQLite indexée par SIRET et SIREN
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional
+
+
+# Colonnes StockEtablissement conservées -> colonnes de la table locale
+STOCK_COLUMNS = {
+    'siret': 'siret',
+    'siren': 'siren',
+    'denominationUsuelleEtablissement': 'denomination',
+    'enseigne1Etablissement': 'enseigne',
+    'numeroVoieEtablissement': 'numero_voie',
+    'typeVoieEtablissement': 'type_voie',
+    'libelleVoieEtablissement': 'libelle_voie',
+    'codePostalEtablissement': 'code_postal',
+    'libelleCommuneEtablissement': 'libelle_commune',
+    'etatAdministratifEtablissement': 'etat_administratif',
+    'dateCreationEtablissement': 'date_creation',
+    'activitePrincipaleEtablissement': 'activite_principale',
+    'etablissementSiege': 'siege',
+}
+
+TABLE_COLUMNS = list(STOCK_COLUMNS.values())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS etablissements (
+    siret TEXT PRIMARY KEY,
+    siren TEXT NOT NULL,
+    denomination TEXT,
+    enseigne TEXT,
+    numero_voie TEXT,
+    type_voie TEXT,
+    libelle_voie TEXT,
+    code_postal TEXT,
+    libelle_commune TEXT,
+    etat_administratif TEXT,
+    date_creation TEXT,
+    activite_principale TEXT,
+    siege TEXT
+) WITHOUT ROWID
+"""
+
+_local = threading.local()
+
+
+# ======================
+# IMPORT EN FLUX
+# ======================
+
+def _iter_csv_rows(source_path: str) -> Iterator[tuple]:
+    """Lit le CSV ligne à ligne (jamais chargé en mémoire)"""
+    with open(source_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(col) if col in header else None for col in STOCK_COLUMNS]
+
+        for row in reader:
+            yield tuple(row[p] if p is not None and p < len(row) else None for p in positions)
+
+
+def _parquet_text(value) -> Optional[str]:
+    """Valeur Parquet au format texte du CSV (booléens 'true' / 'false')"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _iter_parquet_rows(source_path: str, batch_size: int) -> Iterator[tuple]:
+    """Lit le Parquet par lots de colonnes (pyarrow requis)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow est requis pour importer un extrait Parquet")
+
+    parquet_file = pq.ParquetFile(source_path)
+    available = set(parquet_file.schema_arrow.names)
+    columns = [col for col in STOCK_COLUMNS if col in available]
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        data = batch.to_pydict()
+        n_rows = batch.num_rows
+        values = [data.get(col, [None] * n_rows) for col in STOCK_COLUMNS]
+        for i in range(n_rows):
+            yield tuple(_parquet_text(v[i]) for v in values)
+
+
+def import_stock_etablissement(source_path: str, db_path: str, batch_size: int = 50000) -> int:
+    """
+    Importe un extrait StockEtablissement dans la base locale
+
+    Args:
+        source_path: Fichier CSV ou Parquet publié par l'INSEE
+        db_path: Chemin de la base SQLite à créer / compléter
+        batch_size: Nombre de lignes insérées par transaction
+
+    Returns:
+        int: Nombre d'établissements importés
+    """
+
+    if source_path.lower().endswith('.parquet'):
+        rows = _iter_parquet_rows(source_path, batch_size)
+    else:
+        rows = _iter_csv_rows(source_path)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # Import massif : pas de journal, index SIREN créé à la fin
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-200000")
+        conn.execute(_SCHEMA)
+        conn.execute("DROP INDEX IF EXISTS idx_etablissements_siren")
+
+        insert_sql = "INSERT OR REPLACE INTO etablissements ({}) VALUES ({})".format(
+            ', '.join(TABLE_COLUMNS), ', '.join('?' * len(TABLE_COLUMNS))
+        )
+
+        total = 0
+        batch = []
+        for row in rows:
+            if not row[0] or len(row[0]) != 14:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(insert_sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch = []
+
+        if batch:
+            conn.executemany(insert_sql, batch)
+            total += len(batch)
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_etablissements_siren ON etablissements (siren)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return total
+
+
+# ======================
+# RECHERCHE
+# ======================
+
+def _get_connection(db_path: str) -> sqlite3.Connection:
+    """Connexion en lecture seule, une par thread et par base"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        connections[db_path] = conn
+    return conn
+
+
+def is_available(db_path: str) -> bool:
+    """Indique si une base locale exploitable existe"""
+    return bool(db_path) and os.path.isfile(db_path) and os.path.getsize(db_path) > 0
+
+
+def _row_to_result(row: sqlite3.Row) -> Dict:
+    """Convertit une ligne de la table au format de validate_siret_insee"""
+
+    result = {
+        'valid': True,
+        'exists': True,
+        'company_name': row['denomination'] or row['enseigne'] or 'Non renseigné',
+        'address': None,
+        'status': 'Actif' if row['etat_administratif'] == 'A' else 'Cessé',
+        'creation_date': row['date_creation'],
+        'activity': f"NAF {row['activite_principale']}" if row['activite_principale'] else None,
+        'error': None,
+        'api_used': 'Base SIRENE locale'
+    }
+
+    rue = ' '.join(str(p) for p in (row['numero_voie'], row['type_voie'], row['libelle_voie']) if p).strip()
+    cp = row['code_postal']
+    ville = row['libelle_commune']
+
+    if rue and cp and ville:
+        result['address'] = f"{rue}, {cp} {ville}"
+    elif cp and ville:
+        result['address'] = f"{cp} {ville}"
+
+    return result
+
+
+def lookup_siret(siret: str, db_path: str) -> Optional[Dict]:
+    """
+    Recherche un établissement par SIRET (clé primaire)
+
+    Returns:
+        dict au format de validate_siret_insee, ou None si absent
+    """
+    row = _get_connection(db_path).execute(
+        "SELECT * FROM etablissements WHERE siret = ?", (siret,)
+    ).fetchone()
+    return _row_to_result(row) if row else None
+
+
+def lookup_siren(siren: str, db_path: str) -> List[Dict]:
+    """Liste les établissements d'un SIREN (siège en premier)"""
+    rows = _get_connection(db_path).execute(
+        "SELECT * FROM etablissements WHERE siren = ? ORDER BY lower(siege) = 'true' DESC, siret",
+        (siren,)
+    ).fetchall()
+    return [_row_to_result(row) for row in rows]
+
+
+if __name__ == "__main__":
+    # Usage : python sirene_local.py StockEtablissement_utf8.csv data/sirene/etablissements.sqlite
+    if len(sys.argv) != 3:
+        print("Usage : python sirene_local.py <StockEtablissement.csv|.parquet> <base.sqlite>")
+        sys.exit(1)
+
+    count = import_stock_etablissement(sys.argv[1], sys.argv[2])
+    print(f"✅ {count} établissements importés dans {sys.argv[2]}")